@@ -2,6 +2,21 @@ import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import './App.css';
 
+// Ошибки API в формате DRF: {"detail": "..."} или ошибки по параметрам
+// {"statuses": ["..."]} (сообщение может быть и строкой)
+function formatApiError(data) {
+  if (!data || typeof data !== 'object') {
+    return 'Произошла ошибка';
+  }
+  if (data.detail) {
+    return data.detail;
+  }
+  const messages = Object.entries(data).map(
+    ([field, errors]) => `${field}: ${[].concat(errors).join(' ')}`
+  );
+  return messages.length ? messages.join('; ') : 'Произошла ошибка';
+}
+
 function App() {
   const [filters, setFilters] = useState({
     enrollment_date: '',
@@ -20,43 +35,33 @@ function App() {
 
   const [students, setStudents] = useState([]);
   const [departments, setDepartments] = useState([]);
-  const [programs, setPrograms] = useState([]);
+  const [programsByDepartment, setProgramsByDepartment] = useState({});
+  const [choices, setChoices] = useState({
+    statuses: [],
+    expulsion_reasons: [],
+    education_types: [],
+    admission_bases: []
+  });
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
 
-  // Загрузка кафедр
+  // Кафедры, программы по кафедрам и варианты фильтров одним запросом
   useEffect(() => {
-    const loadDepartments = async () => {
+    const loadBootstrap = async () => {
       try {
-        const response = await axios.get('http://localhost:8000/api/departments/');
-        setDepartments(response.data);
+        const response = await axios.get('http://localhost:8000/api/bootstrap/');
+        setDepartments(response.data.departments);
+        setProgramsByDepartment(response.data.programs);
+        setChoices(response.data.choices);
       } catch (err) {
-        setError('Ошибка загрузки кафедр');
+        setError('Ошибка загрузки справочников');
       }
     };
-    loadDepartments();
+    loadBootstrap();
   }, []);
 
-  // Загрузка программ при изменении выбранных кафедр
-    useEffect(() => {
-      const loadPrograms = async () => {
-        if (filters.current_departments.length > 0) {
-          try {
-            const response = await axios.get('http://localhost:8000/api/programs/', {
-              params: {
-                department_id: filters.current_departments.join(',')
-              }
-            });
-            setPrograms(response.data);
-          } catch (err) {
-            setError('Ошибка загрузки направлений');
-          }
-        } else {
-          setPrograms([]);
-        }
-      };
-      loadPrograms();
-    }, [filters.current_departments]);
+  // Программы выбранных кафедр отбираются локально, без запроса к серверу
+  const programs = filters.current_departments.flatMap(id => programsByDepartment[id] || []);
 
   const handleFilterChange = (e) => {
     const { name, value, type, checked } = e.target;
@@ -73,6 +78,19 @@ function App() {
     }
   };
 
+  const renderChoices = (name) => choices[name].map(choice => (
+    <label key={choice.value}>
+      <input
+        type="checkbox"
+        name={name}
+        value={choice.value}
+        checked={filters[name].includes(choice.value)}
+        onChange={handleFilterChange}
+      />
+      {choice.label}
+    </label>
+  ));
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setLoading(true);
@@ -101,7 +119,7 @@ function App() {
       const response = await axios.get('http://localhost:8000/api/students/', { params });
       setStudents(response.data);
     } catch (err) {
-      setError(err.response?.data?.error || 'Произошла ошибка');
+      setError(formatApiError(err.response?.data));
       setStudents([]);
     } finally {
       setLoading(false);
@@ -244,61 +262,13 @@ function App() {
             <div className="form-group">
               <label>Тип обучения:</label>
               <div className="checkbox-group">
-                <label>
-                  <input
-                    type="checkbox"
-                    name="education_types"
-                    value="budget"
-                    checked={filters.education_types.includes('budget')}
-                    onChange={handleFilterChange}
-                  />
-                  Бюджет
-                </label>
-                <label>
-                  <input
-                    type="checkbox"
-                    name="education_types"
-                    value="contract"
-                    checked={filters.education_types.includes('contract')}
-                    onChange={handleFilterChange}
-                  />
-                  Контракт
-                </label>
+                {renderChoices('education_types')}
               </div>
             </div>
             <div className="form-group">
               <label>Основание поступления:</label>
               <div className="checkbox-group">
-                <label>
-                  <input
-                    type="checkbox"
-                    name="admission_bases"
-                    value="general"
-                    checked={filters.admission_bases.includes('general')}
-                    onChange={handleFilterChange}
-                  />
-                  Общий конкурс
-                </label>
-                <label>
-                  <input
-                    type="checkbox"
-                    name="admission_bases"
-                    value="target"
-                    checked={filters.admission_bases.includes('target')}
-                    onChange={handleFilterChange}
-                  />
-                  Целевое
-                </label>
-                <label>
-                  <input
-                    type="checkbox"
-                    name="admission_bases"
-                    value="quota"
-                    checked={filters.admission_bases.includes('quota')}
-                    onChange={handleFilterChange}
-                  />
-                  Квота
-                </label>
+                {renderChoices('admission_bases')}
               </div>
             </div>
           </div>
@@ -307,82 +277,14 @@ function App() {
         <div className="filter-section">
           <h3>Статус студента</h3>
           <div className="checkbox-group">
-            <label>
-              <input
-                type="checkbox"
-                name="statuses"
-                value="active"
-                checked={filters.statuses.includes('active')}
-                onChange={handleFilterChange}
-              />
-              Обучается
-            </label>
-            <label>
-              <input
-                type="checkbox"
-                name="statuses"
-                value="academic"
-                checked={filters.statuses.includes('academic')}
-                onChange={handleFilterChange}
-              />
-              В академе
-            </label>
-            <label>
-              <input
-                type="checkbox"
-                name="statuses"
-                value="graduated"
-                checked={filters.statuses.includes('graduated')}
-                onChange={handleFilterChange}
-              />
-              Выпускники
-            </label>
-            <label>
-              <input
-                type="checkbox"
-                name="statuses"
-                value="expelled"
-                checked={filters.statuses.includes('expelled')}
-                onChange={handleFilterChange}
-              />
-              Отчисленные
-            </label>
+            {renderChoices('statuses')}
           </div>
         </div>
 
         <div className="filter-section">
           <h3>Причина отчисления (если применимо)</h3>
           <div className="checkbox-group">
-            <label>
-              <input
-                type="checkbox"
-                name="expulsion_reasons"
-                value="own_desire"
-                checked={filters.expulsion_reasons.includes('own_desire')}
-                onChange={handleFilterChange}
-              />
-              По собственному желанию
-            </label>
-            <label>
-              <input
-                type="checkbox"
-                name="expulsion_reasons"
-                value="transfer"
-                checked={filters.expulsion_reasons.includes('transfer')}
-                onChange={handleFilterChange}
-              />
-              По переводу
-            </label>
-            <label>
-              <input
-                type="checkbox"
-                name="expulsion_reasons"
-                value="academic_failure"
-                checked={filters.expulsion_reasons.includes('academic_failure')}
-                onChange={handleFilterChange}
-              />
-              За неуспеваемость
-            </label>
+            {renderChoices('expulsion_reasons')}
           </div>
         </div>
 
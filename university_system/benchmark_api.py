@@ -0,0 +1,217 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'university_system.settings')
+django.setup()
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from students.metrics import quantile
+from students.models import Program
+
+# Размеры базы по умолчанию и seed генерации
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000]
+DEFAULT_SEED = 20240901
+DEFAULT_REPEAT = 20
+# Фронтенд запрашивает реестр целиком; на 1M строк это гигабайты JSON,
+# поэтому по умолчанию замеряется первая страница (--page-size 0 - без пагинации)
+DEFAULT_PAGE_SIZE = 100
+BENCHMARK_HOST = 'localhost'
+
+
+def frontend_scenarios(page_size):
+    """Запросы, которые отправляет React-приложение, на id из текущей базы"""
+    department_ids = list(Program.objects.exclude(department=None).order_by('department_id')
+                          .values_list('department_id', flat=True).distinct()[:2])
+    program_ids = list(Program.objects.filter(department_id__in=department_ids)
+                       .order_by('id').values_list('id', flat=True)[:3])
+    departments = ','.join(str(id) for id in department_ids)
+    programs = ','.join(str(id) for id in program_ids)
+    paging = {'page_size': page_size} if page_size else {}
+
+    students = [
+        ('без фильтров', {}),
+        ('статусы + причины отчисления', {'statuses': 'active,expelled', 'expulsion_reasons': 'own_desire,transfer'}),
+        ('период зачисления', {'start_date': '2020-01-01', 'end_date': '2020-12-31'}),
+        ('кафедры', {'current_departments': departments}),
+        ('кафедры + программы', {'current_departments': departments, 'current_programs': programs}),
+        ('в академе', {'in_academic': 'true'}),
+        ('тип обучения + основание + статусы', {'education_types': 'budget', 'admission_bases': 'target',
+                                                'statuses': 'active,academic'}),
+    ]
+    scenarios = [(f'students: {label}', 'student-list', {**params, **paging}) for label, params in students]
+    scenarios.append(('programs: department_id', 'program-list', {'department_id': departments}))
+    return scenarios
+
+
+def run_scenario(client, url_name, params, repeat, warm=False):
+    """Выполняет запрос repeat раз; без warm кеш очищается перед каждым запросом"""
+    url = reverse(url_name)
+    latencies = []
+    for _ in range(max(repeat, 1)):
+        if not warm:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url, params)
+            content = response.content
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        'url': url,
+        'params': params,
+        'status': response.status_code,
+        'response_bytes': len(content),
+        'queries': len(queries),
+        'latency_ms': {
+            'p50': round(quantile(latencies, 0.5), 3),
+            'p90': round(quantile(latencies, 0.9), 3),
+            'p99': round(quantile(latencies, 0.99), 3),
+            'max': round(max(latencies), 3),
+            'mean': round(sum(latencies) / len(latencies), 3),
+        },
+    }
+
+
+def run_benchmarks(repeat, page_size, warm=False):
+    client = Client(HTTP_HOST=BENCHMARK_HOST)
+    return [
+        {'name': name, **run_scenario(client, url_name, params, repeat, warm)}
+        for name, url_name, params in frontend_scenarios(page_size)
+    ]
+
+
+def peak_rss_kb():
+    # На Linux ru_maxrss в килобайтах, на macOS - в байтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def use_database(path):
+    """Переключает соединение default на отдельный файл SQLite"""
+    connection.close()
+    connection.settings_dict['NAME'] = str(path)
+
+
+def prepare_database(scale, seed, db_dir, workers):
+    """Создает базу нужного размера или переиспользует готовую с тем же seed"""
+    import populate_db
+
+    path = Path(db_dir) / f'students_{scale}_{seed}.sqlite3'
+    marker = path.with_suffix('.json')
+    if path.exists() and marker.exists() and json.loads(marker.read_text()) == {'scale': scale, 'seed': seed}:
+        use_database(path)
+        return path, None
+
+    path.unlink(missing_ok=True)
+    marker.unlink(missing_ok=True)
+    use_database(path)
+    start = time.perf_counter()
+    # Вывод генератора уходит в stderr, чтобы в stdout был только JSON
+    with redirect_stdout(sys.stderr):
+        call_command('migrate', verbosity=0)
+        populate_db.create_reference_data()
+        populate_db.create_random_students(scale, workers=workers, seed=seed)
+    marker.write_text(json.dumps({'scale': scale, 'seed': seed}))
+    return path, time.perf_counter() - start
+
+
+def run_scale(scale, args):
+    path, seed_seconds = prepare_database(scale, args.seed, args.db_dir, args.workers)
+    scenarios = run_benchmarks(args.repeat, args.page_size, args.warm)
+    return {
+        'scale': scale,
+        'database': str(path),
+        # Если база создавалась в этом же процессе, пик памяти включает генерацию
+        'seeded': seed_seconds is not None,
+        'seed_seconds': None if seed_seconds is None else round(seed_seconds, 1),
+        'peak_rss_kb': peak_rss_kb(),
+        'scenarios': scenarios,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Замер производительности API реестра студентов')
+    parser.add_argument('--scales', default=','.join(str(scale) for scale in DEFAULT_SCALES),
+                        help='Размеры базы через запятую')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Seed генерации студентов')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Повторов каждого запроса')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help='page_size для реестра студентов, 0 - весь список')
+    parser.add_argument('--warm', action='store_true', help='Не очищать кеш перед запросами')
+    parser.add_argument('--workers', type=int, default=1, help='Процессов для генерации данных')
+    parser.add_argument('--db-dir', default=os.path.join(tempfile.gettempdir(), 'university_benchmark'),
+                        help='Каталог для баз; готовые базы с тем же размером и seed переиспользуются')
+    parser.add_argument('--output', default=None, help='Файл для JSON-отчета (по умолчанию stdout)')
+    args = parser.parse_args(argv)
+    args.scales = [int(scale) for scale in args.scales.split(',') if scale]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    Path(args.db_dir).mkdir(parents=True, exist_ok=True)
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = [BENCHMARK_HOST]
+
+    if len(args.scales) == 1:
+        results = [run_scale(args.scales[0], args)]
+    else:
+        # Каждый размер - в отдельном процессе, чтобы пик RSS не накапливался
+        results = []
+        for scale in args.scales:
+            with tempfile.NamedTemporaryFile(suffix='.json') as output:
+                child_args = [sys.executable, os.path.abspath(__file__), '--scales', str(scale),
+                              '--seed', str(args.seed), '--repeat', str(args.repeat),
+                              '--page-size', str(args.page_size), '--workers', str(args.workers),
+                              '--db-dir', args.db_dir, '--output', output.name]
+                if args.warm:
+                    child_args.append('--warm')
+                subprocess.run(child_args, check=True)
+                results.extend(json.loads(Path(output.name).read_text())['results'])
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'page_size': args.page_size,
+        'warm_cache': args.warm,
+        'results': results,
+    }
+    data = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(data + '\n', encoding='utf-8')
+    else:
+        print(data)
+
+
+if __name__ == '__main__':
+    main()
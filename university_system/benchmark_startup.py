@@ -0,0 +1,128 @@
+"""Замер холодного старта процесса API для профилей настроек.
+
+Каждый запуск - новый процесс python, который поднимает WSGI-приложение
+и загружает все URL (а значит, все представления), как воркер gunicorn
+перед первым запросом. Для каждого профиля замеряются время до готовности
+и пик RSS (медиана по повторам), а один дополнительный запуск с
+python -X importtime показывает, какие импорты занимают больше всего времени.
+
+    python benchmark_startup.py --repeat 10
+    python benchmark_startup.py --profiles university_system.settings_api --top 30
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+DEFAULT_PROFILES = ['university_system.settings', 'university_system.settings_api']
+DEFAULT_REPEAT = 5
+DEFAULT_TOP = 15
+# Тяжелые необязательные зависимости: API-процесс при старте их не загружает.
+# Модули django.contrib.admin в sys.modules есть в любом профиле - их
+# импортирует rest_framework.views (через rest_framework.schemas), поэтому
+# профиль сравнивается по списку приложений, а не по модулям админки
+WATCHED_MODULES = ['pandas', 'faker', 'openpyxl']
+
+# Код дочернего процесса: старт приложения и отчет о памяти и модулях
+CHILD_CODE = f'''
+import json, resource, sys
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.apps import apps
+from django.urls import get_resolver
+get_resolver().url_patterns
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    'peak_rss_kb': peak // 1024 if sys.platform == 'darwin' else peak,
+    'modules': len(sys.modules),
+    'apps': [config.name for config in apps.get_app_configs()],
+    'loaded': [name for name in {WATCHED_MODULES!r} if name in sys.modules],
+}}))
+'''
+
+
+def run_child(profile, importtime=False):
+    """Запускает процесс с профилем; возвращает (секунды, отчет процесса, stderr)"""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': profile}
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', CHILD_CODE]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=BASE_DIR, env=env, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def parse_importtime(stderr):
+    """Строки -X importtime верхнего уровня: [(модуль, суммарные мкс)]"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Вложенные импорты выводятся с отступом, их время уже учтено в родителе
+        if not name.startswith('  '):
+            imports.append((name.strip(), int(cumulative)))
+    return imports
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def measure_profile(profile, repeat, top):
+    runs = [run_child(profile) for _ in range(max(repeat, 1))]
+    _, report, stderr = run_child(profile, importtime=True)
+    imports = parse_importtime(stderr)
+    return {
+        'profile': profile,
+        'startup_ms': {
+            'median': round(median([elapsed for elapsed, _, _ in runs]) * 1000, 1),
+            'min': round(min(elapsed for elapsed, _, _ in runs) * 1000, 1),
+        },
+        'peak_rss_kb': median([child['peak_rss_kb'] for _, child, _ in runs]),
+        'modules': report['modules'],
+        'installed_apps': report['apps'],
+        'loaded_watched_modules': report['loaded'],
+        'import_ms': round(sum(cumulative for _, cumulative in imports) / 1000, 1),
+        'top_imports_ms': [
+            {'module': name, 'ms': round(cumulative / 1000, 1)}
+            for name, cumulative in sorted(imports, key=lambda item: -item[1])[:top]
+        ],
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Замер холодного старта процесса API')
+    parser.add_argument('--profiles', default=','.join(DEFAULT_PROFILES),
+                        help='Модули настроек через запятую')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Запусков на профиль')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='Сколько самых долгих импортов выводить')
+    parser.add_argument('--output', default=None, help='Файл для JSON-отчета (по умолчанию stdout)')
+    args = parser.parse_args(argv)
+    args.profiles = [profile for profile in args.profiles.split(',') if profile]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {
+        'python': platform.python_version(),
+        'repeat': args.repeat,
+        'results': [measure_profile(profile, args.repeat, args.top) for profile in args.profiles],
+    }
+    data = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(data + '\n', encoding='utf-8')
+    else:
+        print(data)
+
+
+if __name__ == '__main__':
+    main()
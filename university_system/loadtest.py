@@ -0,0 +1,140 @@
+"""Нагрузочный тест API: N одновременных клиентов с keep-alive, отчет в JSON.
+
+Сравнение WSGI и ASGI на одних и тех же данных:
+
+    gunicorn -w 4 --threads 8 university_system.wsgi -b 127.0.0.1:8000
+    python loadtest.py --url http://127.0.0.1:8000/api/students/?page_size=100 --concurrency 200
+
+    uvicorn --workers 4 university_system.asgi:application --port 8000
+    python loadtest.py --url http://127.0.0.1:8000/api/async/students/?page_size=100 --concurrency 200
+
+Медленную выгрузку удобно давать фоном (--url можно повторять), чтобы
+увидеть, как она влияет на задержки остальных запросов.
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from students.metrics import quantile
+
+
+async def read_response(reader):
+    """Читает ответ HTTP/1.1; возвращает статус, размер тела и нужно ли закрыть соединение"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Соединение закрыто сервером')
+    version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    size = 0
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            chunk_size = int((await reader.readline()).split(b';')[0], 16)
+            if chunk_size:
+                size += len(await reader.readexactly(chunk_size))
+            await reader.readline()
+            if not chunk_size:
+                break
+    elif 'content-length' in headers:
+        size = len(await reader.readexactly(int(headers['content-length'])))
+    else:
+        size = len(await reader.read())
+        return int(status), size, True
+
+    close = headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+    return int(status), size, close
+
+
+async def client(url, deadline, stats):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = (f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+               f'Accept: application/json\r\nConnection: keep-alive\r\n\r\n').encode('latin-1')
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            status, size, close = await read_response(reader)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as error:
+            stats['errors'].append(type(error).__name__)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.01)
+            continue
+        stats['latencies'].append((time.perf_counter() - start) * 1000)
+        stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+        stats['bytes'] += size
+        if close:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(urls, concurrency, duration):
+    deadline = time.perf_counter() + duration
+    stats = {url: {'latencies': [], 'statuses': {}, 'errors': [], 'bytes': 0} for url in urls}
+    # Клиенты распределяются по адресам по кругу
+    tasks = [client(urls[i % len(urls)], deadline, stats[urls[i % len(urls)]]) for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    return stats, time.perf_counter() - start
+
+
+def summarize(stats, elapsed):
+    report = {}
+    for url, data in stats.items():
+        latencies = sorted(data['latencies'])
+        report[url] = {
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / elapsed, 1),
+            'statuses': {str(status): count for status, count in sorted(data['statuses'].items())},
+            'errors': len(data['errors']),
+            'bytes': data['bytes'],
+            'latency_ms': {
+                'p50': round(quantile(latencies, 0.5), 3),
+                'p90': round(quantile(latencies, 0.9), 3),
+                'p99': round(quantile(latencies, 0.99), 3),
+                'max': round(latencies[-1], 3) if latencies else 0,
+            },
+        }
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест API реестра студентов')
+    parser.add_argument('--url', action='append', required=True, help='Адрес запроса (можно повторять)')
+    parser.add_argument('--concurrency', type=int, default=100, help='Одновременных клиентов')
+    parser.add_argument('--duration', type=float, default=30, help='Длительность в секундах')
+    parser.add_argument('--output', default=None, help='Файл для JSON-отчета (по умолчанию stdout)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    stats, elapsed = asyncio.run(run(args.url, args.concurrency, args.duration))
+    report = {
+        'concurrency': args.concurrency,
+        'duration_seconds': round(elapsed, 2),
+        'results': summarize(stats, elapsed),
+    }
+    data = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            output.write(data + '\n')
+    else:
+        print(data)
@@ -1,18 +1,23 @@
+import argparse
+import multiprocessing
 import os
 import django
-import pandas as pd
 import random
 from datetime import datetime, timedelta
-from django.core.exceptions import ObjectDoesNotExist
-from faker import Faker
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'university_system.settings')
 django.setup()
 
+from django.db import connections, transaction
+from students.cache import bump_reference_version, bump_student_generation
+from students.cohorts import mark_all_cohorts_stale
+from students.counters import rebuild_counters
 from students.models import Department, ProgramGroup, Program, Student
+from students.transfers import create_transfer_events
 
-# Инициализация Faker для генерации случайных данных
-fake = Faker('ru_RU')
+# pandas и Faker импортируются в функциях, которые их используют: без файла
+# со специальностями pandas не нужен, а импорт модуля (бенчмарк, тесты)
+# не должен платить за обе библиотеки
 
 # Конфигурация соответствия кодов групп специальностей и кафедр
 DEPARTMENT_MAPPING = {
@@ -31,6 +36,9 @@ DEPARTMENT_MAPPING = {
     '5.9': 'ЛГ',  # Филология
 }
 
+# Размер пачки для bulk_create при генерации студентов
+STUDENT_BATCH_SIZE = 5000
+
 
 def create_departments():
     departments_data = [
@@ -77,15 +85,23 @@ def create_program_groups():
     print(f"Создано {len(groups_data)} групп специальностей")
 
 
-def determine_department(code):
-    """Определяет кафедру на основе кода специальности"""
+def determine_department(code, departments_by_code=None):
+    """Определяет кафедру на основе кода специальности.
+
+    departments_by_code - заранее загруженный словарь {код: кафедра}, чтобы
+    не обращаться к БД для каждой строки.
+    """
+    if departments_by_code is None:
+        departments_by_code = {d.code: d for d in Department.objects.order_by('id')}
+    default = next(iter(departments_by_code.values()), None)
     try:
-        if pd.isna(code):
-            return Department.objects.first()
+        # Пустая ячейка Excel приходит как None или NaN (NaN не равен себе)
+        if code is None or code != code:
+            return default
 
         code_str = str(code).strip()
         if not code_str or code_str == 'nan':
-            return Department.objects.first()
+            return default
 
         # Извлекаем группу (первые две цифры)
         parts = code_str.split('.')
@@ -95,91 +111,268 @@ def determine_department(code):
             group_code = code_str
 
         department_code = DEPARTMENT_MAPPING.get(group_code, 'КН')
-        return Department.objects.get(code=department_code)
+        return departments_by_code.get(department_code, default)
     except Exception as e:
         print(f"Ошибка определения кафедры для кода {code}: {e}")
-        return Department.objects.first()
+        return default
+
+
+# Столбцы листа со специальностями
+PROGRAM_COLUMNS = ['code', 'direction', 'old_code', 'program_name']
+# Поля программы, которые обновляются при повторном импорте
+PROGRAM_UPDATE_FIELDS = ['old_code', 'name', 'program_name', 'group', 'department', 'education_level']
+
+
+def _two_part_code(codes):
+    """Первые две части кода: '1.2.2 (05.13.18)' -> '1.2'"""
+    return codes.str.split('.').str[:2].str.join('.')
+
+
+def prepare_programs_frame(df, groups, departments):
+    """Очищает строки листа и сопоставляет их с группами и кафедрами.
+
+    Все преобразования выполняются над столбцами целиком. groups и
+    departments - таблицы (code, group_id) и (code, department_id).
+    Возвращает принятые строки и отклоненные с причиной в столбце reason.
+    """
+    import pandas as pd
+
+    df = df.copy()
+    df.columns = PROGRAM_COLUMNS
+
+    # Пропускаем пустые строки
+    df = df[df['code'].notna() | df['old_code'].notna()]
+    for column in PROGRAM_COLUMNS:
+        df[column] = df[column].where(df[column].notna(), '').astype(str).str.strip()
+
+    # Если нет кода, но есть старый код, используем его первую часть
+    no_code = (df['code'] == '') & (df['old_code'] != '')
+    df.loc[no_code, 'code'] = df.loc[no_code, 'old_code'].str.split(' ').str[0]
+
+    # Группа специальностей: из старого кода, иначе из нового
+    source = df['old_code'].where(df['old_code'].str.contains('.', regex=False), df['code'])
+    df['group_code'] = _two_part_code(source.where(source.str.contains('.', regex=False)))
+
+    # Кафедра определяется по группе кода так же, как в determine_department
+    department_source = df['old_code'].where(df['old_code'] != '', df['code'])
+    df['department_code'] = _two_part_code(department_source).map(DEPARTMENT_MAPPING).fillna('КН')
+
+    df = df.join(groups.drop_duplicates('code').set_index('code'), on='group_code')
+    df = df.join(departments.drop_duplicates('code').set_index('code'), on='department_code')
+    default_department_id = departments['department_id'].iloc[0] if len(departments) else None
+    df['department_id'] = df['department_id'].fillna(default_department_id)
+
+    no_group_code = df['group_code'].isna()
+    unknown_group = ~no_group_code & df['group_id'].isna()
+    duplicate = ~no_group_code & ~unknown_group & df.duplicated('code')
+
+    reasons = pd.Series('', index=df.index)
+    reasons[no_group_code] = 'Не удалось определить группу'
+    reasons[unknown_group] = 'Группа ' + df.loc[unknown_group, 'group_code'] + ' не найдена'
+    reasons[duplicate] = 'Код ' + df.loc[duplicate, 'code'] + ' уже встречался в файле'
+
+    rejected = reasons != ''
+    rejects = df.loc[rejected, ['code', 'old_code', 'program_name']].assign(reason=reasons[rejected])
+    return df[~rejected], rejects
+
+
+def import_programs(df):
+    """Загружает программы из таблицы листа одним upsert по коду.
+
+    Повторный импорт того же или обновленного файла обновляет существующие
+    программы, а не создает дубликаты.
+    """
+    import pandas as pd
+
+    # Справочники загружаем один раз в виде таблиц для соединения
+    groups = pd.DataFrame(ProgramGroup.objects.order_by('id').values_list('code', 'id'),
+                          columns=['code', 'group_id'])
+    departments = pd.DataFrame(Department.objects.order_by('id').values_list('code', 'id'),
+                               columns=['code', 'department_id'])
+    accepted, rejects = prepare_programs_frame(df, groups, departments)
+
+    programs = [
+        Program(
+            code=row.code,
+            old_code=row.old_code,
+            name=row.direction,
+            program_name=row.program_name,
+            group_id=int(row.group_id),
+            department_id=None if pd.isna(row.department_id) else int(row.department_id),
+            education_level='postgraduate',
+        )
+        for row in accepted.itertuples(index=False)
+    ]
+    Program.objects.bulk_create(
+        programs,
+        update_conflicts=True,
+        unique_fields=['code'],
+        update_fields=PROGRAM_UPDATE_FIELDS,
+    )
+    # bulk_create не отправляет сигналы, поэтому версию справочников сдвигаем
+    # явно - после COMMIT, если импорт идет внутри транзакции
+    transaction.on_commit(bump_reference_version)
+    return len(programs), rejects
 
 
 def create_programs_from_excel(file_path):
-    """Создает программы из Excel файла"""
+    """Создает или обновляет программы из Excel файла"""
+    import pandas as pd
+
     try:
         # Читаем Excel файл, пропуская первые 3 строки (заголовки)
         df = pd.read_excel(file_path, sheet_name='Для стипендиата', header=2)
-        created_count = 0
-
-        # Переименовываем столбцы для удобства
-        df.columns = ['code', 'direction', 'old_code', 'program_name']
-
-        for index, row in df.iterrows():
-            try:
-                # Пропускаем пустые строки
-                if pd.isna(row['code']) and pd.isna(row['old_code']):
-                    continue
-
-                # Обрабатываем данные
-                code = str(row['code']).strip() if pd.notna(row['code']) else ""
-                old_code = str(row['old_code']).strip() if pd.notna(row['old_code']) else ""
-                direction = str(row['direction']).strip() if pd.notna(row['direction']) else ""
-                program_name = str(row['program_name']).strip() if pd.notna(row['program_name']) else ""
-
-                # Если нет кода, но есть старый код, используем его
-                if not code and old_code:
-                    code = old_code.split(' ')[0] if ' ' in old_code else old_code
-
-                # Определяем группу специальностей
-                group_code = None
-                if old_code and '.' in old_code:
-                    group_code = '.'.join(old_code.split('.')[:2])
-                elif code and '.' in code:
-                    group_code = '.'.join(code.split('.')[:2])
-
-                if not group_code:
-                    print(f"Не удалось определить группу для строки {index}, пропускаем")
-                    continue
-
-                try:
-                    group = ProgramGroup.objects.get(code=group_code)
-                except ObjectDoesNotExist:
-                    print(f"Группа {group_code} не найдена, пропускаем строку {index}")
-                    continue
-
-                # Определяем кафедру
-                department = determine_department(old_code if old_code else code)
-
-                # Создаем программу
-                Program.objects.get_or_create(
-                    code=code,
-                    defaults={
-                        'old_code': old_code,
-                        'name': direction,
-                        'program_name': program_name,
-                        'group': group,
-                        'department': department,
-                        'education_level': 'postgraduate'
-                    }
-                )
-                created_count += 1
-
-            except Exception as e:
-                print(f"Ошибка при обработке строки {index + 3}: {e}")
-                continue
-
-        print(f"Создано {created_count} программ")
-        return created_count
-
     except Exception as e:
         print(f"Ошибка при чтении файла Excel: {e}")
         return 0
 
+    imported_count, rejects = import_programs(df)
+    for index, reject in rejects.iterrows():
+        print(f"Строка {index}: {reject['reason']}, пропускаем")
+
+    print(f"Загружено {imported_count} программ, отклонено {len(rejects)} строк")
+    return imported_count
+
+
+CITIZENSHIPS = ['Россия', 'Казахстан', 'Беларусь', 'Узбекистан', 'Армения']
+STATUSES = ['active', 'academic', 'graduated', 'expelled']
+EXPULSION_REASONS = ['own_desire', 'transfer', 'academic_failure', 'other']
+
+# Данные для генерации в текущем процессе (задаются init_generator)
+_generator_context = None
+
+
+def build_program_index(programs):
+    """Группирует программы по кафедрам.
+
+    programs - список пар (program_id, department_id). Возвращает
+    {department_id: [program_id]} и {department_id: [кафедры для перевода]} -
+    другие кафедры, у которых есть программы.
+    """
+    programs_by_department = {}
+    for program_id, department_id in programs:
+        programs_by_department.setdefault(department_id, []).append(program_id)
+    transfer_targets = {
+        department_id: [d for d in programs_by_department if d is not None and d != department_id]
+        for department_id in programs_by_department
+    }
+    return programs_by_department, transfer_targets
+
+
+def build_random_student(rng, faker, programs, programs_by_department, transfer_targets):
+    """Генерирует поля студента со случайными данными.
+
+    Все случайные значения берутся из rng и faker, поэтому результат
+    определяется их начальным состоянием.
+    """
+    program_id, department_id = rng.choice(programs)
+
+    # Основные данные
+    student_data = {
+        'last_name': faker.last_name(),
+        'first_name': faker.first_name(),
+        'middle_name': faker.middle_name(),
+        'citizenship': rng.choice(CITIZENSHIPS),
+        'enrollment_date': faker.date_between_dates(
+            date_start=datetime(2018, 1, 1),
+            date_end=datetime(2023, 12, 31)
+        ),
+        'initial_department_id': department_id,
+        'initial_program_id': program_id,
+        'current_department_id': department_id,
+        'current_program_id': program_id,
+        'education_type': rng.choice(['budget', 'contract']),
+        'admission_basis': rng.choice(['general', 'target', 'quota']),
+        'status': rng.choice(STATUSES),
+    }
+
+    # Для отчисленных студентов
+    if student_data['status'] == 'expelled':
+        student_data['expulsion_date'] = faker.date_between_dates(
+            date_start=student_data['enrollment_date'],
+            date_end=datetime(2023, 12, 31)
+        )
+        student_data['expulsion_reason'] = rng.choice(EXPULSION_REASONS)
+
+    # Для выпускников
+    elif student_data['status'] == 'graduated':
+        student_data['graduation_date'] = faker.date_between_dates(
+            date_start=student_data['enrollment_date'],
+            date_end=datetime(2023, 12, 31)
+        )
+
+    # Для студентов в академе
+    elif student_data['status'] == 'academic':
+        student_data['academic_leave_start'] = faker.date_between_dates(
+            date_start=student_data['enrollment_date'],
+            date_end=datetime(2023, 12, 31)
+        )
+        student_data['academic_leave_end'] = faker.date_between_dates(
+            date_start=student_data['academic_leave_start'],
+            date_end=datetime(2024, 12, 31)
+        )
+
+    # История переводов (30% студентов)
+    transfer_departments = transfer_targets[department_id]
+    if rng.random() < 0.3 and transfer_departments:
+        new_department_id = rng.choice(transfer_departments)
+        new_program_id = rng.choice(programs_by_department[new_department_id])
+        transfer_date = faker.date_between_dates(
+            date_start=student_data['enrollment_date'],
+            date_end=datetime(2023, 12, 31)
+        )
+
+        student_data['current_department_id'] = new_department_id
+        student_data['current_program_id'] = new_program_id
+        student_data['transfer_history'] = [{
+            'date': transfer_date.strftime('%Y-%m-%d'),
+            'from': program_id,
+            'to': new_program_id
+        }]
+
+    return student_data
+
 
-def create_random_students(num_students=50):
-    """Создает тестовых студентов со случайными данными"""
-    programs = list(Program.objects.all())
-    departments = list(Department.objects.all())
-    citizenships = ['Россия', 'Казахстан', 'Беларусь', 'Узбекистан', 'Армения']
-    statuses = ['active', 'academic', 'graduated', 'expelled']
-    expulsion_reasons = ['own_desire', 'transfer', 'academic_failure', 'other']
+def init_generator(programs):
+    """Готовит данные для генерации; вызывается в каждом процессе пула"""
+    from faker import Faker
+
+    global _generator_context
+    programs_by_department, transfer_targets = build_program_index(programs)
+    _generator_context = (programs, programs_by_department, transfer_targets, Faker('ru_RU'))
+
+
+def generate_student_batch(task):
+    """Генерирует пачку студентов по заданию (seed пачки, размер пачки)"""
+    batch_seed, count = task
+    programs, programs_by_department, transfer_targets, fake = _generator_context
+    rng = random.Random(batch_seed)
+    fake.seed_instance(batch_seed)
+    return [
+        build_random_student(rng, fake, programs, programs_by_department, transfer_targets)
+        for _ in range(count)
+    ]
+
+
+def plan_student_batches(num_students, batch_size, seed):
+    """Делит генерацию на пачки, у каждой свой seed, производный от общего.
+
+    Результат зависит только от общего seed и размера пачки, поэтому не
+    меняется от числа процессов, которые генерируют пачки.
+    """
+    return [
+        (f'{seed}:{index}', min(batch_size, num_students - offset))
+        for index, offset in enumerate(range(0, num_students, batch_size))
+    ]
+
+
+def create_random_students(num_students=50, batch_size=STUDENT_BATCH_SIZE, workers=1, seed=None):
+    """Создает тестовых студентов со случайными данными.
+
+    Пачки генерируются в workers процессах и последовательно записываются
+    через bulk_create одним процессом, чтобы запись в SQLite не конкурировала.
+    """
+    programs = list(Program.objects.values_list('id', 'department_id'))
 
     if not programs:
         print("Нет программ для привязки студентов! Создаем временные программы...")
@@ -194,88 +387,65 @@ def create_random_students(num_students=50):
             department=department,
             education_level='postgraduate'
         )
-        programs = list(Program.objects.all())
+        programs = list(Program.objects.values_list('id', 'department_id'))
+
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    print(f"Seed генерации: {seed}")
+    tasks = plan_student_batches(num_students, batch_size, seed)
+    # Переводы генерируются только между этими программами
+    program_ids = {program_id for program_id, _ in programs}
+
+    if workers > 1:
+        # Дочерние процессы не работают с БД, унаследованные соединения им не нужны
+        connections.close_all()
+        with multiprocessing.Pool(workers, initializer=init_generator, initargs=(programs,)) as pool:
+            created_count = write_student_batches(pool.imap(generate_student_batch, tasks), num_students,
+                                                  program_ids)
+    else:
+        init_generator(programs)
+        created_count = write_student_batches(map(generate_student_batch, tasks), num_students, program_ids)
 
-    created_count = 0
-    for _ in range(num_students):
-        try:
-            program = random.choice(programs)
-            department = program.department
-
-            # Основные данные
-            student_data = {
-                'last_name': fake.last_name(),
-                'first_name': fake.first_name(),
-                'middle_name': fake.middle_name(),
-                'citizenship': random.choice(citizenships),
-                'enrollment_date': fake.date_between_dates(
-                    date_start=datetime(2018, 1, 1),
-                    date_end=datetime(2023, 12, 31)
-                ),
-                'initial_department': department,
-                'initial_program': program,
-                'current_department': department,
-                'current_program': program,
-                'education_type': random.choice(['budget', 'contract']),
-                'admission_basis': random.choice(['general', 'target', 'quota']),
-                'status': random.choice(statuses),
-            }
+    print(f"Создано {created_count} тестовых студентов")
+    return created_count
 
-            # Для отчисленных студентов
-            if student_data['status'] == 'expelled':
-                student_data['expulsion_date'] = fake.date_between_dates(
-                    date_start=student_data['enrollment_date'],
-                    date_end=datetime(2023, 12, 31)
-                )
-                student_data['expulsion_reason'] = random.choice(expulsion_reasons)
-
-            # Для выпускников
-            elif student_data['status'] == 'graduated':
-                student_data['graduation_date'] = fake.date_between_dates(
-                    date_start=student_data['enrollment_date'],
-                    date_end=datetime(2023, 12, 31)
-                )
-
-            # Для студентов в академе
-            elif student_data['status'] == 'academic':
-                student_data['academic_leave_start'] = fake.date_between_dates(
-                    date_start=student_data['enrollment_date'],
-                    date_end=datetime(2023, 12, 31)
-                )
-                student_data['academic_leave_end'] = fake.date_between_dates(
-                    date_start=student_data['academic_leave_start'],
-                    date_end=datetime(2024, 12, 31)
-                )
-
-            # История переводов (30% студентов)
-            if random.random() < 0.3 and len(departments) > 1:
-                new_dept = random.choice([d for d in departments if d != department])
-                new_program = random.choice([p for p in programs if p.department == new_dept])
-                transfer_date = fake.date_between_dates(
-                    date_start=student_data['enrollment_date'],
-                    date_end=datetime(2023, 12, 31)
-                )
-
-                student_data['current_department'] = new_dept
-                student_data['current_program'] = new_program
-                student_data['transfer_history'] = [{
-                    'date': transfer_date.strftime('%Y-%m-%d'),
-                    'from': program.id,
-                    'to': new_program.id
-                }]
-
-            Student.objects.create(**student_data)
-            created_count += 1
-        except Exception as e:
-            print(f"Ошибка при создании студента: {e}")
 
-    print(f"Создано {created_count} тестовых студентов")
+def write_student_batches(batches, num_students, program_ids=None):
+    """Записывает пачки по мере готовности в одной транзакции"""
+    created_count = 0
+    with transaction.atomic():
+        for batch in batches:
+            students = Student.objects.bulk_create([Student(**data) for data in batch], batch_size=len(batch))
+            create_transfer_events(students, program_ids)
+            created_count += len(batch)
+            print(f"Создано {created_count} из {num_students} студентов")
+        # Один пересчет счетчиков дешевле инкрементов по каждой пачке
+        rebuild_counters()
+        mark_all_cohorts_stale()
+
+    # bulk_create не отправляет сигналы, поэтому кеш выборок сбрасываем явно
+    bump_student_generation()
     return created_count
 
 
-if __name__ == '__main__':
-    print("Начало заполнения базы данных...")
+def parse_args():
+    parser = argparse.ArgumentParser(description='Заполнение базы данных тестовыми данными')
+    parser.add_argument('--count', type=int, default=100, help='Количество создаваемых студентов')
+    parser.add_argument('--batch-size', type=int, default=STUDENT_BATCH_SIZE,
+                        help='Размер пачки для bulk_create')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Количество процессов для генерации данных')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Начальное значение генератора для воспроизводимых данных')
+    return parser.parse_args()
+
+
+# Файл со специальностями, из которого загружаются программы
+PROGRAMS_EXCEL_FILE = 'Специальности (2).xlsx'
 
+
+def create_reference_data(excel_file=PROGRAMS_EXCEL_FILE):
+    """Создает кафедры, группы специальностей и программы"""
     # Создаем кафедры
     create_departments()
 
@@ -283,7 +453,6 @@ if __name__ == '__main__':
     create_program_groups()
 
     # Импортируем программы из Excel
-    excel_file = 'Специальности (2).xlsx'
     if os.path.exists(excel_file):
         print(f"Чтение данных из файла {excel_file}...")
         create_programs_from_excel(excel_file)
@@ -292,25 +461,36 @@ if __name__ == '__main__':
         # Создаем несколько тестовых программ, если файл не найден
         department = Department.objects.first()
         group = ProgramGroup.objects.first()
-        Program.objects.create(
+        Program.objects.get_or_create(
             code="01.00.00",
-            name="Тестовая программа 1",
-            program_name="Тестовая образовательная программа 1",
-            group=group,
-            department=department,
-            education_level='postgraduate'
+            defaults={
+                'name': "Тестовая программа 1",
+                'program_name': "Тестовая образовательная программа 1",
+                'group': group,
+                'department': department,
+                'education_level': 'postgraduate'
+            }
         )
-        Program.objects.create(
+        Program.objects.get_or_create(
             code="02.00.00",
-            name="Тестовая программа 2",
-            program_name="Тестовая образовательная программа 2",
-            group=group,
-            department=department,
-            education_level='postgraduate'
+            defaults={
+                'name': "Тестовая программа 2",
+                'program_name': "Тестовая образовательная программа 2",
+                'group': group,
+                'department': department,
+                'education_level': 'postgraduate'
+            }
         )
 
+
+if __name__ == '__main__':
+    args = parse_args()
+    print("Начало заполнения базы данных...")
+
+    create_reference_data()
+
     # Создаем тестовых студентов
     print("Создание тестовых студентов...")
-    create_random_students(100)  # Можно изменить количество студентов
+    create_random_students(args.count, args.batch_size, args.workers, args.seed)
 
-    print("Заполнение базы данных завершено.")
\ No newline at end of file
+    print("Заполнение базы данных завершено.")
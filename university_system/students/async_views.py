@@ -0,0 +1,153 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.request import Request
+
+from .cache import REFERENCE_CACHE_TIMEOUT, reference_cache_state
+from .counters import annotate_student_counts
+from .export import EXPORT_FORMATS, csv_response, xlsx_response
+from .filters import build_student_filter
+from .models import Department, Student
+from .pagination import STUDENT_ORDERING
+from .rows import FastJSONRenderer
+from .serializers import DepartmentCountsSerializer, ProgramCountsSerializer
+from .snapshots import parse_as_of, snapshot_shape
+from .shapes import parse_fields, parse_shape
+from .views import DepartmentListView, ProgramListView, cached_student_list, program_cache_variant, program_queryset
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def error_response(exc):
+    """Ответ об ошибке в том же виде, что и обработчик исключений DRF"""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return json_response(data, exc.status_code)
+
+
+def is_true(value):
+    return value.lower() in ('1', 'true')
+
+
+async def fetch(queryset):
+    return [row async for row in queryset]
+
+
+class AsyncAPIView(View):
+    """Асинхронный view с ошибками в формате DRF.
+
+    Запрос оборачивается в rest_framework.request.Request только ради
+    query_params, которые ждут общие с синхронными view функции.
+    """
+
+    async def get(self, request):
+        try:
+            return await self.handle(Request(request))
+        except APIException as exc:
+            return error_response(exc)
+
+
+class AsyncStudentListView(AsyncAPIView):
+    """Асинхронный вариант StudentListView с теми же параметрами и ответом,
+    кроме ?stream= (потоковая выгрузка - только в синхронном списке).
+
+    С ?with_count=1 в ответ добавляется count - число студентов под
+    фильтром. Асинхронный ORM Django выполняет все запросы по очереди в
+    одном потоке, поэтому кеш и сборка ответа - та же синхронная
+    cached_student_list за один вызов sync_to_async.
+    """
+
+    async def handle(self, request):
+        params = request.query_params
+        if params.get('stream'):
+            raise ValidationError({'stream': 'Потоковая выгрузка доступна только в /api/students/'})
+        shape = parse_shape(params)
+        fields = parse_fields(params)
+        as_of = parse_as_of(params)
+        if as_of is not None:
+            shape = snapshot_shape(params)
+        with_count = is_true(params.get('with_count', ''))
+
+        data, cache_status = await sync_to_async(cached_student_list)(request, shape, fields, as_of, with_count)
+        response = json_response(data)
+        response['X-Cache'] = cache_status
+        return response
+
+
+class AsyncReferenceListView(AsyncAPIView):
+    """Асинхронный вариант CachedReferenceListMixin: тот же кеш, ETag и 304.
+
+    Подклассы задают get_queryset(params) - запрос справочника по параметрам.
+    """
+    cache_endpoint = None
+    row_serializer = None
+    counts_serializer_class = None
+
+    def get_cache_variant(self, params):
+        return 'all'
+
+    async def handle(self, request):
+        params = request.query_params
+        with_counts = is_true(params.get('with_counts', ''))
+        # Версия справочников и поколение студентов читаются из кеша синхронно
+        cache_key, etag, last_modified = await sync_to_async(reference_cache_state)(
+            self.cache_endpoint, self.get_cache_variant(params), with_counts)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        data = await cache.aget(cache_key)
+        if data is None:
+            queryset = self.get_queryset(params)
+            if with_counts:
+                data = self.counts_serializer_class(await fetch(annotate_student_counts(queryset)), many=True).data
+            else:
+                data = self.row_serializer.to_representation(await fetch(self.row_serializer.values_list(queryset)))
+            await cache.aset(cache_key, data, REFERENCE_CACHE_TIMEOUT)
+
+        response = json_response(data)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class AsyncDepartmentListView(AsyncReferenceListView):
+    cache_endpoint = 'departments'
+    row_serializer = DepartmentListView.row_serializer
+    counts_serializer_class = DepartmentCountsSerializer
+
+    def get_queryset(self, params):
+        return Department.objects.all()
+
+
+class AsyncProgramListView(AsyncReferenceListView):
+    cache_endpoint = 'programs'
+    row_serializer = ProgramListView.row_serializer
+    counts_serializer_class = ProgramCountsSerializer
+
+    def get_cache_variant(self, params):
+        return program_cache_variant(params)
+
+    def get_queryset(self, params):
+        return program_queryset(params)
+
+
+class AsyncStudentExportView(AsyncAPIView):
+    """Асинхронная выгрузка: CSV читается через aiterator() и не держит поток,
+    XLSX собирается в потоке sync_to_async этого запроса"""
+
+    async def handle(self, request):
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in EXPORT_FORMATS:
+            raise ValidationError({'file_format': f'Допустимые форматы: {", ".join(EXPORT_FORMATS)}'})
+
+        queryset = Student.objects.filter(build_student_filter(request.query_params)).order_by(*STUDENT_ORDERING)
+        if file_format == 'xlsx':
+            return await sync_to_async(xlsx_response)(queryset)
+        return csv_response(queryset, asynchronous=True)
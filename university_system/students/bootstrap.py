@@ -0,0 +1,39 @@
+import hashlib
+import json
+
+from .filters import CHOICE_FIELDS
+from .models import Department, Program, Student
+
+
+def choice_metadata():
+    """Значения и подписи choices модели Student в порядке объявления"""
+    return {
+        param: [{'value': value, 'label': str(label)}
+                for value, label in Student._meta.get_field(field).flatchoices]
+        for param, field in CHOICE_FIELDS.items()
+    }
+
+
+# choices меняются только с кодом, поэтому их хеш входит в вариант ключа кеша:
+# после выкладки с новыми подписями старый ответ не найдется даже в общем кеше
+CHOICES_VARIANT = hashlib.md5(json.dumps(choice_metadata(), ensure_ascii=False).encode('utf-8'),
+                              usedforsecurity=False).hexdigest()[:12]
+
+
+def bootstrap_payload():
+    """Кафедры, программы по кафедрам и choices - все, что фронтенду нужно при загрузке.
+
+    Программы без кафедры не попадают в ответ: выбрать их через фильтр
+    по кафедрам нельзя. Ключи programs - id кафедр строками, как в JSON.
+    """
+    departments = [{'id': id, 'name': name} for id, name in Department.objects.order_by('id').values_list('id', 'name')]
+    programs = {}
+    rows = (Program.objects.exclude(department=None).order_by('department_id', 'id')
+            .values_list('id', 'name', 'code', 'department_id'))
+    for id, name, code, department_id in rows:
+        programs.setdefault(str(department_id), []).append({'id': id, 'name': name, 'code': code})
+    return {
+        'departments': departments,
+        'programs': programs,
+        'choices': choice_metadata(),
+    }
@@ -0,0 +1,240 @@
+import json
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .cache import bump_student_generation
+from .cohorts import mark_cohorts_stale
+from .counters import apply_counter_deltas, counter_key
+from .models import Department, Program, Student, TransferEvent
+from .serializers import TRANSFER_PROGRAM_FIELDS, StudentTransitionSerializer, StudentWriteSerializer
+from .transfers import create_transfer_events
+
+BULK_OPERATIONS = ('create', 'update', 'transition')
+# Ограничение размера пакета: все операции проверяются и применяются в одной транзакции
+BULK_MAX_OPERATIONS = 5000
+BULK_BATCH_SIZE = 500
+
+# Поля, обязательные для статуса, и поля, допустимые только в нем
+STATUS_REQUIRED_FIELDS = {
+    'expelled': ('expulsion_date', 'expulsion_reason'),
+    'graduated': ('graduation_date',),
+    'academic': ('academic_leave_start',),
+}
+STATUS_ONLY_FIELDS = {
+    'expulsion_reason': 'expelled',
+}
+
+# Связи студента: модель и название для сообщения об ошибке
+REFERENCE_FIELDS = {
+    'current_department_id': (Department, 'Кафедра'),
+    'initial_department_id': (Department, 'Кафедра'),
+    'current_program_id': (Program, 'Программа'),
+    'initial_program_id': (Program, 'Программа'),
+}
+
+
+def transition_changes(student, status, date, expulsion_reason=None):
+    """Изменения полей при переводе студента в статус status на дату date"""
+    changes = {'status': status}
+    if status == 'expelled':
+        changes.update(expulsion_date=date, expulsion_reason=expulsion_reason)
+    elif status == 'graduated':
+        changes['graduation_date'] = date
+    elif status == 'academic':
+        changes.update(academic_leave_start=date, academic_leave_end=None)
+    elif student.status == 'academic':
+        # Выход из академа
+        changes['academic_leave_end'] = date
+    # Срезы на дату и отчеты по когортам определяют статус по датам событий:
+    # восстановленный студент не должен остаться в них отчисленным или выпускником
+    if status != 'expelled':
+        changes.update(expulsion_date=None, expulsion_reason=None)
+    if status != 'graduated':
+        changes['graduation_date'] = None
+    return changes
+
+
+def check_student_state(values):
+    """Ошибки согласованности статуса и связанных с ним полей"""
+    errors = {}
+    status = values.get('status') or 'active'
+    for field in STATUS_REQUIRED_FIELDS.get(status, ()):
+        if not values.get(field):
+            errors[field] = [f'Обязательно для статуса {status}']
+    for field, field_status in STATUS_ONLY_FIELDS.items():
+        if values.get(field) and status != field_status:
+            errors[field] = [f'Допустимо только для статуса {field_status}']
+    return errors
+
+
+def transfer_program_ids(values):
+    """id программ из transfer_history операции (структура уже проверена сериализатором)"""
+    return {transfer[field] for transfer in values.get('transfer_history') or [] for field in TRANSFER_PROGRAM_FIELDS}
+
+
+def _validation_errors(error):
+    return error.detail if isinstance(error.detail, dict) else {'non_field_errors': error.detail}
+
+
+class StudentBulkOperation:
+    """Проверяет и применяет пакет операций над студентами.
+
+    Операции:
+        {"op": "create", "data": {...}}
+        {"op": "update", "id": 1, "data": {...}}          - частичное обновление
+        {"op": "transition", "id": 1, "status": "expelled",
+         "date": "2024-06-30", "expulsion_reason": "own_desire"}
+
+    Пакет применяется целиком или не применяется: при любой ошибке
+    ValidationError содержит ошибки по номерам операций (ключи - строки).
+    """
+
+    def __init__(self, operations):
+        if not isinstance(operations, list):
+            raise ValidationError({'operations': 'Ожидается список операций'})
+        if len(operations) > BULK_MAX_OPERATIONS:
+            raise ValidationError({'operations': f'Не более {BULK_MAX_OPERATIONS} операций за запрос'})
+        self.operations = operations
+        self.errors = {}
+
+    def run(self):
+        with transaction.atomic():
+            created, updated, results = self.validate()
+            if self.errors:
+                raise ValidationError({'errors': {str(index): errors for index, errors in sorted(self.errors.items())}})
+            self.apply(created, updated)
+            transaction.on_commit(bump_student_generation)
+        return {
+            'created': len(created),
+            'updated': len(updated),
+            'results': [{'op': op, 'id': student.id} for op, student in results],
+        }
+
+    def validate(self):
+        create_serializer = StudentWriteSerializer()
+        update_serializer = StudentWriteSerializer(partial=True)
+        transition_serializer = StudentTransitionSerializer()
+
+        parsed = []
+        for index, operation in enumerate(self.operations):
+            if not isinstance(operation, dict) or operation.get('op') not in BULK_OPERATIONS:
+                self.errors[index] = {'op': [f'Допустимые операции: {", ".join(BULK_OPERATIONS)}']}
+                continue
+            op = operation['op']
+            if op != 'create' and not isinstance(operation.get('id'), int):
+                self.errors[index] = {'id': ['Ожидается id студента']}
+                continue
+            try:
+                if op == 'transition':
+                    values = transition_serializer.run_validation(operation)
+                else:
+                    serializer = create_serializer if op == 'create' else update_serializer
+                    values = serializer.run_validation(operation.get('data'))
+            except ValidationError as error:
+                self.errors[index] = _validation_errors(error)
+                continue
+            parsed.append((index, op, operation.get('id'), values))
+
+        # Все изменяемые студенты и все упомянутые кафедры и программы - одним запросом на таблицу
+        students = Student.objects.select_for_update().in_bulk([id for _, op, id, _ in parsed if op != 'create'])
+        referenced = {model: set() for model, _ in REFERENCE_FIELDS.values()}
+        for _, _, _, values in parsed:
+            for field, (model, _) in REFERENCE_FIELDS.items():
+                if values.get(field) is not None:
+                    referenced[model].add(values[field])
+            referenced[Program] |= transfer_program_ids(values)
+        existing = {model: set(model.objects.filter(id__in=ids).values_list('id', flat=True))
+                    for model, ids in referenced.items()}
+        # Программы переводов уже проверены - повторно их при записи не загружаем
+        self.program_ids = existing[Program]
+
+        created, updated, results = [], [], []
+        seen = set()
+        today = timezone.localdate()
+        for index, op, id, values in parsed:
+            if op == 'create':
+                student = Student(**values)
+            else:
+                student = students.get(id)
+                if student is None:
+                    self.errors[index] = {'id': [f'Студент {id} не найден']}
+                    continue
+                if id in seen:
+                    self.errors[index] = {'id': [f'Студент {id} уже изменяется в этом пакете']}
+                    continue
+                seen.add(id)
+                student._old_counter_key = counter_key(student)
+                student._old_transfer_history = student.transfer_history
+                student._old_enrollment_year = student.enrollment_date.year
+                if op == 'transition':
+                    values = transition_changes(student, values['status'], values.get('date', today),
+                                                values.get('expulsion_reason'))
+                for field, value in values.items():
+                    setattr(student, field, value)
+                student._changes = values
+
+            errors = check_student_state(student.__dict__)
+            for field, (model, label) in REFERENCE_FIELDS.items():
+                value = values.get(field)
+                if value is not None and value not in existing[model]:
+                    errors[field.removesuffix('_id')] = [f'{label} {value} не найдена']
+            missing = sorted(transfer_program_ids(values) - existing[Program])
+            if missing:
+                errors['transfer_history'] = [f'Программа {id} не найдена' for id in missing]
+            if errors:
+                self.errors[index] = errors
+                continue
+
+            if op == 'create':
+                created.append(student)
+            else:
+                updated.append(student)
+            results.append((op, student))
+        return created, updated, results
+
+    def apply(self, created, updated):
+        Student.objects.bulk_create(created, batch_size=BULK_BATCH_SIZE)
+        create_transfer_events(created, self.program_ids)
+
+        if updated:
+            self.update_students(updated)
+            moved = [student for student in updated if student.transfer_history != student._old_transfer_history]
+            TransferEvent.objects.filter(student_id__in=[student.id for student in moved]).delete()
+            create_transfer_events(moved, self.program_ids)
+
+        # bulk_create и bulk_update не отправляют сигналы: счетчики меняем одной
+        # пачкой, годы зачисления отмечаем для пересчета отчетов по когортам
+        deltas = Counter(counter_key(student) for student in created)
+        for student in updated:
+            deltas[counter_key(student)] += 1
+            deltas[student._old_counter_key] -= 1
+        apply_counter_deltas(deltas)
+        mark_cohorts_stale([student.enrollment_date.year for student in created + updated]
+                           + [student._old_enrollment_year for student in updated])
+
+    def update_students(self, students):
+        """Записывает изменения студентов минимальным числом UPDATE.
+
+        Одинаковые изменения (выпуск потока одной датой) - один UPDATE ... WHERE
+        id IN (...) на группу. Остальные - bulk_update только по изменяемым
+        полям: CASE WHEN по всем столбцам на SQLite в десятки раз медленнее.
+        """
+        groups = defaultdict(list)
+        for student in students:
+            groups[json.dumps(student._changes, sort_keys=True, default=str)].append(student)
+
+        single = []
+        for group in groups.values():
+            if len(group) == 1:
+                single.extend(group)
+                continue
+            for start in range(0, len(group), BULK_BATCH_SIZE):
+                ids = [student.id for student in group[start:start + BULK_BATCH_SIZE]]
+                Student.objects.filter(id__in=ids).update(**group[0]._changes)
+
+        if single:
+            fields = sorted({field for student in single for field in student._changes})
+            Student.objects.bulk_update(single, fields, batch_size=BULK_BATCH_SIZE)
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Версия справочников (кафедры, программы, группы). Значение - момент
+# последнего изменения в миллисекундах, поэтому из него же берется Last-Modified.
+REFERENCE_VERSION_KEY = 'students:reference:version'
+# Время жизни закешированных ответов и самой версии. С кешем в памяти
+# процесса (LocMemCache) изменение в одном воркере не сдвигает версию в
+# остальных, поэтому их ответы и ETag устаревают не дольше чем на этот срок
+REFERENCE_CACHE_TIMEOUT = 60 * 5
+
+# Поколение данных студентов: любая запись Student сдвигает его, и все
+# ранее закешированные выборки перестают находиться по ключу
+STUDENT_GENERATION_KEY = 'students:student:generation'
+STUDENT_CACHE_TIMEOUT = 60 * 5
+STUDENT_CACHE_HITS_KEY = 'students:student:hits'
+STUDENT_CACHE_MISSES_KEY = 'students:student:misses'
+# Выборки длиннее порога (настройка STUDENT_CACHE_MAX_ROWS) не кешируются:
+# весь реестр без пагинации - десятки мегабайт в кеше, а распаковка и
+# повторный рендеринг такого ответа стоят почти столько же, сколько запрос.
+# Порог равен наибольшей странице, поэтому страницы пагинации кешируются всегда
+DEFAULT_STUDENT_CACHE_MAX_ROWS = 1000
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_reference_version():
+    """Возвращает текущую версию справочников, создавая ее при первом обращении"""
+    version = cache.get(REFERENCE_VERSION_KEY)
+    if version is None:
+        cache.add(REFERENCE_VERSION_KEY, _now_ms(), REFERENCE_CACHE_TIMEOUT)
+        version = cache.get(REFERENCE_VERSION_KEY)
+    return version
+
+
+def bump_reference_version(**kwargs):
+    """Сдвигает версию справочников; подключается к сигналам моделей"""
+    current = cache.get(REFERENCE_VERSION_KEY) or 0
+    cache.set(REFERENCE_VERSION_KEY, max(_now_ms(), current + 1), REFERENCE_CACHE_TIMEOUT)
+
+
+def reference_cache_key(endpoint, variant, version):
+    return f'students:reference:{endpoint}:{variant}:{version}'
+
+
+def reference_etag(cache_key):
+    return '"%s"' % hashlib.md5(cache_key.encode('utf-8'), usedforsecurity=False).hexdigest()
+
+
+def reference_cache_state(endpoint, variant, with_counts=False):
+    """Ключ кеша, ETag и Last-Modified (или None) справочного списка"""
+    version = get_reference_version()
+    # Дата изменения справочников не отражает изменения счетчиков
+    last_modified = version // 1000
+    if with_counts:
+        variant = f'{variant}:counts:{get_student_generation()}'
+        last_modified = None
+    cache_key = reference_cache_key(endpoint, variant, version)
+    return cache_key, reference_etag(cache_key), last_modified
+
+
+def get_student_generation():
+    generation = cache.get(STUDENT_GENERATION_KEY)
+    if generation is None:
+        cache.add(STUDENT_GENERATION_KEY, _now_ms(), None)
+        generation = cache.get(STUDENT_GENERATION_KEY)
+    return generation
+
+
+def bump_student_generation(**kwargs):
+    """Сдвигает поколение данных студентов; подключается к сигналам Student"""
+    try:
+        cache.incr(STUDENT_GENERATION_KEY)
+    except ValueError:
+        cache.set(STUDENT_GENERATION_KEY, _now_ms(), None)
+
+
+def student_cache_key(canonical_params, variant=''):
+    """Ключ выборки студентов: поколение, версия справочников и хеш параметров.
+
+    Версия справочников входит в ключ, потому что в ответ вложены названия
+    кафедр и программ.
+    """
+    payload = json.dumps([canonical_params, variant], ensure_ascii=False)
+    digest = hashlib.md5(payload.encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f'students:student:list:{get_student_generation()}:{get_reference_version()}:{digest}'
+
+
+def student_rows_cacheable(data):
+    """Можно ли кешировать ответ реестра: список строк или словарь с results"""
+    rows = data if isinstance(data, list) else data.get('results', ())
+    return len(rows) <= getattr(settings, 'STUDENT_CACHE_MAX_ROWS', DEFAULT_STUDENT_CACHE_MAX_ROWS)
+
+
+def record_student_cache_hit(hit):
+    key = STUDENT_CACHE_HITS_KEY if hit else STUDENT_CACHE_MISSES_KEY
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def get_student_cache_stats():
+    return {
+        'hits': cache.get(STUDENT_CACHE_HITS_KEY, 0),
+        'misses': cache.get(STUDENT_CACHE_MISSES_KEY, 0),
+        'generation': get_student_generation(),
+    }
@@ -0,0 +1,125 @@
+from collections import Counter
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import CohortReport, StaleCohort, Student
+from .snapshots import expulsion_reason_as_of, status_as_of
+
+# Контрольная точка N - конец N-го учебного года когорты: 31 августа года зачисления + N
+CHECKPOINT_MONTH = 8
+CHECKPOINT_DAY = 31
+# Сколько лет после зачисления отслеживается когорта
+COHORT_MAX_YEARS = 10
+
+
+def checkpoint(year, years):
+    return date(year + years, CHECKPOINT_MONTH, CHECKPOINT_DAY)
+
+
+def checkpoints(year, today):
+    """Номера контрольных точек когорты, наступивших к дате today"""
+    return [years for years in range(1, COHORT_MAX_YEARS + 1) if checkpoint(year, years) <= today]
+
+
+def enrollment_year(value):
+    # Дата может оказаться строкой, если ее присвоили модели перед сохранением
+    return value.year if isinstance(value, date) else int(str(value)[:4])
+
+
+def mark_cohorts_stale(years):
+    """Отмечает годы зачисления для пересчета при следующем refresh_cohort_reports"""
+    StaleCohort.objects.bulk_create(
+        [StaleCohort(enrollment_year=year) for year in set(years) if year is not None], ignore_conflicts=True
+    )
+
+
+def student_cohort_years():
+    return {day.year for day in Student.objects.dates('enrollment_date', 'year')}
+
+
+def mark_all_cohorts_stale():
+    mark_cohorts_stale(student_cohort_years())
+
+
+def compute_cohort_year(year, today):
+    """Отчеты всех когорт года зачисления: {(программа, тип обучения): (размер, точки)}.
+
+    Один GROUP BY на размеры и по одному на каждую контрольную точку; статус
+    на дату точки вычисляется в SQL так же, как в срезах ?as_of=.
+    """
+    students = Student.objects.filter(enrollment_date__year=year).order_by()
+    sizes = {
+        (row['initial_program'], row['education_type']): row['count']
+        for row in students.values('initial_program', 'education_type').annotate(count=Count('id'))
+    }
+    retention = {key: [] for key in sizes}
+
+    for years in checkpoints(year, today):
+        day = checkpoint(year, years)
+        rows = students.values(
+            'initial_program', 'education_type',
+            as_of_status=status_as_of(day), as_of_reason=expulsion_reason_as_of(day),
+        ).annotate(count=Count('id'))
+        counts = {key: Counter() for key in sizes}
+        reasons = {key: Counter() for key in sizes}
+        for row in rows:
+            key = (row['initial_program'], row['education_type'])
+            counts[key][row['as_of_status']] += row['count']
+            if row['as_of_reason']:
+                reasons[key][row['as_of_reason']] += row['count']
+        for key, size in sizes.items():
+            point_counts = {status: counts[key][status] for status, _ in Student.STATUS_CHOICES}
+            retention[key].append({
+                'years': years,
+                'date': day.isoformat(),
+                'counts': point_counts,
+                'shares': {status: round(count / size, 4) for status, count in point_counts.items()},
+                'expulsion_reasons': dict(sorted(reasons[key].items())),
+            })
+    return {key: (size, retention[key]) for key, size in sizes.items()}
+
+
+def refresh_cohort_year(year, today, now):
+    with transaction.atomic():
+        # Отметка снимается до расчета: изменения во время расчета отметят год заново
+        StaleCohort.objects.filter(enrollment_year=year).delete()
+        reports = compute_cohort_year(year, today)
+        CohortReport.objects.filter(enrollment_year=year).delete()
+        CohortReport.objects.bulk_create([
+            CohortReport(enrollment_year=year, program_id=program_id, education_type=education_type,
+                         size=size, retention=retention, refreshed_at=now)
+            for (program_id, education_type), (size, retention) in reports.items()
+        ])
+    return len(reports)
+
+
+def stale_cohort_years(today):
+    """Годы, отчеты которых устарели.
+
+    Это отмеченные при записи студентов годы, годы без отчетов, годы, где
+    больше нет студентов, и годы, у которых после пересчета наступила новая
+    контрольная точка.
+    """
+    years = set(StaleCohort.objects.values_list('enrollment_year', flat=True))
+    current = student_cohort_years()
+    refreshed = dict(CohortReport.objects.values_list('enrollment_year').annotate(refreshed=Min('refreshed_at')))
+    years |= current ^ refreshed.keys()
+    for year, refreshed_at in refreshed.items():
+        refreshed_on = timezone.localdate(refreshed_at)
+        if any(refreshed_on < checkpoint(year, number) <= today for number in range(1, COHORT_MAX_YEARS + 1)):
+            years.add(year)
+    return years
+
+
+def refresh_cohort_reports(full=False, today=None):
+    """Пересчитывает отчеты устаревших (или, с full, всех) годов; возвращает {год: когорт}"""
+    today = today or timezone.localdate()
+    now = timezone.now()
+    if full:
+        years = student_cohort_years() | set(CohortReport.objects.values_list('enrollment_year', flat=True))
+    else:
+        years = stale_cohort_years(today)
+    return {year: refresh_cohort_year(year, today, now) for year in sorted(years)}
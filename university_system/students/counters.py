@@ -0,0 +1,82 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Student, StudentCounter
+
+# Поля студента, по которым ведутся счетчики, и соответствующие поля StudentCounter
+STUDENT_KEY_FIELDS = ('current_department_id', 'current_program_id', 'status', 'education_type', 'admission_basis')
+COUNTER_KEY_FIELDS = ('department_id', 'program_id', 'status', 'education_type', 'admission_basis')
+
+
+def counter_key(student):
+    return tuple(getattr(student, field) for field in STUDENT_KEY_FIELDS)
+
+
+def apply_counter_deltas(deltas):
+    """Применяет изменения {ключ: +-n} к счетчикам.
+
+    Вызывается внутри transaction.atomic(): при ошибке откатываются все
+    изменения пачки, а не только последнее.
+    """
+    missing = {}
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        lookup = dict(zip(COUNTER_KEY_FIELDS, key))
+        if not StudentCounter.objects.filter(**lookup).update(count=F('count') + delta):
+            missing[key] = delta
+    if not missing:
+        return
+    # Тот же счетчик может успеть создать параллельная транзакция: нулевые
+    # строки вставляются без ошибки при конфликте ключа и затем увеличиваются
+    StudentCounter.objects.bulk_create(
+        [StudentCounter(count=0, **dict(zip(COUNTER_KEY_FIELDS, key))) for key in missing],
+        ignore_conflicts=True,
+    )
+    for key, delta in missing.items():
+        StudentCounter.objects.filter(**dict(zip(COUNTER_KEY_FIELDS, key))).update(count=F('count') + delta)
+
+
+def compute_counters():
+    """Счетчики, посчитанные заново по таблице студентов: {ключ: количество}"""
+    rows = Student.objects.order_by().values_list(*STUDENT_KEY_FIELDS).annotate(count=Count('id'))
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def stored_counters():
+    rows = StudentCounter.objects.exclude(count=0).values_list(*COUNTER_KEY_FIELDS, 'count')
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def counter_drift():
+    """Расхождения {ключ: (в таблице счетчиков, фактически)}"""
+    expected = compute_counters()
+    stored = stored_counters()
+    return {
+        key: (stored.get(key, 0), expected.get(key, 0))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key, 0) != expected.get(key, 0)
+    }
+
+
+def rebuild_counters():
+    """Полностью пересчитывает таблицу счетчиков"""
+    with transaction.atomic():
+        StudentCounter.objects.all().delete()
+        StudentCounter.objects.bulk_create([
+            StudentCounter(count=count, **dict(zip(COUNTER_KEY_FIELDS, key)))
+            for key, count in compute_counters().items()
+        ])
+
+
+def annotate_student_counts(queryset):
+    """Добавляет к кафедрам или программам количество студентов по статусам.
+
+    Считается по таблице счетчиков в том же запросе, что и сам список.
+    """
+    annotations = {'student_count': Sum('student_counters__count', default=0)}
+    for status, _ in Student.STATUS_CHOICES:
+        annotations[f'{status}_count'] = Sum(
+            'student_counters__count', filter=Q(student_counters__status=status), default=0
+        )
+    return queryset.annotate(**annotations)
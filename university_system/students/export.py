@@ -0,0 +1,126 @@
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+
+from .models import Student
+
+# Сколько строк за раз вычитывать из курсора БД при выгрузке
+EXPORT_CHUNK_SIZE = 2000
+
+# Столбцы выгрузки: (поле для values(), заголовок, словарь подписей или None)
+EXPORT_COLUMNS = [
+    ('id', 'ID', None),
+    ('last_name', 'Фамилия', None),
+    ('first_name', 'Имя', None),
+    ('middle_name', 'Отчество', None),
+    ('citizenship', 'Гражданство', None),
+    ('status', 'Статус', dict(Student.STATUS_CHOICES)),
+    ('current_department__name', 'Текущая кафедра', None),
+    ('current_program__code', 'Код текущей программы', None),
+    ('current_program__name', 'Текущая программа', None),
+    ('enrollment_date', 'Дата зачисления', None),
+    ('initial_department__name', 'Первоначальная кафедра', None),
+    ('initial_program__code', 'Код первоначальной программы', None),
+    ('initial_program__name', 'Первоначальная программа', None),
+    ('education_type', 'Тип обучения', dict(Student.EDUCATION_TYPE_CHOICES)),
+    ('admission_basis', 'Основание поступления', dict(Student.ADMISSION_BASIS_CHOICES)),
+    ('expulsion_date', 'Дата отчисления', None),
+    ('expulsion_reason', 'Причина отчисления', dict(Student.EXPULSION_REASON_CHOICES)),
+    ('graduation_date', 'Дата выпуска', None),
+    ('academic_leave_start', 'Начало академа', None),
+    ('academic_leave_end', 'Конец академа', None),
+]
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+EXPORT_LABELS = [choices for _, _, choices in EXPORT_COLUMNS]
+
+
+def export_values(queryset, named=False):
+    return queryset.values_list(*[field for field, _, _ in EXPORT_COLUMNS], named=named)
+
+
+def export_row(row):
+    return [
+        choices.get(value, value) if choices is not None and value is not None else value
+        for value, choices in zip(row, EXPORT_LABELS)
+    ]
+
+
+def iter_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки выгрузки из проекции values(), без создания моделей"""
+    for row in export_values(queryset).iterator(chunk_size=chunk_size):
+        yield export_row(row)
+
+
+async def aiter_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    # Обычный values_list() выполняет запрос уже при создании итератора, то
+    # есть в асинхронном потоке; у named=True итератор ленивый
+    async for row in export_values(queryset, named=True).aiterator(chunk_size=chunk_size):
+        yield export_row(row)
+
+
+def csv_header(writer):
+    # BOM, чтобы Excel распознал UTF-8
+    return '\ufeff' + writer.writerow([title for _, title, _ in EXPORT_COLUMNS])
+
+
+def csv_line(writer, row):
+    return writer.writerow(['' if value is None else value for value in row])
+
+
+def iter_csv(queryset):
+    writer = csv.writer(Echo())
+    yield csv_header(writer)
+    for row in iter_export_rows(queryset):
+        yield csv_line(writer, row)
+
+
+async def aiter_csv(queryset):
+    writer = csv.writer(Echo())
+    yield csv_header(writer)
+    async for row in aiter_export_rows(queryset):
+        yield csv_line(writer, row)
+
+
+def csv_response(queryset, filename='students.csv', asynchronous=False):
+    """Потоковая CSV-выгрузка: первые байты уходят клиенту сразу.
+
+    С asynchronous=True строки вычитываются через aiterator(), и под ASGI
+    медленный клиент не занимает поток на все время выгрузки.
+    """
+    content = aiter_csv(queryset) if asynchronous else iter_csv(queryset)
+    response = StreamingHttpResponse(content, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_response(queryset, filename='students.xlsx'):
+    """XLSX-выгрузка через write-only режим openpyxl.
+
+    Строки сразу сбрасываются во временные файлы, поэтому память не растет
+    с числом строк. Формат XLSX - zip-архив, он собирается после записи
+    последней строки, и только затем файл отдается клиенту частями.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Студенты')
+    sheet.append([title for _, title, _ in EXPORT_COLUMNS])
+    for row in iter_export_rows(queryset):
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -0,0 +1,274 @@
+from datetime import MAXYEAR, MINYEAR, date, datetime
+from functools import lru_cache
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Student
+from .search import build_search_filter, search_tokens
+
+# Схема фильтра реестра студентов (список, статистика, выгрузка): параметр и
+# вид его значения. Списки передаются через запятую, пустой параметр - как
+# отсутствующий, параметры вне схемы фильтр не читает
+STUDENT_FILTER_SCHEMA = {
+    'statuses': 'choices',
+    'expulsion_reasons': 'choices',
+    'current_departments': 'ids',
+    'current_programs': 'ids',
+    'education_types': 'choices',
+    'admission_bases': 'choices',
+    'enrollment_date': 'date',
+    'start_date': 'date',
+    'end_date': 'date',
+    'in_academic': 'flag',
+    'q': 'search',
+}
+
+# Параметры фильтра со значениями из choices и соответствующие поля Student;
+# тот же список отдается фронтенду в /api/bootstrap/
+CHOICE_FIELDS = {
+    'statuses': 'status',
+    'expulsion_reasons': 'expulsion_reason',
+    'education_types': 'education_type',
+    'admission_bases': 'admission_basis',
+}
+
+# Ограничения значений: в интерфейсе больше не выбрать, а длинный IN (...)
+# и длинный поисковый запрос дороги уже при разборе в БД
+FILTER_MAX_VALUES = 100
+FILTER_MAX_SEARCH_LENGTH = 100
+FILTER_MAX_SEARCH_TOKENS = 5
+
+# Сколько разных наборов параметров помнят разбор и скомпилированный Q-фильтр
+FILTER_CACHE_SIZE = 1024
+
+# Границы целых значений: за пределами знакового 64-битного целого
+# драйвер БД не может передать параметр запроса
+FILTER_MIN_INT = -2 ** 63
+FILTER_MAX_INT = 2 ** 63 - 1
+
+FLAG_VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+# Результат разбора для заведомо пустой выборки (противоречивые условия)
+EMPTY_FILTER = (('empty', 'true'),)
+
+
+def _split(value):
+    items = [item.strip() for item in value.split(',')]
+    if '' in items:
+        raise ValueError('Пустое значение в списке')
+    values = set(items)
+    if len(values) > FILTER_MAX_VALUES:
+        raise ValueError(f'Не более {FILTER_MAX_VALUES} значений')
+    return values
+
+
+def _parse_choices(name, value):
+    values = _split(value)
+    allowed = dict(Student._meta.get_field(CHOICE_FIELDS[name]).flatchoices)
+    unknown = values - allowed.keys()
+    if unknown:
+        raise ValueError(f'Неизвестные значения: {", ".join(sorted(unknown))}')
+    return sorted(values)
+
+
+def _parse_ids(name, value):
+    values = _split(value)
+    try:
+        ids = {int(id) for id in values}
+    except ValueError:
+        raise ValueError('Ожидается список целых чисел через запятую')
+    if any(not FILTER_MIN_INT <= id <= FILTER_MAX_INT for id in ids):
+        raise ValueError('Значение вне допустимого диапазона')
+    return sorted(ids)
+
+
+def _parse_date(name, value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError('Ожидается дата в формате ГГГГ-ММ-ДД')
+
+
+def _parse_year(name, value):
+    try:
+        year = int(value)
+    except ValueError:
+        raise ValueError('Ожидается год в формате ГГГГ')
+    if not MINYEAR <= year <= MAXYEAR:
+        raise ValueError('Значение вне допустимого диапазона')
+    return year
+
+
+def _parse_flag(name, value):
+    try:
+        return FLAG_VALUES[value.lower()]
+    except KeyError:
+        raise ValueError('Ожидается true или false')
+
+
+def _parse_search(name, value):
+    if len(value) > FILTER_MAX_SEARCH_LENGTH:
+        raise ValueError(f'Не длиннее {FILTER_MAX_SEARCH_LENGTH} символов')
+    tokens = search_tokens(value)
+    if len(tokens) > FILTER_MAX_SEARCH_TOKENS:
+        raise ValueError(f'Не более {FILTER_MAX_SEARCH_TOKENS} слов')
+    return ' '.join(tokens)
+
+
+PARSERS = {
+    'choices': _parse_choices,
+    'ids': _parse_ids,
+    'date': _parse_date,
+    'year': _parse_year,
+    'flag': _parse_flag,
+    'search': _parse_search,
+}
+
+
+def _parse_values(raw, schema):
+    """Разбирает пары (параметр, значение) по схеме; возвращает значения и ошибки"""
+    values, errors = {}, {}
+    for name, value in raw:
+        try:
+            values[name] = PARSERS[schema[name]](name, value)
+        except ValueError as error:
+            errors[name] = str(error)
+    return values, errors
+
+
+def parse_query_params(params, schema):
+    """Проверяет параметры запроса по схеме {параметр: вид значения}.
+
+    Те же правила и ответы 400, что у фильтра реестра студентов;
+    возвращает {параметр: значение} для непустых параметров схемы.
+    """
+    values, errors = _parse_values(((name, params[name]) for name in schema if params.get(name)), schema)
+    if errors:
+        raise ValidationError(errors)
+    return values
+
+
+def _all_choices(name):
+    return len(Student._meta.get_field(CHOICE_FIELDS[name]).flatchoices)
+
+
+def parse_student_filter(params):
+    """Проверяет и нормализует параметры фильтра реестра студентов.
+
+    Возвращает канонический кортеж пар (параметр, значение): равные по смыслу
+    запросы (любой порядок и повторы значений, in_academic вместо
+    statuses=academic) дают один результат - он же ключ кеша и вход
+    compile_student_filter. Некорректные значения - ValidationError (400)
+    до любого запроса к БД.
+    """
+    raw = tuple((name, params[name]) for name in STUDENT_FILTER_SCHEMA if params.get(name))
+    return _parse_student_filter(raw)
+
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def _parse_student_filter(raw):
+    values, errors = _parse_values(raw, STUDENT_FILTER_SCHEMA)
+    if values.get('start_date') and values.get('end_date') and values['start_date'] > values['end_date']:
+        errors['start_date'] = 'Начало периода позже его конца'
+    if errors:
+        raise ValidationError(errors)
+
+    # Нахождение в академе - то же, что статус academic
+    if values.pop('in_academic', False):
+        statuses = values.get('statuses')
+        if (statuses is None and 'expulsion_reasons' not in values) or (statuses and 'academic' in statuses):
+            values['statuses'] = ['academic']
+            values.pop('expulsion_reasons', None)
+        else:
+            return EMPTY_FILTER
+
+    # Дата зачисления внутри периода делает период лишним, вне его - выборку пустой
+    if 'enrollment_date' in values:
+        day = values['enrollment_date']
+        if values.get('start_date', day) > day or values.get('end_date', day) < day:
+            return EMPTY_FILTER
+        values.pop('start_date', None)
+        values.pop('end_date', None)
+
+    # Все значения обязательного поля - не фильтр. Причины отчисления
+    # не снимаются: у отчисленных без причины поле пустое
+    for name in ('statuses', 'education_types', 'admission_bases'):
+        if name in values and len(values[name]) == _all_choices(name) and not (
+                name == 'statuses' and 'expulsion_reasons' in values):
+            del values[name]
+
+    canonical = []
+    for name in STUDENT_FILTER_SCHEMA:
+        if name not in values:
+            continue
+        value = values[name]
+        if isinstance(value, list):
+            value = ','.join(str(item) for item in value)
+        elif isinstance(value, date):
+            value = value.isoformat()
+        if value:
+            canonical.append((name, value))
+    return tuple(canonical)
+
+
+def _in(field, values):
+    """field=значение для одного значения, field__in для нескольких"""
+    if len(values) == 1:
+        return Q(**{field: values[0]})
+    return Q(**{f'{field}__in': values})
+
+
+@lru_cache(maxsize=FILTER_CACHE_SIZE)
+def compile_student_filter(parsed):
+    """Q-фильтр по результату parse_student_filter.
+
+    Возвращаемый Q общий для всех вызовов с тем же parsed: его можно
+    комбинировать (&, |) и передавать в filter(), но не изменять на месте.
+    """
+    if parsed == EMPTY_FILTER:
+        # filter(pk__in=[]) Django выполняет без запроса к БД
+        return Q(pk__in=[])
+    values = dict(parsed)
+    statuses = values['statuses'].split(',') if 'statuses' in values else []
+    ids = {name: [int(id) for id in values[name].split(',')]
+           for name in ('current_departments', 'current_programs') if name in values}
+
+    # Статусы: отчисленные с причинами из expulsion_reasons или (без причин) все
+    main_filter = Q()
+    if 'expulsion_reasons' in values:
+        regular = [status for status in statuses if status != 'expelled']
+        if regular:
+            main_filter = _in('status', regular)
+        main_filter |= Q(status='expelled') & _in('expulsion_reason', values['expulsion_reasons'].split(','))
+    elif statuses:
+        main_filter = _in('status', statuses)
+
+    if 'enrollment_date' in values:
+        main_filter &= Q(enrollment_date=date.fromisoformat(values['enrollment_date']))
+    if 'start_date' in values and 'end_date' in values:
+        main_filter &= Q(enrollment_date__range=[date.fromisoformat(values['start_date']),
+                                                 date.fromisoformat(values['end_date'])])
+    elif 'start_date' in values:
+        main_filter &= Q(enrollment_date__gte=date.fromisoformat(values['start_date']))
+    elif 'end_date' in values:
+        main_filter &= Q(enrollment_date__lte=date.fromisoformat(values['end_date']))
+
+    if 'current_departments' in ids:
+        main_filter &= _in('current_department_id', ids['current_departments'])
+    if 'current_programs' in ids:
+        main_filter &= _in('current_program_id', ids['current_programs'])
+    if 'education_types' in values:
+        main_filter &= _in('education_type', values['education_types'].split(','))
+    if 'admission_bases' in values:
+        main_filter &= _in('admission_basis', values['admission_bases'].split(','))
+
+    # Поиск по ФИО
+    if 'q' in values:
+        main_filter &= build_search_filter(values['q'])
+    return main_filter
+
+
+def build_student_filter(params):
+    """Строит Q-фильтр реестра студентов по параметрам запроса"""
+    return compile_student_filter(parse_student_filter(params))
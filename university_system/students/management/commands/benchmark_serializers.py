@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from students.models import Program, Student
+from students.pagination import STUDENT_ORDERING
+from students.rows import FastJSONRenderer, ValuesRowSerializer, orjson
+from students.serializers import ProgramSerializer, StudentSerializer
+from students.views import STUDENT_RELATED_FIELDS
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает скорость StudentSerializer/ProgramSerializer + JSONRenderer '
+            'и ValuesRowSerializer + FastJSONRenderer (строк в секунду)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=5000, help='Сколько студентов сериализовать')
+        parser.add_argument('--repeat', type=int, default=3, help='Число повторов, берется лучшее время')
+
+    def handle(self, *args, **options):
+        limit, repeat = options['limit'], options['repeat']
+        students = Student.objects.select_related(*STUDENT_RELATED_FIELDS).order_by(*STUDENT_ORDERING)
+        programs = Program.objects.select_related('department')
+        self.stdout.write(f'JSON-кодировщик: {"orjson" if orjson is not None else "json (stdlib)"}')
+        self.compare('Студенты', students, StudentSerializer, limit, repeat)
+        self.compare('Программы', programs, ProgramSerializer, limit, repeat)
+
+    def compare(self, label, queryset, serializer_class, limit, repeat):
+        row_serializer = ValuesRowSerializer(serializer_class)
+
+        def drf():
+            return JSONRenderer().render(serializer_class(queryset[:limit], many=True).data)
+
+        def fast():
+            rows = row_serializer.values_list(queryset)[:limit]
+            return FastJSONRenderer().render(row_serializer.to_representation(rows))
+
+        drf_time, drf_body = self.measure(drf, repeat)
+        fast_time, fast_body = self.measure(fast, repeat)
+        if drf_body != fast_body:
+            raise CommandError(f'{label}: ответы DRF и быстрого пути различаются')
+
+        count = min(limit, queryset.count())
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{label}: {count} строк, {len(drf_body)} байт'))
+        for name, elapsed in (('DRF', drf_time), ('values_list', fast_time)):
+            rate = count / elapsed if elapsed else 0
+            self.stdout.write(f'  {name:<12} {elapsed * 1000:8.1f} мс  {rate:10.0f} строк/с')
+        self.stdout.write(f'  ускорение: {drf_time / fast_time:.1f}x')
+
+    def measure(self, func, repeat):
+        best, body = None, None
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            body = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, body
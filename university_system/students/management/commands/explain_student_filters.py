@@ -0,0 +1,89 @@
+import re
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from students.filters import build_student_filter
+from students.models import Student
+from students.pagination import STUDENT_ORDERING
+
+# Комбинации фильтров, которые отправляет фронтенд
+FILTER_COMBINATIONS = [
+    ('без фильтров', {}),
+    ('статусы', {'statuses': 'active,academic'}),
+    ('статусы + причины отчисления', {'statuses': 'active,expelled', 'expulsion_reasons': 'own_desire,transfer'}),
+    ('только отчисленные', {'statuses': 'expelled'}),
+    ('дата зачисления', {'enrollment_date': '2020-09-01'}),
+    ('период зачисления', {'start_date': '2020-01-01', 'end_date': '2020-12-31'}),
+    ('кафедры', {'current_departments': '1,2'}),
+    ('кафедры + статусы', {'current_departments': '1,2', 'statuses': 'active'}),
+    ('программы', {'current_programs': '1,2,3'}),
+    ('тип обучения + основание', {'education_types': 'budget', 'admission_bases': 'target'}),
+    ('в академе', {'in_academic': 'true'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Печатает EXPLAIN QUERY PLAN фильтров реестра студентов без индексов и с индексами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true',
+                            help='Выполнить ANALYZE перед построением планов')
+
+    def handle(self, *args, **options):
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        with transaction.atomic():
+            # Временно удаляем индексы модели, чтобы получить план "до";
+            # DDL откатывается вместе с транзакцией
+            with connection.cursor() as cursor:
+                for index in Student._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+            before = self.collect_plans()
+            transaction.set_rollback(True)
+
+        after = self.collect_plans()
+
+        full_scans = 0
+        for label, _ in FILTER_COMBINATIONS:
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write('  до:')
+            self.write_plan(before[label])
+            self.stdout.write('  после:')
+            self.write_plan(after[label])
+            if self.is_full_scan(after[label]):
+                full_scans += 1
+                self.stdout.write(self.style.WARNING('  полное сканирование таблицы'))
+                if self.is_ordered_index_scan(after[label]):
+                    # Обход всей таблицы по индексу сортировки без временного
+                    # B-дерева: выгоден при большой выборке и LIMIT (пагинации)
+                    self.stdout.write('  обход по индексу сортировки')
+
+        self.stdout.write(f'Комбинаций с полным сканированием: {full_scans} из {len(FILTER_COMBINATIONS)}')
+
+    def collect_plans(self):
+        plans = {}
+        for label, params in FILTER_COMBINATIONS:
+            queryset = Student.objects.filter(build_student_filter(params)).order_by(*STUDENT_ORDERING)
+            plans[label] = queryset.explain()
+        return plans
+
+    def write_plan(self, plan):
+        for line in plan.splitlines():
+            self.stdout.write(f'    {line}')
+
+    def is_full_scan(self, plan):
+        table = Student._meta.db_table
+        # SQLite: строка "SCAN table" без условия поиска, в том числе
+        # "SCAN table USING INDEX idx" - обход всего индекса, а не поиск по
+        # нему ("... (status=?)"); PostgreSQL: "Seq Scan on table"
+        for rest in re.findall(rf'\bSCAN {table}\b(.*)$', plan, re.MULTILINE):
+            if not re.search(r'\(\w+\s*(=|>|<|IN\b)', rest):
+                return True
+        return f'Seq Scan on {table}' in plan
+
+    def is_ordered_index_scan(self, plan):
+        table = Student._meta.db_table
+        return f'SCAN {table} USING' in plan or 'Index Scan using student_name_order_idx' in plan
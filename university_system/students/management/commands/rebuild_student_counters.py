@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from students.cache import bump_student_generation
+from students.counters import counter_drift, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Проверяет расхождение таблицы счетчиков студентов с фактическими данными и пересчитывает ее'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Только проверить расхождение, не пересчитывая (код возврата 1 при расхождении)')
+
+    def handle(self, *args, **options):
+        drift = counter_drift()
+        for key, (stored, actual) in sorted(drift.items(), key=str):
+            self.stdout.write(f'{key}: в счетчиках {stored}, фактически {actual}')
+        self.stdout.write(f'Расхождений: {len(drift)}')
+
+        if options['check']:
+            if drift:
+                raise CommandError('Счетчики студентов расходятся с данными')
+            return
+
+        rebuild_counters()
+        bump_student_generation()
+        self.stdout.write(self.style.SUCCESS('Счетчики студентов пересчитаны'))
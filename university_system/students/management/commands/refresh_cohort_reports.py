@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from students.cohorts import refresh_cohort_reports
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает отчеты по когортам (год зачисления x программа x тип обучения) '
+            'для годов, студенты которых изменились после прошлого запуска. Рассчитан на запуск по расписанию')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересчитать все годы зачисления')
+
+    def handle(self, *args, **options):
+        refreshed = refresh_cohort_reports(full=options['full'])
+        for year, cohorts in refreshed.items():
+            self.stdout.write(f'{year}: когорт {cohorts}')
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано годов зачисления: {len(refreshed)}'))
@@ -0,0 +1,131 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger('students.perf')
+
+# Значения по умолчанию для настроек PERF_METRICS_WINDOW и SLOW_QUERY_THRESHOLD_MS
+DEFAULT_METRICS_WINDOW = 1000
+DEFAULT_SLOW_QUERY_THRESHOLD_MS = 200
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Метрики в формате Prometheus: (имя, поле замера, описание)
+SUMMARIES = [
+    ('students_request_duration_seconds', 'wall', 'Полное время обработки запроса'),
+    ('students_db_duration_seconds', 'db_time', 'Время выполнения запросов к БД (без чтения строк)'),
+    ('students_db_queries', 'queries', 'Количество запросов к БД'),
+    ('students_render_duration_seconds', 'render', 'Время сериализации ответа в JSON'),
+    ('students_response_size_bytes', 'size', 'Размер ответа'),
+]
+
+
+class QueryRecorder:
+    """Обертка для connection.execute_wrapper: считает запросы и время execute()"""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.count = 0
+        self.duration = 0.0
+        self.slow = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if elapsed >= self.threshold:
+                self.slow += 1
+                logger.warning('Медленный запрос (%.1f мс, %s): %s',
+                               elapsed * 1000, context['connection'].alias, sql)
+
+
+def slow_query_threshold():
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', DEFAULT_SLOW_QUERY_THRESHOLD_MS) / 1000
+
+
+def quantile(values, q):
+    """Квантиль по отсортированному списку (ближайший ранг)"""
+    if not values:
+        return 0
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+class MetricsStore:
+    """Последние замеры по каждому имени URL и накопленные суммы.
+
+    Хранится в памяти процесса: при нескольких воркерах у каждого свои данные.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.totals = {}
+        self.slow_queries = {}
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.totals.clear()
+            self.slow_queries.clear()
+
+    def record(self, endpoint, sample, slow_queries=0):
+        window = getattr(settings, 'PERF_METRICS_WINDOW', DEFAULT_METRICS_WINDOW)
+        with self.lock:
+            samples = self.samples.get(endpoint)
+            if samples is None or samples.maxlen != window:
+                samples = self.samples[endpoint] = deque(samples or (), maxlen=window)
+            samples.append(sample)
+            # Сумма и количество по каждому полю отдельно: render и size есть
+            # не у всех ответов (потоковые, без рендеринга DRF), и такие
+            # замеры не должны занижать среднее _sum / _count
+            totals = self.totals.setdefault(endpoint, {field: [0, 0] for _, field, _ in SUMMARIES})
+            for _, field, _ in SUMMARIES:
+                if sample.get(field) is not None:
+                    totals[field][0] += sample[field]
+                    totals[field][1] += 1
+            self.slow_queries[endpoint] = self.slow_queries.get(endpoint, 0) + slow_queries
+
+    def snapshot(self):
+        with self.lock:
+            return (
+                {endpoint: list(samples) for endpoint, samples in self.samples.items()},
+                {endpoint: {field: tuple(value) for field, value in totals.items()}
+                 for endpoint, totals in self.totals.items()},
+                dict(self.slow_queries),
+            )
+
+    def to_prometheus(self):
+        """Текстовый формат экспозиции Prometheus (version 0.0.4)"""
+        samples, totals, slow_queries = self.snapshot()
+        lines = []
+        for name, field, description in SUMMARIES:
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} summary')
+            for endpoint in sorted(samples):
+                values = sorted(sample[field] for sample in samples[endpoint] if sample.get(field) is not None)
+                label = f'endpoint="{endpoint}"'
+                for q in QUANTILES:
+                    lines.append(f'{name}{{{label},quantile="{q}"}} {_number(quantile(values, q))}')
+                total, count = totals[endpoint][field]
+                lines.append(f'{name}_sum{{{label}}} {_number(total)}')
+                lines.append(f'{name}_count{{{label}}} {count}')
+        lines.append('# HELP students_slow_queries_total Запросы к БД дольше SLOW_QUERY_THRESHOLD_MS')
+        lines.append('# TYPE students_slow_queries_total counter')
+        for endpoint in sorted(slow_queries):
+            lines.append(f'students_slow_queries_total{{endpoint="{endpoint}"}} {slow_queries[endpoint]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+metrics = MetricsStore()
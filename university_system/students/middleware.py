@@ -0,0 +1,101 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+
+from .metrics import QueryRecorder, metrics, slow_query_threshold
+
+# Какие запросы учитываются и какой endpoint сам отдает метрики
+METRICS_PATH_PREFIX = '/api/'
+METRICS_URL_NAME = 'metrics'
+
+
+class PerformanceMetricsMiddleware:
+    """Замеряет время запроса, запросы к БД, рендеринг и размер ответа.
+
+    Результат добавляется в заголовок Server-Timing и накапливается по имени
+    URL в students.metrics.metrics (см. /api/metrics/). Должен стоять
+    последним в MIDDLEWARE: тогда время от process_template_response до
+    возврата ответа - это рендеринг DRF Response в JSON. Запросы, которые
+    выполняет потоковый ответ уже после возврата из view, не учитываются.
+    Время БД (db в Server-Timing) - только выполнение запросов (execute):
+    чтение строк из курсора идет после него и входит лишь в общее время.
+    Работает и в синхронной, и в асинхронной цепочке middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not request.path.startswith(METRICS_PATH_PREFIX):
+            return self.get_response(request)
+
+        recorder = QueryRecorder(slow_query_threshold())
+        request._render_started = None
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            self.install_recorder(stack, recorder)
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        if not request.path.startswith(METRICS_PATH_PREFIX):
+            return await self.get_response(request)
+
+        recorder = QueryRecorder(slow_query_threshold())
+        request._render_started = None
+        start = time.perf_counter()
+        # Асинхронный ORM выполняет запросы в потоке sync_to_async этого
+        # запроса, поэтому обертки ставятся и снимаются в нем же
+        stack = ExitStack()
+        await sync_to_async(self.install_recorder)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, recorder, start)
+
+    def install_recorder(self, stack, recorder):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    def finish(self, request, response, recorder, start):
+        wall = time.perf_counter() - start
+
+        render = None
+        if request._render_started is not None:
+            render = max(0.0, start + wall - request._render_started)
+        size = None if response.streaming else len(response.content)
+
+        timings = [
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+            f'total;dur={wall * 1000:.1f}',
+        ]
+        if render is not None:
+            timings.insert(1, f'render;dur={render * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+
+        match = request.resolver_match
+        if match is not None and match.url_name and match.url_name != METRICS_URL_NAME:
+            metrics.record(match.url_name, {
+                'wall': wall,
+                'db_time': recorder.duration,
+                'queries': recorder.count,
+                'render': render,
+                'size': size,
+            }, recorder.slow)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF Response рендерится сразу после этого хука
+        request._render_started = time.perf_counter()
+        return response
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Department',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Название кафедры')),
+                ('code', models.CharField(blank=True, max_length=20, verbose_name='Код кафедры')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProgramGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, verbose_name='Код группы')),
+                ('name', models.CharField(max_length=200, verbose_name='Название группы специальностей')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Program',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, verbose_name='Код специальности')),
+                ('old_code', models.CharField(blank=True, max_length=20, verbose_name='Старый шифр')),
+                ('name', models.CharField(max_length=200, verbose_name='Направление подготовки')),
+                ('program_name', models.CharField(max_length=300, verbose_name='Образовательная программа')),
+                ('education_level', models.CharField(choices=[('undergraduate', 'Бакалавриат'), ('graduate', 'Магистратура'), ('postgraduate', 'Аспирантура')], max_length=20, verbose_name='Уровень образования')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активна')),
+                ('department', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='students.department', verbose_name='Кафедра')),
+                ('group', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='students.programgroup', verbose_name='Группа специальностей')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Student',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_name', models.CharField(max_length=50, verbose_name='Фамилия')),
+                ('first_name', models.CharField(max_length=50, verbose_name='Имя')),
+                ('middle_name', models.CharField(blank=True, max_length=50, verbose_name='Отчество')),
+                ('citizenship', models.CharField(max_length=50, verbose_name='Гражданство')),
+                ('status', models.CharField(choices=[('active', 'Обучается'), ('academic', 'В академе'), ('graduated', 'Выпускник'), ('expelled', 'Отчислен')], default='active', max_length=20, verbose_name='Статус')),
+                ('enrollment_date', models.DateField(verbose_name='Дата зачисления')),
+                ('education_type', models.CharField(choices=[('budget', 'Бюджет'), ('contract', 'Контракт')], max_length=10, verbose_name='Тип обучения')),
+                ('admission_basis', models.CharField(choices=[('general', 'Общий конкурс'), ('target', 'Целевое'), ('quota', 'Квота')], max_length=10, verbose_name='Основание поступления')),
+                ('expulsion_date', models.DateField(blank=True, null=True, verbose_name='Дата отчисления')),
+                ('expulsion_reason', models.CharField(blank=True, choices=[('own_desire', 'По собственному желанию'), ('transfer', 'По переводу'), ('academic_failure', 'За недобросовестное освоение программы'), ('other', 'Другая причина')], max_length=20, null=True, verbose_name='Причина отчисления')),
+                ('graduation_date', models.DateField(blank=True, null=True, verbose_name='Дата выпуска')),
+                ('academic_leave_start', models.DateField(blank=True, null=True, verbose_name='Начало академа')),
+                ('academic_leave_end', models.DateField(blank=True, null=True, verbose_name='Конец академа')),
+                ('transfer_history', models.JSONField(blank=True, default=list, verbose_name='История переводов')),
+                ('current_department', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='current_students', to='students.department', verbose_name='Текущая кафедра')),
+                ('current_program', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='current_students', to='students.program', verbose_name='Текущая программа')),
+                ('initial_department', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='initial_students', to='students.department', verbose_name='Первоначальная кафедра')),
+                ('initial_program', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='initial_students', to='students.program', verbose_name='Первоначальная программа')),
+            ],
+            options={
+                'verbose_name': 'Студент',
+                'verbose_name_plural': 'Студенты',
+                'ordering': ['last_name', 'first_name', 'middle_name'],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='student_name_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['status', 'expulsion_reason'], name='student_status_reason_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['enrollment_date', 'status'], name='student_enrollment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['current_department', 'status'], name='student_dept_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['current_program', 'status'], name='student_program_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['education_type', 'admission_basis'], name='student_edu_basis_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(condition=models.Q(('status', 'expelled')), fields=['expulsion_reason', 'last_name', 'first_name'], name='student_expelled_idx'),
+        ),
+    ]
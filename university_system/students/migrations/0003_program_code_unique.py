@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0002_student_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='program',
+            name='code',
+            field=models.CharField(max_length=20, unique=True, verbose_name='Код специальности'),
+        ),
+    ]
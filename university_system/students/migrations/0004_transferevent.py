@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_program_code_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransferEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата перевода')),
+                ('from_program', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transfers_out', to='students.program', verbose_name='Исходная программа')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfer_events', to='students.student', verbose_name='Студент')),
+                ('to_program', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transfers_in', to='students.program', verbose_name='Новая программа')),
+            ],
+            options={
+                'verbose_name': 'Перевод',
+                'verbose_name_plural': 'Переводы',
+                'ordering': ['date', 'id'],
+                'indexes': [models.Index(fields=['date'], name='transfer_date_idx'), models.Index(fields=['from_program', 'date'], name='transfer_from_date_idx'), models.Index(fields=['to_program', 'date'], name='transfer_to_date_idx')],
+            },
+        ),
+    ]
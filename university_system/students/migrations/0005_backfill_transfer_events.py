@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:58
+
+from datetime import datetime
+
+from django.db import migrations
+
+BATCH_SIZE = 5000
+
+
+def backfill_transfer_events(apps, schema_editor):
+    """Переносит Student.transfer_history в таблицу переводов пачками"""
+    Student = apps.get_model('students', 'Student')
+    Program = apps.get_model('students', 'Program')
+    TransferEvent = apps.get_model('students', 'TransferEvent')
+
+    program_ids = set(Program.objects.values_list('id', flat=True))
+    batch = []
+    students = Student.objects.values_list('id', 'transfer_history').order_by('id')
+    for student_id, history in students.iterator(chunk_size=BATCH_SIZE):
+        for transfer in history or []:
+            try:
+                date = datetime.strptime(transfer['date'], '%Y-%m-%d').date()
+            except (KeyError, TypeError, ValueError):
+                continue
+            batch.append(TransferEvent(
+                student_id=student_id,
+                date=date,
+                # Ссылки на удаленные программы не переносим
+                from_program_id=transfer.get('from') if transfer.get('from') in program_ids else None,
+                to_program_id=transfer.get('to') if transfer.get('to') in program_ids else None,
+            ))
+        if len(batch) >= BATCH_SIZE:
+            TransferEvent.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        TransferEvent.objects.bulk_create(batch)
+
+
+def clear_transfer_events(apps, schema_editor):
+    apps.get_model('students', 'TransferEvent').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("students", "0004_transferevent"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_transfer_events, clear_transfer_events),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:10
+
+from django.db import migrations
+
+SEARCH_TABLE = 'students_student_search'
+
+
+def _normalized(prefix, column):
+    # Регистр снимает токенизатор unicode61, а ё и е он различает
+    return f"replace(replace({prefix}{column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _insert_row(prefix):
+    columns = ', '.join(_normalized(prefix, column) for column in ('last_name', 'first_name', 'middle_name'))
+    return f"INSERT INTO {SEARCH_TABLE} (rowid, last_name, first_name, middle_name) VALUES ({prefix}id, {columns});"
+
+
+FORWARD_SQL = [
+    f"""CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+        last_name, first_name, middle_name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )""",
+    f"""INSERT INTO {SEARCH_TABLE} (rowid, last_name, first_name, middle_name)
+        SELECT id, {_normalized('', 'last_name')}, {_normalized('', 'first_name')}, {_normalized('', 'middle_name')}
+        FROM students_student""",
+    f"""CREATE TRIGGER students_student_search_ai AFTER INSERT ON students_student BEGIN
+        {_insert_row('new.')}
+    END""",
+    f"""CREATE TRIGGER students_student_search_ad AFTER DELETE ON students_student BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER students_student_search_au
+        AFTER UPDATE OF last_name, first_name, middle_name ON students_student BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+        {_insert_row('new.')}
+    END""",
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS students_student_search_au",
+    "DROP TRIGGER IF EXISTS students_student_search_ad",
+    "DROP TRIGGER IF EXISTS students_student_search_ai",
+    f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 есть только в SQLite; на других БД поиск работает без индекса
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FORWARD_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in REVERSE_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("students", "0005_backfill_transfer_events"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+STUDENT_KEY_FIELDS = ('current_department_id', 'current_program_id', 'status', 'education_type', 'admission_basis')
+COUNTER_KEY_FIELDS = ('department_id', 'program_id', 'status', 'education_type', 'admission_basis')
+
+
+def fill_student_counters(apps, schema_editor):
+    """Заполняет счетчики по существующим студентам (как rebuild_counters)"""
+    Student = apps.get_model('students', 'Student')
+    StudentCounter = apps.get_model('students', 'StudentCounter')
+    rows = Student.objects.order_by().values_list(*STUDENT_KEY_FIELDS).annotate(count=Count('id'))
+    StudentCounter.objects.bulk_create([
+        StudentCounter(count=row[-1], **dict(zip(COUNTER_KEY_FIELDS, row[:-1]))) for row in rows
+    ])
+
+
+def clear_student_counters(apps, schema_editor):
+    apps.get_model('students', 'StudentCounter').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0006_student_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('active', 'Обучается'), ('academic', 'В академе'), ('graduated', 'Выпускник'), ('expelled', 'Отчислен')], max_length=20, verbose_name='Статус')),
+                ('education_type', models.CharField(choices=[('budget', 'Бюджет'), ('contract', 'Контракт')], max_length=10, verbose_name='Тип обучения')),
+                ('admission_basis', models.CharField(choices=[('general', 'Общий конкурс'), ('target', 'Целевое'), ('quota', 'Квота')], max_length=10, verbose_name='Основание поступления')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+                ('department', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='student_counters', to='students.department', verbose_name='Кафедра')),
+                ('program', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='student_counters', to='students.program', verbose_name='Программа')),
+            ],
+            options={
+                'verbose_name': 'Счетчик студентов',
+                'verbose_name_plural': 'Счетчики студентов',
+                'constraints': [models.UniqueConstraint(fields=('department', 'program', 'status', 'education_type', 'admission_basis'), name='student_counter_key_unique')],
+            },
+        ),
+        migrations.RunPython(fill_student_counters, clear_student_counters),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0007_studentcounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['enrollment_date', 'expulsion_date', 'graduation_date', 'academic_leave_start', 'academic_leave_end', 'initial_department', 'initial_program'], name='student_snapshot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transferevent',
+            index=models.Index(fields=['student', 'date'], name='transfer_student_date_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0008_snapshot_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleCohort',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enrollment_year', models.PositiveSmallIntegerField(unique=True, verbose_name='Год зачисления')),
+            ],
+            options={
+                'verbose_name': 'Когорта к пересчету',
+                'verbose_name_plural': 'Когорты к пересчету',
+            },
+        ),
+        migrations.CreateModel(
+            name='CohortReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enrollment_year', models.PositiveSmallIntegerField(verbose_name='Год зачисления')),
+                ('education_type', models.CharField(choices=[('budget', 'Бюджет'), ('contract', 'Контракт')], max_length=10, verbose_name='Тип обучения')),
+                ('size', models.IntegerField(verbose_name='Размер когорты')),
+                ('retention', models.JSONField(default=list, verbose_name='Контрольные точки')),
+                ('refreshed_at', models.DateTimeField(verbose_name='Пересчитано')),
+                ('program', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cohort_reports', to='students.program', verbose_name='Программа при зачислении')),
+            ],
+            options={
+                'verbose_name': 'Отчет по когорте',
+                'verbose_name_plural': 'Отчеты по когортам',
+                'ordering': ['enrollment_year', 'program', 'education_type'],
+                'constraints': [models.UniqueConstraint(fields=('enrollment_year', 'program', 'education_type'), name='cohort_report_key_unique')],
+            },
+        ),
+    ]
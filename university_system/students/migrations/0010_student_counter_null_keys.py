@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:40
+
+from django.db import migrations, models
+from django.db.models import Count
+
+STUDENT_KEY_FIELDS = ('current_department_id', 'current_program_id', 'status', 'education_type', 'admission_basis')
+COUNTER_KEY_FIELDS = ('department_id', 'program_id', 'status', 'education_type', 'admission_basis')
+
+
+def rebuild_student_counters(apps, schema_editor):
+    """Пересчитывает счетчики по студентам (как rebuild_counters).
+
+    Убирает дубли ключей с NULL, которые допускало прежнее ограничение, и
+    заполняет таблицу в базах, где 0007 еще создавала ее пустой.
+    """
+    Student = apps.get_model('students', 'Student')
+    StudentCounter = apps.get_model('students', 'StudentCounter')
+    rows = Student.objects.order_by().values_list(*STUDENT_KEY_FIELDS).annotate(count=Count('id'))
+    StudentCounter.objects.all().delete()
+    StudentCounter.objects.bulk_create([
+        StudentCounter(count=row[-1], **dict(zip(COUNTER_KEY_FIELDS, row[:-1]))) for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0009_cohort_reports'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_student_counters, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='studentcounter',
+            constraint=models.UniqueConstraint(condition=models.Q(('department__isnull', True)), fields=('program', 'status', 'education_type', 'admission_basis'), name='student_counter_no_department_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='studentcounter',
+            constraint=models.UniqueConstraint(condition=models.Q(('program__isnull', True)), fields=('department', 'status', 'education_type', 'admission_basis'), name='student_counter_no_program_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='studentcounter',
+            constraint=models.UniqueConstraint(condition=models.Q(('department__isnull', True), ('program__isnull', True)), fields=('status', 'education_type', 'admission_basis'), name='student_counter_no_references_unique'),
+        ),
+    ]
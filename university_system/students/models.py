@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 
 class Department(models.Model):
@@ -24,7 +24,7 @@ class Program(models.Model):
         ('postgraduate', 'Аспирантура'),
     ]
 
-    code = models.CharField(max_length=20, verbose_name="Код специальности")
+    code = models.CharField(max_length=20, unique=True, verbose_name="Код специальности")
     old_code = models.CharField(max_length=20, blank=True, verbose_name="Старый шифр")
     name = models.CharField(max_length=200, verbose_name="Направление подготовки")
     program_name = models.CharField(max_length=300, verbose_name="Образовательная программа")
@@ -102,7 +102,154 @@ class Student(models.Model):
     def __str__(self):
         return f"{self.last_name} {self.first_name} {self.middle_name}"
 
+    # Запись студента и обработчики ее сигналов (счетчики, переводы, когорты)
+    # - одна транзакция: ошибка обработчика откатывает и саму запись
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
     class Meta:
         verbose_name = "Студент"
         verbose_name_plural = "Студенты"
-        ordering = ['last_name', 'first_name', 'middle_name']
\ No newline at end of file
+        ordering = ['last_name', 'first_name', 'middle_name']
+        # Индексы под фильтры StudentListView и сортировку реестра
+        indexes = [
+            # Сортировка и keyset-пагинация по ФИО
+            models.Index(fields=['last_name', 'first_name', 'id'], name='student_name_order_idx'),
+            models.Index(fields=['status', 'expulsion_reason'], name='student_status_reason_idx'),
+            models.Index(fields=['enrollment_date', 'status'], name='student_enrollment_idx'),
+            models.Index(fields=['current_department', 'status'], name='student_dept_status_idx'),
+            models.Index(fields=['current_program', 'status'], name='student_program_status_idx'),
+            models.Index(fields=['education_type', 'admission_basis'], name='student_edu_basis_idx'),
+            # Частичный индекс: причина отчисления нужна только отчисленным
+            models.Index(fields=['expulsion_reason', 'last_name', 'first_name'],
+                         condition=models.Q(status='expelled'), name='student_expelled_idx'),
+            # Срезы на дату (?as_of=): статус и исходная кафедра читаются из индекса без таблицы
+            models.Index(fields=['enrollment_date', 'expulsion_date', 'graduation_date', 'academic_leave_start',
+                                 'academic_leave_end', 'initial_department', 'initial_program'],
+                         name='student_snapshot_idx'),
+        ]
+
+
+class TransferEvent(models.Model):
+    """Перевод студента между программами.
+
+    Дублирует записи Student.transfer_history в виде таблицы с индексами,
+    чтобы аналитика по переводам выполнялась запросами к БД.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE,
+                                related_name='transfer_events', verbose_name="Студент")
+    date = models.DateField(verbose_name="Дата перевода")
+    from_program = models.ForeignKey(Program, on_delete=models.SET_NULL, null=True,
+                                     related_name='transfers_out', verbose_name="Исходная программа")
+    to_program = models.ForeignKey(Program, on_delete=models.SET_NULL, null=True,
+                                   related_name='transfers_in', verbose_name="Новая программа")
+
+    def __str__(self):
+        return f"{self.student_id}: {self.from_program_id} -> {self.to_program_id} ({self.date})"
+
+    class Meta:
+        verbose_name = "Перевод"
+        verbose_name_plural = "Переводы"
+        ordering = ['date', 'id']
+        indexes = [
+            models.Index(fields=['date'], name='transfer_date_idx'),
+            models.Index(fields=['from_program', 'date'], name='transfer_from_date_idx'),
+            models.Index(fields=['to_program', 'date'], name='transfer_to_date_idx'),
+            # Последний перевод студента к дате среза
+            models.Index(fields=['student', 'date'], name='transfer_student_date_idx'),
+        ]
+
+
+class StudentCounter(models.Model):
+    """Количество студентов в разрезе кафедры, программы, статуса, типа обучения и основания.
+
+    Поддерживается инкрементально при записи студентов (students.counters),
+    полностью пересчитывается командой rebuild_student_counters.
+    """
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True,
+                                   related_name='student_counters', verbose_name="Кафедра")
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, null=True,
+                                related_name='student_counters', verbose_name="Программа")
+    status = models.CharField(max_length=20, choices=Student.STATUS_CHOICES, verbose_name="Статус")
+    education_type = models.CharField(max_length=10, choices=Student.EDUCATION_TYPE_CHOICES,
+                                      verbose_name="Тип обучения")
+    admission_basis = models.CharField(max_length=10, choices=Student.ADMISSION_BASIS_CHOICES,
+                                       verbose_name="Основание поступления")
+    count = models.IntegerField(default=0, verbose_name="Количество")
+
+    def __str__(self):
+        return (f"{self.department_id}/{self.program_id} {self.status} "
+                f"{self.education_type} {self.admission_basis}: {self.count}")
+
+    class Meta:
+        verbose_name = "Счетчик студентов"
+        verbose_name_plural = "Счетчики студентов"
+        # NULL в уникальном ключе не равен другому NULL, поэтому ключи без
+        # кафедры или программы защищены отдельными частичными ограничениями
+        constraints = [
+            models.UniqueConstraint(
+                fields=['department', 'program', 'status', 'education_type', 'admission_basis'],
+                name='student_counter_key_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['program', 'status', 'education_type', 'admission_basis'],
+                condition=models.Q(department__isnull=True),
+                name='student_counter_no_department_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['department', 'status', 'education_type', 'admission_basis'],
+                condition=models.Q(program__isnull=True),
+                name='student_counter_no_program_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['status', 'education_type', 'admission_basis'],
+                condition=models.Q(department__isnull=True, program__isnull=True),
+                name='student_counter_no_references_unique',
+            ),
+        ]
+
+
+class CohortReport(models.Model):
+    """Удержание когорты: студенты года зачисления, программы и типа обучения.
+
+    retention - список контрольных точек через 1, 2, ... лет после
+    зачисления: количество и доли по статусам и причинам отчисления на дату
+    точки. Пересчитывается командой refresh_cohort_reports (students.cohorts).
+    """
+    enrollment_year = models.PositiveSmallIntegerField(verbose_name="Год зачисления")
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, null=True,
+                                related_name='cohort_reports', verbose_name="Программа при зачислении")
+    education_type = models.CharField(max_length=10, choices=Student.EDUCATION_TYPE_CHOICES,
+                                      verbose_name="Тип обучения")
+    size = models.IntegerField(verbose_name="Размер когорты")
+    retention = models.JSONField(default=list, verbose_name="Контрольные точки")
+    refreshed_at = models.DateTimeField(verbose_name="Пересчитано")
+
+    def __str__(self):
+        return f"{self.enrollment_year} {self.program_id} {self.education_type}: {self.size}"
+
+    class Meta:
+        verbose_name = "Отчет по когорте"
+        verbose_name_plural = "Отчеты по когортам"
+        ordering = ['enrollment_year', 'program', 'education_type']
+        constraints = [
+            models.UniqueConstraint(fields=['enrollment_year', 'program', 'education_type'],
+                                    name='cohort_report_key_unique'),
+        ]
+
+
+class StaleCohort(models.Model):
+    """Год зачисления, студенты которого изменились после пересчета отчетов по когортам"""
+    enrollment_year = models.PositiveSmallIntegerField(unique=True, verbose_name="Год зачисления")
+
+    def __str__(self):
+        return str(self.enrollment_year)
+
+    class Meta:
+        verbose_name = "Когорта к пересчету"
+        verbose_name_plural = "Когорты к пересчету"
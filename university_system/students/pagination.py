@@ -0,0 +1,126 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Порядок выдачи реестра студентов; id делает ключ уникальным
+STUDENT_ORDERING = ('last_name', 'first_name', 'id')
+
+
+class StudentKeysetPagination(BasePagination):
+    """Курсорная (keyset) пагинация по (last_name, first_name, id).
+
+    Включается только при наличии параметров cursor или page_size, чтобы
+    клиенты, ожидающие полный список, продолжали работать без изменений.
+    Следующая страница выбирается условием "ключ больше последнего",
+    поэтому стоимость запроса не растет с номером страницы.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request)
+        if page_queryset is None:
+            return None
+        return self.set_page(list(page_queryset))
+
+    def get_page_queryset(self, queryset, request):
+        """Запрос страницы или None, если пагинация не запрошена.
+
+        Отделен от выполнения запроса, чтобы асинхронные view могли
+        вычитать его через async for.
+        """
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*STUDENT_ORDERING)
+        if position is not None:
+            last_name, first_name, pk = position
+            queryset = queryset.filter(
+                Q(last_name__gt=last_name)
+                | Q(last_name=last_name, first_name__gt=first_name)
+                | Q(last_name=last_name, first_name=first_name, id__gt=pk)
+            )
+
+        # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        # Страница может состоять из моделей или словарей values()
+        if isinstance(last, dict):
+            position = (last['last_name'], last['first_name'], last['id'])
+        else:
+            position = (last.last_name, last.first_name, last.id)
+        cursor = self.encode_cursor(position)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def encode_cursor(self, position):
+        data = json.dumps(position, ensure_ascii=False, separators=(',', ':'))
+        return b64encode(data.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            last_name, first_name, pk = json.loads(b64decode(encoded.encode('ascii'), validate=True))
+            if not isinstance(last_name, str) or not isinstance(first_name, str) or not isinstance(pk, int):
+                raise ValueError
+        except (TypeError, ValueError, UnicodeError, BinasciiError):
+            raise NotFound(self.invalid_cursor_message)
+        return last_name, first_name, pk
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор следующей страницы',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Размер страницы',
+                'schema': {'type': 'integer'},
+            },
+        ]
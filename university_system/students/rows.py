@@ -0,0 +1,118 @@
+from operator import itemgetter
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Типы полей, значения которых после values_list() уже совпадают с to_representation()
+PLAIN_FIELDS = (
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.JSONField,
+)
+
+
+class ValuesRowSerializer:
+    """Строит те же словари, что и serializer_class, из кортежей values_list().
+
+    Разбор полей сериализатора выполняется один раз: для каждого поля
+    заранее вычисляется номер столбца и функция преобразования, подписи
+    choices берутся из готовых словарей. Поэтому на строку не создаются
+    модели и не вызывается to_representation() каждого поля DRF.
+    """
+
+    def __init__(self, serializer_class):
+        self.columns = []
+        self.build_row = self._compile(serializer_class(), '')
+
+    def _column(self, path):
+        if path not in self.columns:
+            self.columns.append(path)
+        return self.columns.index(path)
+
+    def _compile(self, serializer, prefix):
+        model = serializer.Meta.model
+        builders = []
+        for name, field in serializer.fields.items():
+            if isinstance(field, serializers.BaseSerializer):
+                builders.append((name, self._compile(field, f'{prefix}{field.source}__')))
+            elif field.source.startswith('get_') and field.source.endswith('_display'):
+                model_field = model._meta.get_field(field.source[4:-8])
+                labels = {value: str(label) for value, label in model_field.flatchoices}
+                builders.append((name, self._display(self._column(prefix + model_field.name), labels)))
+            elif isinstance(field, serializers.DateField):
+                if getattr(field, 'format', api_settings.DATE_FORMAT) != ISO_8601:
+                    raise ImproperlyConfigured(f'Поле {name}: поддерживается только формат даты ISO 8601')
+                builders.append((name, self._date(self._column(prefix + field.source))))
+            elif isinstance(field, PLAIN_FIELDS):
+                builders.append((name, itemgetter(self._column(prefix + field.source))))
+            else:
+                raise ImproperlyConfigured(f'Поле {name} ({type(field).__name__}) не поддерживается')
+
+        # Вложенная запись отсутствует, если пустой ее первичный ключ
+        pk_index = self._column(f'{prefix}id') if prefix else None
+
+        def build(row):
+            if pk_index is not None and row[pk_index] is None:
+                return None
+            return {name: builder(row) for name, builder in builders}
+
+        return build
+
+    @staticmethod
+    def _display(index, labels):
+        def display(row):
+            value = row[index]
+            return None if value is None else labels.get(value, value)
+        return display
+
+    @staticmethod
+    def _date(index):
+        def date(row):
+            value = row[index]
+            return None if value is None else value.isoformat()
+        return date
+
+    def values_list(self, queryset):
+        """Проекция queryset в кортежи; named=True нужен keyset-пагинации"""
+        return queryset.values_list(*self.columns, named=True)
+
+    def to_representation(self, rows):
+        build_row = self.build_row
+        return [build_row(row) for row in rows]
+
+
+def _default(obj):
+    return JSONEncoder().default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer, кодирующий через orjson, если он установлен.
+
+    Результат побайтно совпадает с JSONRenderer: компактные разделители,
+    UTF-8 без экранирования, \\u2028 и \\u2029 экранируются. Даты и прочие
+    нестандартные типы кодируются тем же JSONEncoder из DRF. В режиме с
+    отступами, при нестандартных настройках или ошибке orjson (например,
+    слишком большое целое) используется обычный json из стандартной библиотеки.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default,
+                               option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,43 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Полнотекстовый индекс ФИО (SQLite FTS5), создается миграцией 0006
+SEARCH_TABLE = 'students_student_search'
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize_search_text(text):
+    """Приводит текст к виду, в котором он хранится в индексе: без регистра, ё -> е"""
+    return text.casefold().replace('ё', 'е')
+
+
+def search_tokens(query):
+    return _TOKEN_RE.findall(normalize_search_text(query))
+
+
+def build_search_filter(query):
+    """Q-фильтр поиска по началу слов фамилии, имени и отчества.
+
+    Все слова запроса должны совпасть с началом какого-либо из трех полей.
+    На SQLite используется индекс FTS5, на остальных БД - istartswith.
+    """
+    tokens = search_tokens(query)
+    if not tokens:
+        return Q()
+
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        return Q(id__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [match]))
+
+    search_filter = Q()
+    for token in tokens:
+        search_filter &= (
+            Q(last_name__istartswith=token)
+            | Q(first_name__istartswith=token)
+            | Q(middle_name__istartswith=token)
+        )
+    return search_filter
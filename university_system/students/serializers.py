@@ -1,6 +1,11 @@
+from datetime import datetime
+
 from rest_framework import serializers
 from .models import Student, Department, Program
 
+# Поля записи transfer_history со ссылками на программы
+TRANSFER_PROGRAM_FIELDS = ('from', 'to')
+
 
 class DepartmentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -16,7 +21,39 @@ class ProgramSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'code', 'department']
 
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentCountsMixin(serializers.Serializer):
+    """Количество студентов из аннотаций counters.annotate_student_counts"""
+    student_counts = serializers.SerializerMethodField()
+
+    def get_student_counts(self, obj):
+        counts = {'total': obj.student_count}
+        for status, _ in Student.STATUS_CHOICES:
+            counts[status] = getattr(obj, f'{status}_count')
+        return counts
+
+
+class DepartmentCountsSerializer(StudentCountsMixin, DepartmentSerializer):
+    class Meta(DepartmentSerializer.Meta):
+        fields = DepartmentSerializer.Meta.fields + ['student_counts']
+
+
+class ProgramCountsSerializer(StudentCountsMixin, ProgramSerializer):
+    class Meta(ProgramSerializer.Meta):
+        fields = ProgramSerializer.Meta.fields + ['student_counts']
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer, которому можно передать fields=[...] для сокращения ответа"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class StudentSerializer(DynamicFieldsModelSerializer):
     current_department = DepartmentSerializer(read_only=True)
     current_program = ProgramSerializer(read_only=True)
     initial_department = DepartmentSerializer(read_only=True)
@@ -30,3 +67,49 @@ class StudentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Student
         fields = '__all__'
+
+
+class StudentWriteSerializer(serializers.ModelSerializer):
+    """Проверка полей студента для массовой записи.
+
+    Связи передаются id; их существование проверяется одним запросом на
+    весь пакет (students.bulk), а не запросом на каждое поле каждой записи.
+    """
+    current_department = serializers.IntegerField(source='current_department_id', allow_null=True, required=False)
+    current_program = serializers.IntegerField(source='current_program_id', allow_null=True, required=False)
+    initial_department = serializers.IntegerField(source='initial_department_id', allow_null=True, required=False)
+    initial_program = serializers.IntegerField(source='initial_program_id', allow_null=True, required=False)
+
+    class Meta:
+        model = Student
+        exclude = ['id']
+
+    def validate_transfer_history(self, value):
+        """Список переводов {"date": "ГГГГ-ММ-ДД", "from": id, "to": id}.
+
+        Существование программ проверяется вместе с остальными связями пакета.
+        """
+        if not isinstance(value, list):
+            raise serializers.ValidationError('Ожидается список переводов')
+        errors = []
+        for index, transfer in enumerate(value):
+            if not isinstance(transfer, dict):
+                errors.append(f'Перевод {index}: ожидается объект с полями date, from, to')
+                continue
+            try:
+                datetime.strptime(transfer.get('date'), '%Y-%m-%d')
+            except (TypeError, ValueError):
+                errors.append(f'Перевод {index}: date - дата в формате ГГГГ-ММ-ДД')
+            for field in TRANSFER_PROGRAM_FIELDS:
+                if not isinstance(transfer.get(field), int) or isinstance(transfer.get(field), bool):
+                    errors.append(f'Перевод {index}: {field} - id программы')
+        if errors:
+            raise serializers.ValidationError(errors)
+        return value
+
+
+class StudentTransitionSerializer(serializers.Serializer):
+    """Смена статуса: дата события и причина отчисления"""
+    status = serializers.ChoiceField(choices=Student.STATUS_CHOICES)
+    date = serializers.DateField(required=False)
+    expulsion_reason = serializers.ChoiceField(choices=Student.EXPULSION_REASON_CHOICES, required=False)
@@ -0,0 +1,136 @@
+from rest_framework.exceptions import ValidationError
+
+from .models import Department, Program, Student
+from .serializers import StudentSerializer
+
+# Формы ответа реестра: вложенная (по умолчанию) и плоская с подгруженными справочниками
+SHAPES = ('nested', 'flat')
+
+# Поля, которые вложенный сериализатор читает у связанных записей
+RELATION_FIELDS = {
+    'current_department': ['current_department__id', 'current_department__name'],
+    'initial_department': ['initial_department__id', 'initial_department__name'],
+    'current_program': [
+        'current_program__id', 'current_program__name', 'current_program__code',
+        'current_program__department__id', 'current_program__department__name',
+    ],
+    'initial_program': [
+        'initial_program__id', 'initial_program__name', 'initial_program__code',
+        'initial_program__department__id', 'initial_program__department__name',
+    ],
+}
+RELATION_SELECT = {
+    'current_department': 'current_department',
+    'initial_department': 'initial_department',
+    'current_program': 'current_program__department',
+    'initial_program': 'initial_program__department',
+}
+
+# Поля с подписями choices: поле ответа -> (поле модели, словарь подписей)
+DISPLAY_FIELDS = {
+    'status_display': ('status', dict(Student.STATUS_CHOICES)),
+    'education_type_display': ('education_type', dict(Student.EDUCATION_TYPE_CHOICES)),
+    'admission_basis_display': ('admission_basis', dict(Student.ADMISSION_BASIS_CHOICES)),
+    'expulsion_reason_display': ('expulsion_reason', dict(Student.EXPULSION_REASON_CHOICES)),
+}
+
+# Поля, без которых не работает keyset-пагинация
+REQUIRED_COLUMNS = ('id', 'last_name', 'first_name')
+
+STUDENT_FIELDS = tuple(StudentSerializer().fields)
+FLAT_DEFAULT_FIELDS = tuple(name for name in STUDENT_FIELDS if name not in DISPLAY_FIELDS)
+
+
+def parse_shape(params):
+    shape = params.get('shape', 'nested').lower()
+    if shape not in SHAPES:
+        raise ValidationError({'shape': f'Допустимые значения: {", ".join(SHAPES)}'})
+    return shape
+
+
+def parse_fields(params):
+    """Список запрошенных полей ?fields= в порядке полей сериализатора или None"""
+    if not params.get('fields'):
+        return None
+    requested = {name.strip() for name in params['fields'].split(',') if name.strip()}
+    unknown = requested - set(STUDENT_FIELDS)
+    if unknown:
+        raise ValidationError({'fields': f'Неизвестные поля: {", ".join(sorted(unknown))}'})
+    return [name for name in STUDENT_FIELDS if name in requested]
+
+
+def project_queryset(queryset, fields):
+    """Загружает только столбцы, нужные для вложенного ответа с полями fields"""
+    columns = set(REQUIRED_COLUMNS)
+    select = []
+    for name in fields:
+        if name in RELATION_FIELDS:
+            columns.add(name)
+            columns.update(RELATION_FIELDS[name])
+            select.append(RELATION_SELECT[name])
+        elif name in DISPLAY_FIELDS:
+            columns.add(DISPLAY_FIELDS[name][0])
+        else:
+            columns.add(name)
+    return queryset.select_related(None).select_related(*select).only(*columns)
+
+
+def flat_columns(fields):
+    """Столбцы values() для плоского ответа: связи передаются как *_id"""
+    columns = list(REQUIRED_COLUMNS)
+    for name in fields:
+        if name in RELATION_FIELDS:
+            column = f'{name}_id'
+        elif name in DISPLAY_FIELDS:
+            column = DISPLAY_FIELDS[name][0]
+        else:
+            column = name
+        if column not in columns:
+            columns.append(column)
+    return columns
+
+
+def flat_row(row, fields):
+    result = {}
+    for name in fields:
+        if name in RELATION_FIELDS:
+            result[f'{name}_id'] = row[f'{name}_id']
+        elif name in DISPLAY_FIELDS:
+            source, labels = DISPLAY_FIELDS[name]
+            result[name] = labels.get(row[source], row[source])
+        else:
+            result[name] = row[name]
+    return result
+
+
+def flat_payload(rows, fields):
+    """Плоские строки и один на ответ словарь упомянутых кафедр и программ"""
+    department_ids = set()
+    program_ids = set()
+    for row in rows:
+        for name in ('current_department', 'initial_department'):
+            if name in fields and row[f'{name}_id'] is not None:
+                department_ids.add(row[f'{name}_id'])
+        for name in ('current_program', 'initial_program'):
+            if name in fields and row[f'{name}_id'] is not None:
+                program_ids.add(row[f'{name}_id'])
+
+    programs = {}
+    if program_ids:
+        for program in Program.objects.filter(id__in=program_ids).values('id', 'name', 'code', 'department_id'):
+            programs[program['id']] = program
+            if program['department_id'] is not None:
+                department_ids.add(program['department_id'])
+
+    departments = {}
+    if department_ids:
+        departments = {
+            department['id']: department
+            for department in Department.objects.filter(id__in=department_ids).values('id', 'name')
+        }
+
+    return {
+        'results': [flat_row(row, fields) for row in rows],
+        'departments': departments,
+        'programs': programs,
+    }
@@ -0,0 +1,97 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_reference_version, bump_student_generation
+from .cohorts import enrollment_year, mark_all_cohorts_stale, mark_cohorts_stale
+from .counters import STUDENT_KEY_FIELDS, apply_counter_deltas, counter_key, rebuild_counters
+from .models import Department, Program, ProgramGroup, Student
+from .transfers import create_transfer_events, sync_transfer_events
+
+
+@receiver([post_save, post_delete], sender=Department)
+@receiver([post_save, post_delete], sender=Program)
+@receiver([post_save, post_delete], sender=ProgramGroup)
+def invalidate_reference_cache(sender, **kwargs):
+    # После COMMIT, как и у студентов: админка сохраняет в транзакции
+    transaction.on_commit(bump_reference_version)
+
+
+@receiver([post_save, post_delete], sender=Student)
+def invalidate_student_cache(sender, **kwargs):
+    # Запись идет в транзакции (Student.save): сдвиг до COMMIT позволил бы
+    # параллельному чтению положить старые строки под новый ключ
+    transaction.on_commit(bump_student_generation)
+
+
+@receiver(post_save, sender=Student)
+def update_transfer_events(sender, instance, created=False, raw=False, **kwargs):
+    # Таблица переводов повторяет transfer_history; при загрузке фикстур
+    # (raw) записи переводов приходят отдельно
+    if raw:
+        return
+    if created:
+        create_transfer_events([instance])
+    else:
+        sync_transfer_events(instance)
+
+
+@receiver(pre_save, sender=Student)
+def remember_stored_keys(sender, instance, raw=False, **kwargs):
+    # Запоминаем ключ счетчика и год зачисления до изменения, чтобы
+    # перенести студента в post_save
+    instance._stored_counter_key = instance._stored_enrollment_year = None
+    if raw or instance.pk is None:
+        return
+    stored = Student.objects.filter(pk=instance.pk).values_list(*STUDENT_KEY_FIELDS, 'enrollment_date').first()
+    if stored is not None:
+        instance._stored_counter_key = stored[:-1]
+        instance._stored_enrollment_year = stored[-1].year
+
+
+@receiver(post_save, sender=Student)
+def update_counters_on_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = Counter()
+    old_key = getattr(instance, '_stored_counter_key', None)
+    if old_key is not None:
+        deltas[old_key] -= 1
+    deltas[counter_key(instance)] += 1
+    # Списание со старого ключа и зачисление на новый - вместе или никак
+    with transaction.atomic():
+        apply_counter_deltas(deltas)
+
+
+@receiver(post_delete, sender=Student)
+def update_counters_on_delete(sender, instance, **kwargs):
+    with transaction.atomic():
+        apply_counter_deltas({counter_key(instance): -1})
+
+
+@receiver(post_delete, sender=Department)
+@receiver(post_delete, sender=Program)
+def rebuild_counters_on_reference_delete(sender, **kwargs):
+    # Студенты удаленной кафедры или программы переходят на NULL, счетчики
+    # по ней удаляются каскадно - проще пересчитать таблицу целиком
+    rebuild_counters()
+
+
+@receiver(post_save, sender=Student)
+def mark_cohort_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    mark_cohorts_stale([enrollment_year(instance.enrollment_date), getattr(instance, '_stored_enrollment_year', None)])
+
+
+@receiver(post_delete, sender=Student)
+def mark_cohort_on_delete(sender, instance, **kwargs):
+    mark_cohorts_stale([enrollment_year(instance.enrollment_date)])
+
+
+@receiver(post_delete, sender=Program)
+def mark_cohorts_on_program_delete(sender, **kwargs):
+    # Отчеты программы удаляются каскадно, ее студенты переходят в когорты без программы
+    mark_all_cohorts_stale()
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from django.db.models import CharField, Case, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+
+from .filters import build_student_filter
+from .models import Student, TransferEvent
+
+# Поля студента и их значения на дату среза (аннотации snapshot_queryset)
+SNAPSHOT_FIELDS = {
+    'status': 'as_of_status',
+    'expulsion_reason': 'as_of_expulsion_reason',
+    'current_department': 'as_of_department',
+    'current_department_id': 'as_of_department',
+    'current_program': 'as_of_program',
+    'current_program_id': 'as_of_program',
+}
+SNAPSHOT_COLUMNS = ('as_of_status', 'as_of_expulsion_reason', 'as_of_department', 'as_of_program')
+
+
+def parse_as_of(params):
+    """Дата среза ?as_of=ГГГГ-ММ-ДД или None"""
+    if not params.get('as_of'):
+        return None
+    try:
+        return datetime.strptime(params['as_of'], '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError({'as_of': 'Ожидается дата в формате ГГГГ-ММ-ДД'})
+
+
+def snapshot_shape(params):
+    """Срез отдается только плоским: вложенные кафедры и программы были бы текущими"""
+    if params.get('stream'):
+        raise ValidationError({'as_of': 'Срез на дату не выгружается потоком'})
+    if params.get('shape', 'flat').lower() != 'flat':
+        raise ValidationError({'as_of': 'Срез на дату возвращается только с shape=flat'})
+    return 'flat'
+
+
+def status_as_of(day):
+    """Статус на дату по датам событий: отчисление и выпуск важнее академа"""
+    in_academic = Q(academic_leave_start__lte=day) & (Q(academic_leave_end__isnull=True)
+                                                     | Q(academic_leave_end__gt=day))
+    return Case(
+        When(expulsion_date__lte=day, then=Value('expelled')),
+        When(graduation_date__lte=day, then=Value('graduated')),
+        When(in_academic, then=Value('academic')),
+        default=Value('active'),
+        output_field=CharField(),
+    )
+
+
+def expulsion_reason_as_of(day):
+    return Case(When(expulsion_date__lte=day, then=F('expulsion_reason')), default=None, output_field=CharField())
+
+
+def last_transfer(day, field):
+    """Поле последнего перевода студента не позже даты (индекс transfer_student_date_idx)"""
+    return Subquery(
+        TransferEvent.objects.filter(student=OuterRef('pk'), date__lte=day)
+        .order_by('-date', '-id').values(field)[:1]
+    )
+
+
+def snapshot_queryset(queryset, day):
+    """Студенты, зачисленные к дате, со статусом, кафедрой и программой на эту дату.
+
+    Значения подключаются через alias(): подзапрос к переводам выполняется,
+    только если срез фильтрует, группирует или выводит кафедру или программу.
+    """
+    return queryset.filter(enrollment_date__lte=day).alias(
+        as_of_status=status_as_of(day),
+        as_of_expulsion_reason=expulsion_reason_as_of(day),
+        as_of_program=Coalesce(last_transfer(day, 'to_program'), F('initial_program'), output_field=IntegerField()),
+        as_of_department=Coalesce(last_transfer(day, 'to_program__department'), F('initial_department'),
+                                  output_field=IntegerField()),
+    )
+
+
+def snapshot_filter(condition):
+    """Переносит Q-фильтр по текущим полям студента на значения среза"""
+    remapped = Q(_connector=condition.connector, _negated=condition.negated)
+    for child in condition.children:
+        if isinstance(child, Q):
+            remapped.children.append(snapshot_filter(child))
+        else:
+            lookup, value = child
+            field, _, rest = lookup.partition('__')
+            if field in SNAPSHOT_FIELDS:
+                lookup = SNAPSHOT_FIELDS[field] + (f'__{rest}' if rest else '')
+            remapped.children.append((lookup, value))
+    return remapped
+
+
+def student_queryset(params, as_of=None):
+    """Студенты под фильтром реестра; с as_of фильтр применяется к значениям на дату"""
+    main_filter = build_student_filter(params)
+    if as_of is None:
+        return Student.objects.filter(main_filter)
+    return snapshot_queryset(Student.objects.all(), as_of).filter(snapshot_filter(main_filter))
+
+
+def snapshot_values(queryset, columns):
+    """values() плоского ответа вместе со значениями на дату среза"""
+    return queryset.values(*columns, **{name: F(name) for name in SNAPSHOT_COLUMNS})
+
+
+def snapshot_row(row):
+    """Подменяет в строке values() текущие значения значениями на дату среза"""
+    row['status'] = row.pop('as_of_status')
+    row['expulsion_reason'] = row.pop('as_of_expulsion_reason')
+    row['current_department_id'] = row.pop('as_of_department')
+    row['current_program_id'] = row.pop('as_of_program')
+    return row
@@ -0,0 +1,81 @@
+from django.db.models import Count, F
+from django.db.models.functions import ExtractYear
+
+from .models import Department, Program, Student
+
+# Измерения для группировки: выражение ключа и источник подписи
+# (словарь choices модели или поле связанной записи)
+DIMENSIONS = {
+    'status': (F('status'), dict(Student.STATUS_CHOICES)),
+    'expulsion_reason': (F('expulsion_reason'), dict(Student.EXPULSION_REASON_CHOICES)),
+    'current_department': (F('current_department'), F('current_department__name')),
+    'current_program': (F('current_program'), F('current_program__name')),
+    'education_type': (F('education_type'), dict(Student.EDUCATION_TYPE_CHOICES)),
+    'admission_basis': (F('admission_basis'), dict(Student.ADMISSION_BASIS_CHOICES)),
+    'enrollment_year': (ExtractYear('enrollment_date'), None),
+}
+
+# Измерения среза на дату (?as_of=): статус, причина, кафедра и программа
+# берутся из аннотаций snapshots.snapshot_queryset, подписи связей - из модели
+SNAPSHOT_DIMENSIONS = {
+    **DIMENSIONS,
+    'status': (F('as_of_status'), dict(Student.STATUS_CHOICES)),
+    'expulsion_reason': (F('as_of_expulsion_reason'), dict(Student.EXPULSION_REASON_CHOICES)),
+    'current_department': (F('as_of_department'), Department),
+    'current_program': (F('as_of_program'), Program),
+}
+
+# Группировки, которые возвращаются без явного ?group_by=
+DEFAULT_GROUP_BY = (
+    'status',
+    'expulsion_reason',
+    'current_department',
+    'current_program',
+    'education_type',
+    'admission_basis',
+)
+
+
+def group_counts(queryset, dimension, dimensions=DIMENSIONS):
+    """Количество студентов по значениям измерения одним GROUP BY"""
+    key, label = dimensions[dimension]
+    values = {'key': key}
+    if isinstance(label, F):
+        values['label'] = label
+    rows = queryset.order_by().values(**values).annotate(count=Count('id')).order_by('key')
+
+    if isinstance(label, type):
+        # Подписи связей по вычисленным id - одним запросом после группировки
+        rows = list(rows)
+        label = dict(label.objects.filter(id__in=[row['key'] for row in rows]).values_list('id', 'name'))
+
+    result = []
+    for row in rows:
+        if isinstance(label, dict):
+            row['label'] = label.get(row['key'], row['key'])
+        elif label is None:
+            row['label'] = str(row['key'])
+        result.append(row)
+    return result
+
+
+def pivot_counts(queryset, rows_dimension, columns_dimension, dimensions=DIMENSIONS):
+    """Сводная таблица {строка: {столбец: количество}} одним GROUP BY"""
+    rows = (
+        queryset.order_by()
+        .values(row=dimensions[rows_dimension][0], column=dimensions[columns_dimension][0])
+        .annotate(count=Count('id'))
+        .order_by('row', 'column')
+    )
+    data = {}
+    for item in rows:
+        data.setdefault(str(item['row']), {})[str(item['column'])] = item['count']
+    return {'rows': rows_dimension, 'columns': columns_dimension, 'data': data}
+
+
+def compute_student_stats(queryset, group_by=DEFAULT_GROUP_BY, pivots=(), dimensions=DIMENSIONS):
+    return {
+        'total': queryset.count(),
+        'groups': {dimension: group_counts(queryset, dimension, dimensions) for dimension in group_by},
+        'pivots': [pivot_counts(queryset, rows, columns, dimensions) for rows, columns in pivots],
+    }
@@ -0,0 +1,73 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+# Сколько строк за раз вычитывать из курсора БД при потоковой выдаче
+STREAM_CHUNK_SIZE = 2000
+
+# Значения параметра ?stream= и соответствующие форматы ответа
+STREAM_FORMATS = {
+    '1': 'json',
+    'true': 'json',
+    'json': 'json',
+    'ndjson': 'ndjson',
+}
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _dumps(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def iter_serialized(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE):
+    """Сериализует строки пачками, не загружая весь queryset в память.
+
+    На пачку - один сериализатор many=True: поля DRF строятся один раз
+    на пачку, а не на каждую строку.
+    """
+    chunk = []
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(instance)
+        if len(chunk) == chunk_size:
+            yield from serializer_class(chunk, many=True).data
+            chunk = []
+    if chunk:
+        yield from serializer_class(chunk, many=True).data
+
+
+def iter_value_rows(queryset, row_serializer, chunk_size=STREAM_CHUNK_SIZE):
+    """Строки ValuesRowSerializer из кортежей values_list(), без моделей и полей DRF"""
+    build_row = row_serializer.build_row
+    for row in row_serializer.values_list(queryset).iterator(chunk_size=chunk_size):
+        yield build_row(row)
+
+
+def iter_json_array(rows):
+    yield '['
+    first = True
+    for row in rows:
+        if first:
+            first = False
+            yield _dumps(row)
+        else:
+            yield ',' + _dumps(row)
+    yield ']'
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield _dumps(row) + '\n'
+
+
+def stream_response(rows, stream_format):
+    """Возвращает StreamingHttpResponse с JSON-массивом или NDJSON из строк rows"""
+    if stream_format == 'ndjson':
+        content = iter_ndjson(rows)
+    else:
+        content = iter_json_array(rows)
+    return StreamingHttpResponse(content, content_type=CONTENT_TYPES[stream_format])
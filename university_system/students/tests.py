@@ -1,3 +1,1297 @@
-from django.test import TestCase
+import csv
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+from functools import partial
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Count, F, Q
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+
+from university_system.database import database_from_env
+from .cache import bump_student_generation, get_student_generation
+from .cohorts import refresh_cohort_reports
+from .export import XLSX_CONTENT_TYPE
+from .filters import build_student_filter, parse_student_filter
+from .metrics import metrics
+from .counters import counter_drift
+from .models import CohortReport, Department, ProgramGroup, Program, Student, StudentCounter, TransferEvent
+from .rows import FastJSONRenderer, ValuesRowSerializer
+from .serializers import ProgramSerializer, StudentSerializer
+from .snapshots import student_queryset
+from .streaming import iter_serialized
+from .management.commands.explain_student_filters import Command as ExplainCommand
+
+
+def create_reference_data():
+    """Создает две кафедры с программами для тестов"""
+    group = ProgramGroup.objects.create(code='1.2', name='Компьютерные науки и информатика')
+    cs = Department.objects.create(name='Кафедра компьютерных наук', code='КН')
+    econ = Department.objects.create(name='Кафедра экономики', code='ЭК')
+    cs_program = Program.objects.create(code='1.2.1', name='Искусственный интеллект', program_name='ИИ',
+                                        group=group, department=cs, education_level='postgraduate')
+    econ_program = Program.objects.create(code='5.2.1', name='Экономическая теория', program_name='ЭТ',
+                                          group=group, department=econ, education_level='postgraduate')
+    return cs, econ, cs_program, econ_program
+
+
+def create_students(count, program, department, **extra):
+    data = {
+        'citizenship': 'Россия',
+        'enrollment_date': date(2020, 9, 1),
+        'education_type': 'budget',
+        'admission_basis': 'general',
+        'status': 'active',
+    }
+    data.update(extra)
+    students = Student.objects.bulk_create([
+        Student(
+            last_name=f'Иванов{i:05d}', first_name='Иван', middle_name='Иванович',
+            current_department=department, current_program=program,
+            initial_department=department, initial_program=program,
+            **data
+        )
+        for i in range(count)
+    ])
+    # bulk_create не отправляет сигналы, поэтому кеш выборок сбрасываем явно
+    bump_student_generation()
+    return students
+
+
+class StudentListQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_query_count_does_not_depend_on_row_count(self):
+        url = reverse('student-list')
+
+        create_students(3, self.cs_program, self.cs)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()), 3)
+
+        create_students(50, self.econ_program, self.econ, status='expelled', expulsion_reason='own_desire')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        rows = response.json()
+        self.assertEqual(len(rows), 53)
+        self.assertEqual(rows[0]['current_program']['department']['id'], rows[0]['current_department']['id'])
+
+    def test_program_list_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('program-list'), {'department_id': f'{self.cs.id},{self.econ.id}'})
+        self.assertEqual(len(response.json()), 2)
+
+
+class StudentPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        create_students(25, cls.cs_program, cls.cs)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get(reverse('student-list'))
+        self.assertIsInstance(response.json(), list)
+        self.assertEqual(len(response.json()), 25)
+
+    def test_cursor_walks_all_rows_in_order(self):
+        expected = [row['id'] for row in self.client.get(reverse('student-list')).json()]
+        seen = []
+        url = reverse('student-list') + '?page_size=10'
+        pages = 0
+        while url:
+            with self.assertNumQueries(1):
+                data = self.client.get(url).json()
+            self.assertLessEqual(len(data['results']), 10)
+            seen.extend(row['id'] for row in data['results'])
+            url = data['next']
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, expected)
+
+    def test_cursor_respects_filters(self):
+        create_students(5, self.econ_program, self.econ, status='graduated')
+        data = self.client.get(reverse('student-list'), {'statuses': 'graduated', 'page_size': 3}).json()
+        self.assertEqual(len(data['results']), 3)
+        data = self.client.get(data['next']).json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNone(data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('student-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class StudentStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        create_students(7, cls.cs_program, cls.cs)
+
+    def test_stream_json_array_matches_list(self):
+        expected = self.client.get(reverse('student-list')).json()
+        response = self.client.get(reverse('student-list'), {'stream': '1'})
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertEqual(json.loads(body), expected)
+
+    def test_stream_ndjson(self):
+        response = self.client.get(reverse('student-list'), {'stream': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(json.loads(lines[0])['current_department']['id'], self.cs.id)
+
+    def test_stream_empty(self):
+        response = self.client.get(reverse('student-list'), {'stream': '1', 'statuses': 'graduated'})
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+
+    def test_stream_serializes_in_chunks(self):
+        queryset = Student.objects.order_by('id')
+        serializer_class = partial(StudentSerializer, fields=['id', 'last_name', 'status'])
+        rows = list(iter_serialized(queryset, serializer_class, chunk_size=3))
+        self.assertEqual(rows, serializer_class(queryset, many=True).data)
+
+        params = {'fields': 'id,last_name,status'}
+        expected = self.client.get(reverse('student-list'), params).json()
+        response = self.client.get(reverse('student-list'), {**params, 'stream': '1'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), expected)
+
+    def test_stream_rejects_flat_shape(self):
+        response = self.client.get(reverse('student-list'), {'stream': '1', 'shape': 'flat'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('shape', response.json())
+
+
+class StudentIndexTests(TestCase):
+    def test_explain_command_restores_indexes(self):
+        out = StringIO()
+        call_command('explain_student_filters', stdout=out)
+        self.assertIn('Комбинаций с полным сканированием', out.getvalue())
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Student._meta.db_table)
+        for index in Student._meta.indexes:
+            self.assertIn(index.name, constraints)
+
+    def test_index_order_scan_is_full_scan(self):
+        command = ExplainCommand()
+        table = Student._meta.db_table
+        self.assertTrue(command.is_full_scan(f'SCAN {table}'))
+        self.assertTrue(command.is_full_scan(f'SCAN {table} USING INDEX student_name_order_idx'))
+        self.assertTrue(command.is_full_scan(f'SCAN {table} USING COVERING INDEX student_status_idx'))
+        self.assertFalse(command.is_full_scan(f'SEARCH {table} USING INDEX student_status_idx (status=?)'))
+        self.assertFalse(command.is_full_scan(f'SCAN {table} USING INDEX student_status_idx (status=?)'))
+
+    def test_status_filter_uses_index(self):
+        plan = Student.objects.filter(status='expelled', expulsion_reason__in=['own_desire']).explain()
+        self.assertIn('USING INDEX', plan)
+
+
+class ReferenceCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_request_hits_no_database(self):
+        url = reverse('faculty-list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(len(second.json()), 2)
+
+    def test_department_ids_are_normalized(self):
+        url = reverse('program-list')
+        self.client.get(url, {'department_id': f'{self.econ.id},{self.cs.id}'})
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'department_id': f'{self.cs.id},{self.econ.id},{self.cs.id}'})
+        self.assertEqual(len(response.json()), 2)
+
+    def test_invalid_department_ids_rejected(self):
+        for url_name in ('program-list', 'async-program-list'):
+            for value in ('abc', f'{self.cs.id},,{self.econ.id}', '9' * 20):
+                with self.subTest(url_name=url_name, value=value):
+                    response = self.client.get(reverse(url_name), {'department_id': value})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertEqual(list(response.json()), ['department_id'])
+
+    def test_not_modified(self):
+        url = reverse('faculty-list')
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_model_change_invalidates(self):
+        url = reverse('program-list')
+        etag = self.client.get(url)['ETag']
+
+        self.cs_program.name = 'Машинное обучение'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cs_program.save()
+            # До COMMIT версия не сдвигается
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Машинное обучение', [row['name'] for row in response.json()])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProgramGroup.objects.create(code='5.2', name='Экономика')
+        self.assertNotEqual(self.client.get(url)['ETag'], response['ETag'])
+
+    def test_bootstrap(self):
+        Program.objects.create(code='9.9.9', name='Без кафедры', program_name='БК', department=None,
+                               education_level='graduate')
+        url = reverse('bootstrap')
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(data['departments'], [{'id': self.cs.id, 'name': self.cs.name},
+                                               {'id': self.econ.id, 'name': self.econ.name}])
+        self.assertEqual(data['programs'], {
+            str(self.cs.id): [{'id': self.cs_program.id, 'name': self.cs_program.name, 'code': '1.2.1'}],
+            str(self.econ.id): [{'id': self.econ_program.id, 'name': self.econ_program.name, 'code': '5.2.1'}],
+        })
+        self.assertEqual(set(data['choices']), {'statuses', 'expulsion_reasons', 'education_types', 'admission_bases'})
+        self.assertEqual(data['choices']['statuses'][0], {'value': 'active', 'label': 'Обучается'})
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.econ_program.department = self.cs
+        with self.captureOnCommitCallbacks(execute=True):
+            self.econ_program.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['programs']), [str(self.cs.id)])
+
+
+class StudentQueryCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        create_students(4, cls.cs_program, cls.cs)
+        create_students(3, cls.econ_program, cls.econ, status='expelled', expulsion_reason='transfer')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_equivalent_params_share_cache_entry(self):
+        url = reverse('student-list')
+        first = self.client.get(url, {'statuses': 'expelled,active', 'start_date': '2020-01-01',
+                                      'end_date': '2020-12-31', 'in_academic': 'false'})
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'statuses': 'active,expelled,active', 'end_date': '2020-12-31',
+                                           'start_date': '2020-01-01', 'in_academic': '0', 'page': 'x'})
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(len(second.json()), 7)
+
+    def test_different_filters_are_not_shared(self):
+        url = reverse('student-list')
+        self.assertEqual(len(self.client.get(url, {'statuses': 'active'}).json()), 4)
+        self.assertEqual(len(self.client.get(url, {'statuses': 'expelled'}).json()), 3)
+
+    @override_settings(STUDENT_CACHE_MAX_ROWS=5)
+    def test_large_unpaginated_lists_bypass_cache(self):
+        url = reverse('student-list')
+        for _ in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response['X-Cache'], 'BYPASS')
+            self.assertEqual(len(response.json()), 7)
+        self.assertEqual(self.client.get(url, {'statuses': 'expelled'})['X-Cache'], 'MISS')
+        # Страница не длиннее порога кешируется и из полного списка
+        self.client.get(url, {'page_size': 5})
+        self.assertEqual(self.client.get(url, {'page_size': 5})['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(reverse('async-student-list'))['X-Cache'], 'BYPASS')
+
+    def test_student_write_invalidates(self):
+        url = reverse('student-list')
+        self.assertEqual(len(self.client.get(url).json()), 7)
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.filter(status='active').first().delete()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 6)
+
+    def test_generation_moves_after_commit(self):
+        # Чтение до COMMIT не должно попасть в кеш под новым поколением
+        generation = get_student_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.filter(status='active').first()
+            student.status = 'graduated'
+            student.save()
+            self.assertEqual(get_student_generation(), generation)
+        self.assertNotEqual(get_student_generation(), generation)
+
+    def test_stats(self):
+        url = reverse('student-list')
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get(url, {'statuses': 'active'})
+        self.assertEqual(self.client.get(reverse('student-cache-stats')).status_code, 403)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        stats = self.client.get(reverse('student-cache-stats')).json()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+
+
+class StudentFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        create_students(2, cls.cs_program, cls.cs, status='academic', academic_leave_start=date(2021, 1, 1))
+        create_students(3, cls.econ_program, cls.econ, status='expelled', expulsion_reason='transfer')
+
+    def test_bad_input_rejected_before_queries(self):
+        cases = [
+            ('student-list', {'current_departments': '1,abc'}, 'current_departments'),
+            ('student-list', {'statuses': 'active,unknown'}, 'statuses'),
+            ('student-list', {'enrollment_date': '2020-13-01'}, 'enrollment_date'),
+            ('student-list', {'start_date': '2021-01-01', 'end_date': '2020-01-01'}, 'start_date'),
+            ('student-list', {'in_academic': 'maybe'}, 'in_academic'),
+            ('student-list', {'current_programs': ','.join(str(id) for id in range(101))}, 'current_programs'),
+            ('student-list', {'current_departments': '9' * 20}, 'current_departments'),
+            ('student-list', {'statuses': 'active,,academic'}, 'statuses'),
+            ('cohort-report', {'enrollment_years': '2020,-' + '9' * 20}, 'enrollment_years'),
+            ('student-stats', {'education_types': 'free'}, 'education_types'),
+            ('student-export', {'end_date': 'bad'}, 'end_date'),
+        ]
+        for url_name, params, error in cases:
+            with self.subTest(params=params), self.assertNumQueries(0):
+                response = self.client.get(reverse(url_name), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(error, response.json())
+
+    def test_equivalent_filters_normalized(self):
+        self.assertEqual(parse_student_filter({'in_academic': 'true'}), (('statuses', 'academic'),))
+        self.assertEqual(parse_student_filter({'statuses': 'academic', 'in_academic': 'true'}),
+                         parse_student_filter({'statuses': 'academic,academic'}))
+        # Все значения поля - не фильтр, пустые параметры не учитываются
+        self.assertEqual(parse_student_filter({'education_types': 'contract,budget', 'statuses': '',
+                                               'admission_bases': 'general,quota,target'}), ())
+        self.assertEqual(parse_student_filter({'enrollment_date': '2020-09-01', 'start_date': '2020-01-01',
+                                               'end_date': '2020-12-31'}), (('enrollment_date', '2020-09-01'),))
+
+    def test_compiled_filter(self):
+        self.assertEqual(build_student_filter({'statuses': 'active', 'current_departments': f'{self.cs.id}'}),
+                         Q(status='active') & Q(current_department_id=self.cs.id))
+        self.assertEqual(len(self.client.get(reverse('student-list'), {'in_academic': 'true'}).json()), 2)
+        self.assertEqual(len(self.client.get(reverse('student-list'), {'start_date': '2020-09-01'}).json()), 5)
+        # Противоречивые условия - пустая выборка без запроса к БД
+        with self.assertNumQueries(0):
+            self.assertFalse(Student.objects.filter(build_student_filter({'statuses': 'expelled',
+                                                                          'in_academic': 'true'})).exists())
+        self.assertEqual(len(self.client.get(reverse('student-list'), {'statuses': 'expelled',
+                                                                      'in_academic': 'true'}).json()), 0)
+
+
+class StudentStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        create_students(4, cls.cs_program, cls.cs)
+        create_students(2, cls.econ_program, cls.econ, education_type='contract')
+        create_students(3, cls.econ_program, cls.econ, status='expelled', expulsion_reason='transfer',
+                        enrollment_date=date(2021, 9, 1))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_grouped_counts(self):
+        data = self.client.get(reverse('student-stats')).json()
+        self.assertEqual(data['total'], 9)
+        statuses = {row['key']: (row['label'], row['count']) for row in data['groups']['status']}
+        self.assertEqual(statuses, {'active': ('Обучается', 6), 'expelled': ('Отчислен', 3)})
+        departments = {row['key']: (row['label'], row['count']) for row in data['groups']['current_department']}
+        self.assertEqual(departments[self.econ.id], (self.econ.name, 5))
+
+    def test_filters_and_pivot(self):
+        with self.assertNumQueries(3):
+            data = self.client.get(reverse('student-stats'), {
+                'current_departments': str(self.econ.id),
+                'group_by': 'education_type',
+                'pivot': 'enrollment_year,status',
+            }).json()
+        self.assertEqual(data['total'], 5)
+        self.assertEqual({row['key']: row['count'] for row in data['groups']['education_type']},
+                         {'budget': 3, 'contract': 2})
+        self.assertEqual(data['pivots'][0]['data'], {'2020': {'active': 2}, '2021': {'expelled': 3}})
+
+    def test_unknown_dimension(self):
+        response = self.client.get(reverse('student-stats'), {'group_by': 'citizenship'})
+        self.assertEqual(response.status_code, 400)
+
+
+class CohortReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+
+    def setUp(self):
+        self.create('Агеев', status='expelled', expulsion_date=date(2021, 3, 1), expulsion_reason='own_desire')
+        self.create('Борисов', academic_leave_start=date(2021, 2, 1), academic_leave_end=date(2022, 1, 1))
+        self.create('Волков', status='graduated', graduation_date=date(2022, 6, 30))
+        self.create('Гусев', initial_program=self.econ_program, education_type='contract')
+        self.freshman = self.create('Дмитриев', enrollment_date=date(2021, 9, 1))
+
+    def create(self, last_name, **extra):
+        data = {
+            'last_name': last_name, 'first_name': 'Иван', 'citizenship': 'Россия',
+            'enrollment_date': date(2020, 9, 1), 'education_type': 'budget', 'admission_basis': 'general',
+            'initial_program': self.cs_program, 'current_program': self.cs_program,
+        }
+        data.update(extra)
+        return Student.objects.create(**data)
+
+    def test_refresh_only_touched_years(self):
+        today = date(2022, 12, 31)
+        self.assertEqual(refresh_cohort_reports(today=today), {2020: 2, 2021: 1})
+        self.assertEqual(refresh_cohort_reports(today=today), {})
+
+        report = CohortReport.objects.get(enrollment_year=2020, program=self.cs_program)
+        self.assertEqual(report.size, 3)
+        first, second = report.retention
+        self.assertEqual(first['counts'], {'active': 1, 'academic': 1, 'graduated': 0, 'expelled': 1})
+        self.assertEqual(first['expulsion_reasons'], {'own_desire': 1})
+        self.assertEqual(second['date'], '2022-08-31')
+        self.assertEqual(second['shares']['graduated'], 0.3333)
+
+        self.freshman.education_type = 'contract'
+        self.freshman.save()
+        self.assertEqual(refresh_cohort_reports(today=today), {2021: 1})
+        self.assertEqual(CohortReport.objects.get(enrollment_year=2021).education_type, 'contract')
+
+        self.freshman.enrollment_date = date(2020, 10, 1)
+        self.freshman.save()
+        self.assertEqual(refresh_cohort_reports(today=today), {2020: 3, 2021: 0})
+        self.assertFalse(CohortReport.objects.filter(enrollment_year=2021).exists())
+
+    def test_command_and_endpoint(self):
+        out = StringIO()
+        call_command('refresh_cohort_reports', '--full', stdout=out)
+        self.assertIn('Пересчитано годов зачисления: 2', out.getvalue())
+
+        with self.assertNumQueries(2):
+            data = self.client.get(reverse('cohort-report'), {
+                'enrollment_years': '2020', 'education_types': 'budget',
+            }).json()
+        self.assertIsNotNone(data['refreshed_at'])
+        [cohort] = data['cohorts']
+        self.assertEqual(cohort['program'], {'id': self.cs_program.id, 'name': self.cs_program.name})
+        self.assertEqual(cohort['size'], 3)
+
+        # Ошибки параметров - те же ответы 400, что у фильтра реестра
+        for param, student_param, value in (('programs', 'current_programs', 'x'),
+                                            ('education_types', 'education_types', 'budget,free')):
+            response = self.client.get(reverse('cohort-report'), {param: value})
+            self.assertEqual(response.status_code, 400)
+            expected = self.client.get(reverse('student-list'), {student_param: value}).json()
+            self.assertEqual(response.json(), {param: expected[student_param]})
+
+
+class StudentSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+
+        def create(last_name, **extra):
+            data = {
+                'last_name': last_name, 'first_name': 'Иван', 'citizenship': 'Россия',
+                'enrollment_date': date(2019, 9, 1), 'education_type': 'budget', 'admission_basis': 'general',
+                'current_department': cls.cs, 'current_program': cls.cs_program,
+                'initial_department': cls.cs, 'initial_program': cls.cs_program,
+            }
+            data.update(extra)
+            return Student.objects.create(**data)
+
+        cls.expelled = create('Агеев', status='expelled', expulsion_date=date(2022, 1, 15),
+                              expulsion_reason='own_desire')
+        cls.returned = create('Борисов', academic_leave_start=date(2020, 2, 1), academic_leave_end=date(2021, 2, 1))
+        cls.transferred = create('Волков', enrollment_date=date(2020, 9, 1), current_department=cls.econ,
+                                 current_program=cls.econ_program, transfer_history=[
+                                     {'date': '2021-09-01', 'from': cls.cs_program.id, 'to': cls.econ_program.id},
+                                 ])
+        cls.freshman = create('Гусев', enrollment_date=date(2022, 9, 1))
+        cls.graduate = create('Дмитриев', status='graduated', graduation_date=date(2023, 6, 30))
+
+    def setUp(self):
+        cache.clear()
+
+    def snapshot(self, **params):
+        response = self.client.get(reverse('student-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return {row['id']: row for row in response.json()['results']}, response.json()
+
+    def test_status_and_department_on_date(self):
+        rows, data = self.snapshot(as_of='2021-01-01')
+        self.assertEqual({id: row['status'] for id, row in rows.items()}, {
+            self.expelled.id: 'active', self.returned.id: 'academic',
+            self.transferred.id: 'active', self.graduate.id: 'active',
+        })
+        self.assertIsNone(rows[self.expelled.id]['expulsion_reason'])
+        self.assertEqual(rows[self.transferred.id]['current_department_id'], self.cs.id)
+
+        rows, data = self.snapshot(as_of='2022-06-01', fields='id,status,current_department')
+        self.assertEqual(rows[self.expelled.id]['status'], 'expelled')
+        self.assertEqual(rows[self.returned.id]['status'], 'active')
+        self.assertEqual(rows[self.transferred.id]['current_department_id'], self.econ.id)
+        self.assertEqual(list(data['departments']), [str(self.cs.id), str(self.econ.id)])
+
+    def test_filters_apply_to_snapshot(self):
+        rows, _ = self.snapshot(as_of='2021-12-01', statuses='active', current_departments=str(self.econ.id))
+        self.assertEqual(list(rows), [self.transferred.id])
+        rows, _ = self.snapshot(as_of='2022-06-01', statuses='expelled', expulsion_reasons='own_desire')
+        self.assertEqual(list(rows), [self.expelled.id])
+
+    def test_stats_on_date(self):
+        data = self.client.get(reverse('student-stats'), {
+            'as_of': '2021-01-01', 'group_by': 'status,current_department', 'pivot': 'current_department,status',
+        }).json()
+        self.assertEqual(data['total'], 4)
+        self.assertEqual({row['key']: row['count'] for row in data['groups']['status']}, {'academic': 1, 'active': 3})
+        self.assertEqual(data['groups']['current_department'], [{'key': self.cs.id, 'count': 4, 'label': self.cs.name}])
+        self.assertEqual(data['pivots'][0]['data'], {str(self.cs.id): {'academic': 1, 'active': 3}})
+
+    def test_invalid_parameters(self):
+        for params in ({'as_of': '2021-13-01'}, {'as_of': '2021-01-01', 'shape': 'nested'},
+                       {'as_of': '2021-01-01', 'stream': '1'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse('student-list'), params).status_code, 400)
+
+    def test_snapshot_plan_uses_indexes(self):
+        queryset = student_queryset({}, date(2021, 1, 1))
+        plan = queryset.order_by().values(department=F('as_of_department')).annotate(count=Count('id')).explain()
+        self.assertIn('student_snapshot_idx', plan)
+        self.assertIn('transfer_student_date_idx', plan)
+
+
+class PopulateDbTests(TestCase):
+    def test_bulk_seeding(self):
+        import populate_db
+
+        populate_db.create_departments()
+        populate_db.create_program_groups()
+        groups = {g.code: g for g in ProgramGroup.objects.all()}
+        departments = {d.code: d for d in Department.objects.all()}
+        for i, (group_code, department_code) in enumerate([('1.2', 'КН'), ('5.2', 'ЭК'), ('5.9', 'ЛГ')]):
+            Program.objects.create(code=f'{group_code}.{i}', name='Программа', program_name='Программа',
+                                   group=groups[group_code], department=departments[department_code],
+                                   education_level='postgraduate')
+
+        # Загрузка программ, три пачки INSERT студентов и переводов, пересчет
+        # счетчиков, отметка когорт и SAVEPOINT/RELEASE
+        with self.assertNumQueries(16):
+            created = populate_db.create_random_students(120, batch_size=50, seed=7)
+        self.assertEqual(created, 120)
+        self.assertEqual(Student.objects.count(), 120)
+        self.assertEqual(counter_drift(), {})
+
+        transferred = Student.objects.exclude(transfer_history=[]).select_related('current_program')
+        self.assertEqual(TransferEvent.objects.count(), transferred.count())
+        for student in transferred:
+            transfer = student.transfer_history[0]
+            self.assertEqual(transfer['from'], student.initial_program_id)
+            self.assertEqual(transfer['to'], student.current_program_id)
+            self.assertNotEqual(student.current_department_id, student.initial_department_id)
+            self.assertEqual(student.current_program.department_id, student.current_department_id)
+
+    def test_parallel_generation_is_deterministic(self):
+        import populate_db
+
+        programs = [(1, 10), (2, 10), (3, 20), (4, 30)]
+        tasks = populate_db.plan_student_batches(90, 40, seed=42)
+        self.assertEqual([count for _, count in tasks], [40, 40, 10])
+
+        populate_db.init_generator(programs)
+        serial = [row for batch in map(populate_db.generate_student_batch, tasks) for row in batch]
+        with multiprocessing.Pool(2, initializer=populate_db.init_generator, initargs=(programs,)) as pool:
+            parallel = [row for batch in pool.imap(populate_db.generate_student_batch, tasks) for row in batch]
+        self.assertEqual(len(serial), 90)
+        self.assertEqual(serial, parallel)
+
+        other_seed = populate_db.plan_student_batches(90, 40, seed=43)
+        self.assertNotEqual(serial[:40], populate_db.generate_student_batch(other_seed[0]))
+
+    def test_program_import_is_idempotent_upsert(self):
+        import pandas as pd
+        import populate_db
+
+        populate_db.create_departments()
+        populate_db.create_program_groups()
+        sheet = pd.DataFrame([
+            ['02.06.01', 'Компьютерные науки', '1.2.2 (05.13.18)', 'Математическое моделирование'],
+            [None, None, '1.3.7 (01.04.06)', 'Акустика'],
+            [None, None, None, None],
+            [None, None, '9.9.1', 'Неизвестная группа'],
+            ['нет кода', 'Без группы', None, 'Без группы'],
+            [None, None, '1.3.7 (01.04.06)', 'Акустика (повтор)'],
+        ])
+
+        count, rejects = populate_db.import_programs(sheet)
+        self.assertEqual(count, 2)
+        self.assertEqual(list(rejects['reason']), [
+            'Группа 9.9 не найдена',
+            'Не удалось определить группу',
+            'Код 1.3.7 уже встречался в файле',
+        ])
+        acoustics = Program.objects.select_related('group', 'department').get(code='1.3.7')
+        self.assertEqual((acoustics.group.code, acoustics.department.code), ('1.3', 'РФ'))
+        self.assertEqual(Program.objects.get(code='02.06.01').department.code, 'КН')
+
+        sheet.iloc[1, 3] = 'Акустика и звук'
+        count, _ = populate_db.import_programs(sheet)
+        self.assertEqual(Program.objects.count(), 2)
+        self.assertEqual(Program.objects.get(code='1.3.7').program_name, 'Акустика и звук')
+
+
+class StudentExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        create_students(3, cls.cs_program, cls.cs)
+        create_students(2, cls.econ_program, cls.econ, status='expelled', expulsion_reason='own_desire',
+                        expulsion_date=date(2021, 1, 15))
+
+    def test_csv_export(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('student-export'), {'statuses': 'expelled'})
+            body = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.reader(body.splitlines()))
+        self.assertEqual(rows[0][:3], ['ID', 'Фамилия', 'Имя'])
+        self.assertEqual(len(rows), 3)
+        header = rows[0]
+        self.assertEqual(rows[1][header.index('Статус')], 'Отчислен')
+        self.assertEqual(rows[1][header.index('Причина отчисления')], 'По собственному желанию')
+        self.assertEqual(rows[1][header.index('Текущая кафедра')], self.econ.name)
+        self.assertEqual(rows[1][header.index('Дата отчисления')], '2021-01-15')
+        self.assertEqual(rows[1][header.index('Дата выпуска')], '')
+
+    def test_xlsx_export(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get(reverse('student-export'), {'file_format': 'xlsx'})
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook.active.values)
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][5], 'Обучается')
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('student-export'), {'file_format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TransferEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        # bulk_create не создает переводы - как данные до появления таблицы
+        cls.students = create_students(3, cls.cs_program, cls.cs)
+        for i, student in enumerate(cls.students):
+            student.transfer_history = [{
+                'date': f'202{i}-03-01', 'from': cls.cs_program.id, 'to': cls.econ_program.id,
+            }]
+        Student.objects.bulk_update(cls.students, ['transfer_history'])
+
+    def backfill(self):
+        migration = import_module('students.migrations.0005_backfill_transfer_events')
+        migration.backfill_transfer_events(apps, None)
+
+    def test_backfill_from_json(self):
+        self.assertEqual(TransferEvent.objects.count(), 0)
+        self.backfill()
+        self.assertEqual(TransferEvent.objects.count(), 3)
+        event = TransferEvent.objects.get(student=self.students[0])
+        self.assertEqual((event.date, event.from_program, event.to_program),
+                         (date(2020, 3, 1), self.cs_program, self.econ_program))
+
+    def test_save_keeps_events_in_sync(self):
+        student = self.students[0]
+        student.transfer_history = []
+        student.save()
+        self.assertFalse(TransferEvent.objects.filter(student=student).exists())
+
+        student.transfer_history = [{'date': '2022-05-01', 'from': self.econ_program.id, 'to': self.cs_program.id}]
+        student.save()
+        self.assertEqual(TransferEvent.objects.get(student=student).to_program, self.cs_program)
+
+    def test_save_after_referenced_program_deleted(self):
+        removed = Program.objects.create(code='9.9.9', name='Закрытая программа', department=self.econ,
+                                         education_level='postgraduate')
+        student = self.students[0]
+        student.transfer_history = [{'date': '2022-05-01', 'from': self.cs_program.id, 'to': removed.id}]
+        student.save()
+        removed.delete()
+
+        student.citizenship = 'Казахстан'
+        student.save()
+        event = TransferEvent.objects.get(student=student)
+        self.assertEqual((event.from_program_id, event.to_program_id), (self.cs_program.id, None))
+        self.assertEqual(counter_drift(), {})
+
+    def test_flow_counts(self):
+        self.backfill()
+        url = reverse('transfer-flows')
+        with self.assertNumQueries(1):
+            data = self.client.get(url, {'from_programs': str(self.cs_program.id), 'year': '2021'}).json()
+        self.assertEqual(data['total'], 1)
+
+        data = self.client.get(url, {'level': 'department', 'start_date': '2020-01-01'}).json()
+        self.assertEqual(data['flows'], [{
+            'from_id': self.cs.id, 'from_name': self.cs.name,
+            'to_id': self.econ.id, 'to_name': self.econ.name, 'count': 3,
+        }])
+
+        for params in ({'to_programs': 'x'}, {'year': '9' * 20}, {'year': '0'}, {'start_date': '2020-02-30'}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(list(response.json()), list(params))
+
+
+class StudentSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        cls.semenov, cls.semenova, cls.petrov = create_students(3, cls.cs_program, cls.cs)
+        cls.semenov.last_name, cls.semenov.first_name = 'Семёнов', 'Пётр'
+        cls.semenova.last_name, cls.semenova.first_name = 'Семенова', 'Анна'
+        cls.semenova.status = 'expelled'
+        cls.petrov.last_name, cls.petrov.first_name = 'Петров', 'Семён'
+        Student.objects.bulk_update([cls.semenov, cls.semenova, cls.petrov], ['last_name', 'first_name', 'status'])
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **params):
+        return {row['id'] for row in self.client.get(reverse('student-list'), params).json()}
+
+    def test_prefix_case_and_yo(self):
+        self.assertEqual(self.search(q='семе'), {self.semenov.id, self.semenova.id, self.petrov.id})
+        self.assertEqual(self.search(q='СЕМЁНОВА'), {self.semenova.id})
+        self.assertEqual(self.search(q='сем петр'), {self.semenov.id, self.petrov.id})
+        self.assertEqual(self.search(q='Иванович'), {self.semenov.id, self.semenova.id, self.petrov.id})
+        self.assertEqual(self.search(q='Сидоров'), set())
+        self.assertEqual(len(self.search(q=' - ')), 3)
+
+    def test_combines_with_filters(self):
+        self.assertEqual(self.search(q='сем', statuses='expelled'), {self.semenova.id})
+
+    def test_index_follows_updates_and_deletes(self):
+        self.petrov.last_name = 'Сидоров'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.petrov.save()
+        self.assertEqual(self.search(q='сидор'), {self.petrov.id})
+        self.assertEqual(self.search(q='петров'), set())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.petrov.delete()
+        self.assertEqual(self.search(q='сидор'), set())
+
+    def test_search_plan_uses_index(self):
+        plan = Student.objects.filter(build_student_filter({'q': 'сем'})).explain()
+        self.assertIn('VIRTUAL TABLE INDEX', plan)
+
+
+class StudentCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+
+    def setUp(self):
+        cache.clear()
+
+    def create_student(self, **extra):
+        data = {
+            'last_name': 'Иванов', 'first_name': 'Иван', 'citizenship': 'Россия',
+            'enrollment_date': date(2020, 9, 1), 'education_type': 'budget', 'admission_basis': 'general',
+            'current_department': self.cs, 'current_program': self.cs_program,
+        }
+        data.update(extra)
+        return Student.objects.create(**data)
+
+    def test_incremental_updates_match_rebuild(self):
+        first = self.create_student()
+        second = self.create_student()
+        self.create_student(current_department=self.econ, current_program=self.econ_program, status='academic')
+
+        first.status = 'expelled'
+        first.expulsion_reason = 'own_desire'
+        first.save()
+        second.current_department, second.current_program = self.econ, self.econ_program
+        second.save()
+        second.delete()
+
+        self.assertEqual(counter_drift(), {})
+        self.assertEqual(StudentCounter.objects.get(department=self.cs, status='expelled').count, 1)
+
+    def test_receiver_failure_rolls_back_save(self):
+        student = self.create_student()
+        student.status = 'graduated'
+        with mock.patch.object(StudentCounter.objects, 'bulk_create', side_effect=DatabaseError('сбой')):
+            with self.assertRaises(DatabaseError):
+                student.save()
+
+        self.assertEqual(Student.objects.get(pk=student.pk).status, 'active')
+        self.assertEqual(StudentCounter.objects.get(department=self.cs, status='active').count, 1)
+        self.assertEqual(counter_drift(), {})
+
+    def test_counter_keys_with_null_are_unique(self):
+        self.create_student(current_department=None, current_program=None)
+        self.create_student(current_department=None, current_program=None)
+        counter = StudentCounter.objects.get(department=None, program=None)
+        self.assertEqual(counter.count, 2)
+
+        key = {'status': counter.status, 'education_type': counter.education_type,
+               'admission_basis': counter.admission_basis}
+        for department, program in ((None, None), (None, self.cs_program), (self.cs, None)):
+            StudentCounter.objects.get_or_create(department=department, program=program, **key)
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                StudentCounter.objects.create(department=department, program=program, **key)
+
+    def test_rebuild_command_fixes_drift(self):
+        create_students(4, self.cs_program, self.cs)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_student_counters', '--check', stdout=StringIO())
+        call_command('rebuild_student_counters', stdout=StringIO())
+        call_command('rebuild_student_counters', '--check', stdout=StringIO())
+
+    def test_reference_lists_with_counts(self):
+        self.create_student()
+        self.create_student(status='graduated')
+        self.create_student(current_department=self.econ, current_program=self.econ_program)
+
+        with self.assertNumQueries(1):
+            departments = self.client.get(reverse('faculty-list'), {'with_counts': '1'}).json()
+        counts = {row['id']: row['student_counts'] for row in departments}
+        self.assertEqual(counts[self.cs.id], {'total': 2, 'active': 1, 'academic': 0, 'graduated': 1, 'expelled': 0})
+        self.assertEqual(counts[self.econ.id]['total'], 1)
+
+        self.create_student(current_department=self.econ, current_program=self.econ_program)
+        programs = self.client.get(reverse('program-list'), {'with_counts': '1', 'department_id': self.econ.id}).json()
+        self.assertEqual(programs[0]['student_counts']['active'], 2)
+        self.assertNotIn('student_counts', self.client.get(reverse('program-list')).json()[0])
+
+
+class StudentBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def new_student(self, last_name, **extra):
+        data = {
+            'last_name': last_name, 'first_name': 'Иван', 'citizenship': 'Россия', 'enrollment_date': '2020-09-01',
+            'education_type': 'budget', 'admission_basis': 'general',
+            'current_department': self.cs.id, 'current_program': self.cs_program.id,
+        }
+        data.update(extra)
+        return {'op': 'create', 'data': data}
+
+    def bulk(self, operations):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('student-bulk'), {'operations': operations},
+                                    content_type='application/json')
+
+    def test_requires_staff(self):
+        self.client.logout()
+        self.assertEqual(self.bulk([self.new_student('Иванов')]).status_code, 403)
+
+    def test_create_update_and_transitions(self):
+        created = self.bulk([self.new_student(f'Иванов{i}') for i in range(3)]).json()
+        self.assertEqual(created['created'], 3)
+        first, second, third = [result['id'] for result in created['results']]
+        generation = self.client.get(reverse('student-cache-stats')).json()['generation']
+
+        # Сессия, студенты и связи (включая программы переводов) одним запросом
+        # на таблицу, один UPDATE на всех, переводы, UPDATE на каждый затронутый
+        # ключ счетчиков (новые ключи - одна вставка и еще UPDATE) и отметка когорт
+        with self.assertNumQueries(19):
+            response = self.bulk([
+                {'op': 'transition', 'id': first, 'status': 'graduated', 'date': '2024-06-30'},
+                {'op': 'transition', 'id': second, 'status': 'expelled', 'date': '2024-02-01',
+                 'expulsion_reason': 'transfer'},
+                {'op': 'update', 'id': third, 'data': {
+                    'current_department': self.econ.id, 'current_program': self.econ_program.id,
+                    'transfer_history': [{'date': '2021-09-01', 'from': self.cs_program.id,
+                                          'to': self.econ_program.id}],
+                }},
+            ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 3)
+
+        self.assertEqual(Student.objects.get(id=first).graduation_date, date(2024, 6, 30))
+        self.assertEqual(Student.objects.filter(id=second, status='expelled', expulsion_reason='transfer').count(), 1)
+        self.assertEqual(TransferEvent.objects.get().to_program, self.econ_program)
+        self.assertEqual(counter_drift(), {})
+        self.assertNotEqual(self.client.get(reverse('student-cache-stats')).json()['generation'], generation)
+
+    def test_errors_are_reported_per_item_and_nothing_is_applied(self):
+        student_id = self.bulk([self.new_student('Иванов')]).json()['results'][0]['id']
+        response = self.bulk([
+            self.new_student('Петров'),
+            self.new_student('Сидоров', status='unknown'),
+            self.new_student('Смирнов', current_program=999999),
+            {'op': 'transition', 'id': student_id, 'status': 'expelled', 'date': '2024-02-01'},
+            {'op': 'transition', 'id': 999999, 'status': 'graduated'},
+            {'op': 'delete', 'id': student_id},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual(list(errors), ['1', '2', '3', '4', '5'])
+        self.assertIn('status', errors['1'])
+        self.assertIn('current_program', errors['2'])
+        self.assertIn('expulsion_reason', errors['3'])
+        self.assertIn('id', errors['4'])
+        self.assertIn('op', errors['5'])
+        self.assertEqual(Student.objects.count(), 1)
+        self.assertEqual(Student.objects.get().status, 'active')
+
+    def test_transfer_history_validated(self):
+        transfer = {'date': '2021-09-01', 'from': self.cs_program.id, 'to': self.econ_program.id}
+        response = self.bulk([
+            self.new_student('Петров', transfer_history=[transfer]),
+            self.new_student('Сидоров', transfer_history='notalist'),
+            self.new_student('Смирнов', transfer_history=[{**transfer, 'from': 'abc'}]),
+            self.new_student('Кузнецов', transfer_history=[{**transfer, 'date': '01.09.2021'}, 'x']),
+            self.new_student('Попов', transfer_history=[{**transfer, 'from': 999999}]),
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual(list(errors), ['1', '2', '3', '4'])
+        self.assertEqual(len(errors['3']['transfer_history']), 2)
+        self.assertEqual(errors['4']['transfer_history'], ['Программа 999999 не найдена'])
+        self.assertFalse(Student.objects.exists())
+
+    def test_reinstated_student_is_active_in_snapshots(self):
+        student_id = self.bulk([self.new_student('Иванов')]).json()['results'][0]['id']
+        self.bulk([{'op': 'transition', 'id': student_id, 'status': 'expelled', 'date': '2021-02-01',
+                    'expulsion_reason': 'own_desire'}])
+        self.bulk([{'op': 'transition', 'id': student_id, 'status': 'active', 'date': '2021-09-01'}])
+
+        student = Student.objects.get(id=student_id)
+        self.assertEqual((student.status, student.expulsion_date, student.expulsion_reason), ('active', None, None))
+        row = student_queryset({}, date(2022, 1, 1)).values(as_of_status=F('as_of_status')).get()
+        self.assertEqual(row['as_of_status'], 'active')
+
+
+class StudentShapeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        create_students(3, cls.cs_program, cls.cs)
+        create_students(2, cls.econ_program, cls.econ, status='expelled', expulsion_reason='transfer')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fields_projection(self):
+        full = self.client.get(reverse('student-list')).json()
+        with self.assertNumQueries(1) as queries:
+            data = self.client.get(reverse('student-list'), {'fields': 'status_display,last_name,current_program'}).json()
+        self.assertEqual(list(data[0]), ['current_program', 'status_display', 'last_name'])
+        self.assertEqual(data[0]['current_program'], full[0]['current_program'])
+        self.assertNotIn('middle_name', queries.captured_queries[0]['sql'])
+        self.assertNotIn('initial_department', queries.captured_queries[0]['sql'])
+
+    def test_flat_shape_side_loads_references(self):
+        with self.assertNumQueries(3):
+            data = self.client.get(reverse('student-list'), {'shape': 'flat'}).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(data['results'][0]['current_program_id'], self.cs_program.id)
+        self.assertNotIn('current_program', data['results'][0])
+        self.assertEqual(set(data['programs']), {str(self.cs_program.id), str(self.econ_program.id)})
+        self.assertEqual(data['departments'][str(self.cs.id)]['name'], self.cs.name)
+
+    def test_flat_shape_with_pagination_and_fields(self):
+        data = self.client.get(reverse('student-list'), {
+            'shape': 'flat', 'fields': 'last_name,status_display', 'page_size': 2,
+        }).json()
+        self.assertEqual(data['results'][0], {'last_name': 'Иванов00000', 'status_display': 'Обучается'})
+        self.assertEqual(data['departments'], {})
+        self.assertIsNotNone(data['next'])
+        following = self.client.get(data['next']).json()
+        self.assertEqual(len(following['results']), 2)
+
+    def test_invalid_fields_and_shape(self):
+        self.assertEqual(self.client.get(reverse('student-list'), {'fields': 'password'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('student-list'), {'shape': 'tree'}).status_code, 400)
+
+    def test_stream_respects_fields(self):
+        response = self.client.get(reverse('student-list'), {'stream': 'ndjson', 'fields': 'id,status'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(set(rows[0]), {'id', 'status'})
+
+
+class ValuesRowSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        create_students(2, cls.cs_program, cls.cs)
+        Student.objects.create(
+            last_name='Ёлкина\u2028', first_name='Анна', citizenship='Казахстан', status='expelled',
+            enrollment_date=date(2019, 9, 1), expulsion_date=date(2021, 6, 30), expulsion_reason='transfer',
+            education_type='contract', admission_basis='target', current_department=None, current_program=None,
+            initial_department=cls.econ, initial_program=cls.econ_program,
+            transfer_history=[{'date': '2020-01-01', 'from_program': 1, 'to_program': 2}],
+        )
+        Program.objects.create(code='9.9.9', name='Без кафедры', program_name='БК',
+                               group=cls.cs_program.group, department=None, education_level='master')
+
+    def assert_same_output(self, serializer_class, queryset):
+        expected = serializer_class(queryset, many=True).data
+        row_serializer = ValuesRowSerializer(serializer_class)
+        rows = row_serializer.to_representation(row_serializer.values_list(queryset))
+        self.assertEqual(rows, expected)
+        self.assertEqual(FastJSONRenderer().render(rows), JSONRenderer().render(expected))
+
+    def test_students_match_serializer(self):
+        self.assert_same_output(StudentSerializer, Student.objects.order_by('id'))
+
+    def test_programs_match_serializer(self):
+        self.assert_same_output(ProgramSerializer, Program.objects.order_by('id'))
+
+    def test_list_endpoints_are_byte_identical(self):
+        cache.clear()
+        response = self.client.get(reverse('student-list'), {'page_size': 2})
+        queryset = Student.objects.order_by('last_name', 'first_name', 'id')[:2]
+        expected = {'next': response.json()['next'], 'results': StudentSerializer(queryset, many=True).data}
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+
+class PerformanceMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        create_students(3, cls.cs_program, cls.cs)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('student-list'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", render;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_prometheus_endpoint(self):
+        for _ in range(3):
+            self.client.get(reverse('student-list'))
+        self.client.get(reverse('faculty-list'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.create_user('user', 'user@example.com', 'password'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE students_request_duration_seconds summary', body)
+        self.assertIn('students_request_duration_seconds_count{endpoint="student-list"} 3', body)
+        self.assertIn('students_db_queries_count{endpoint="faculty-list"} 1', body)
+        self.assertIn('students_response_size_bytes{endpoint="student-list",quantile="0.99"}', body)
+        self.assertNotIn('endpoint="metrics"', body)
+
+    def test_missing_values_are_not_counted(self):
+        # Потоковый ответ: без рендеринга DRF и без известного размера
+        metrics.record('student-list', {'wall': 0.5, 'db_time': 0.1, 'queries': 2, 'render': None, 'size': None})
+        metrics.record('student-list', {'wall': 0.1, 'db_time': 0.05, 'queries': 1, 'render': 0.02, 'size': 100})
+        body = metrics.to_prometheus()
+        self.assertIn('students_request_duration_seconds_count{endpoint="student-list"} 2', body)
+        self.assertIn('students_render_duration_seconds_sum{endpoint="student-list"} 0.02', body)
+        self.assertIn('students_render_duration_seconds_count{endpoint="student-list"} 1', body)
+        self.assertIn('students_response_size_bytes_count{endpoint="student-list"} 1', body)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_queries_are_logged(self):
+        with self.assertLogs('students.perf', level='WARNING') as logs:
+            self.client.get(reverse('student-list'))
+        self.assertIn('students_student', logs.output[0])
+        self.assertIn('students_slow_queries_total{endpoint="student-list"}', metrics.to_prometheus())
+
+
+@override_settings(ALLOWED_HOSTS=['localhost'])
+class BenchmarkHarnessTests(TestCase):
+    def test_frontend_scenarios_report(self):
+        import benchmark_api
+
+        cs, econ, cs_program, econ_program = create_reference_data()
+        create_students(5, cs_program, cs)
+        create_students(5, econ_program, econ, status='academic', academic_leave_start=date(2021, 1, 1))
+
+        report = benchmark_api.run_benchmarks(repeat=2, page_size=3)
+        self.assertEqual(len(report), len(benchmark_api.frontend_scenarios(3)))
+        for scenario in report:
+            self.assertEqual(scenario['status'], 200, scenario['name'])
+            self.assertEqual(scenario['queries'], 1, scenario['name'])
+            self.assertLessEqual(scenario['latency_ms']['p50'], scenario['latency_ms']['max'])
+        json.dumps(report)
+
+    def test_api_profile_startup(self):
+        import benchmark_startup
+
+        report = benchmark_startup.measure_profile('university_system.settings_api', repeat=1, top=5)
+        self.assertNotIn('django.contrib.admin', report['installed_apps'])
+        self.assertNotIn('django.contrib.sessions', report['installed_apps'])
+        self.assertIn('students', report['installed_apps'])
+        # pandas, Faker и openpyxl нужны только генератору данных и выгрузке xlsx
+        self.assertEqual(report['loaded_watched_modules'], [])
+        self.assertEqual(len(report['top_imports_ms']), 5)
+
+
+class DatabaseProfileTests(SimpleTestCase):
+    def test_postgresql_profile(self):
+        persistent = database_from_env({'DATABASE_ENGINE': 'postgresql', 'DB_CONN_MAX_AGE': '300'}, None)
+        self.assertEqual(persistent['CONN_MAX_AGE'], 300)
+        self.assertTrue(persistent['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('pool', persistent['OPTIONS'])
+
+        pooled = database_from_env({'DATABASE_ENGINE': 'postgresql', 'DB_POOL': '1', 'DB_POOL_MAX_SIZE': '20'}, None)
+        self.assertEqual(pooled['CONN_MAX_AGE'], 0)
+        self.assertEqual(pooled['OPTIONS']['pool']['max_size'], 20)
+
+        with self.assertRaises(ImproperlyConfigured):
+            database_from_env({'DATABASE_ENGINE': 'oracle'}, None)
+
+    def test_concurrent_writers_on_sqlite_profile(self):
+        """Несколько писателей с чтением внутри транзакции, как воркеры gunicorn.
+
+        Вместо тестовой базы в памяти - отдельный файл с профилем SQLite,
+        у каждого потока свое соединение.
+        """
+        writers, increments = 6, 25
+        with tempfile.TemporaryDirectory() as directory:
+            profile = database_from_env({'SQLITE_PATH': os.path.join(directory, 'stand_in.sqlite3')}, None)
+            stand_in = ConnectionHandler({'default': profile, 'stand_in': profile})
+            with stand_in['stand_in'].cursor() as cursor:
+                self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+                self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 5000)
+                cursor.execute('CREATE TABLE counter (value INTEGER)')
+                cursor.execute('INSERT INTO counter VALUES (0)')
+            errors = []
+
+            def write():
+                connection = stand_in['stand_in']
+                try:
+                    for _ in range(increments):
+                        # То же, что делает transaction.atomic() для внешнего блока
+                        connection.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                        try:
+                            with connection.cursor() as cursor:
+                                value = cursor.execute('SELECT value FROM counter').fetchone()[0]
+                                # Пауза между чтением и записью, чтобы транзакции пересекались
+                                time.sleep(0.001)
+                                cursor.execute('UPDATE counter SET value = %s', [value + 1])
+                            connection.commit()
+                        finally:
+                            connection.set_autocommit(True)
+                except Exception as error:
+                    errors.append(error)
+                finally:
+                    connection.close()
+
+            threads = [threading.Thread(target=write) for _ in range(writers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(errors, [])
+            with stand_in['stand_in'].cursor() as cursor:
+                self.assertEqual(cursor.execute('SELECT value FROM counter').fetchone()[0], writers * increments)
+            stand_in.close_all()
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.cs, cls.econ, cls.cs_program, cls.econ_program = create_reference_data()
+        create_students(4, cls.cs_program, cls.cs)
+        create_students(3, cls.econ_program, cls.econ, status='expelled', expulsion_reason='transfer',
+                        expulsion_date=date(2021, 6, 30))
+
+    def setUp(self):
+        cache.clear()
+
+    async def assert_same_as_sync(self, sync_name, async_name, params):
+        await cache.aclear()
+        expected = await sync_to_async(self.client.get)(reverse(sync_name), params)
+        await cache.aclear()
+        response = await self.async_client.get(reverse(async_name), params)
+        self.assertEqual(response.status_code, expected.status_code)
+        # Ссылка next ведет на тот же endpoint, с которого пришел запрос
+        self.assertEqual(response.content.replace(b'/api/async/', b'/api/'), expected.content)
+
+    async def test_student_list_matches_sync(self):
+        for params in ({}, {'page_size': 3}, {'shape': 'flat', 'page_size': 2}, {'fields': 'last_name,status_display'},
+                       {'statuses': 'expelled', 'expulsion_reasons': 'transfer'}, {'shape': 'tree'},
+                       {'as_of': '2020-12-31', 'page_size': 2}, {'as_of': '2020-12-31', 'shape': 'nested'}):
+            with self.subTest(params=params):
+                await self.assert_same_as_sync('student-list', 'async-student-list', params)
+
+    async def test_reference_lists_match_sync(self):
+        await self.assert_same_as_sync('faculty-list', 'async-faculty-list', {})
+        await self.assert_same_as_sync('faculty-list', 'async-faculty-list', {'with_counts': '1'})
+        await self.assert_same_as_sync('program-list', 'async-program-list', {'department_id': self.cs.id})
+
+        response = await self.async_client.get(reverse('async-program-list'))
+        not_modified = await self.async_client.get(reverse('async-program-list'),
+                                                   headers={'if-none-match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+
+    async def test_page_with_count(self):
+        data = (await self.async_client.get(reverse('async-student-list'), {'page_size': 2, 'with_count': '1'})).json()
+        self.assertEqual(data['count'], 7)
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNotNone(data['next'])
+
+        data = (await self.async_client.get(reverse('async-student-list'), {
+            'shape': 'flat', 'statuses': 'expelled', 'with_count': '1',
+        })).json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(list(data['departments']), [str(self.econ.id)])
+
+    async def test_stream_rejected(self):
+        response = await self.async_client.get(reverse('async-student-list'), {'stream': 'ndjson'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stream', response.json())
+
+    async def test_csv_export_matches_sync(self):
+        expected = await sync_to_async(self.client.get)(reverse('student-export'), {'statuses': 'expelled'})
+        expected_content = await sync_to_async(b''.join)(expected.streaming_content)
+        response = await self.async_client.get(reverse('async-student-export'), {'statuses': 'expelled'})
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), expected_content)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=')
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from django.db.models import Count, F
+
+from .models import Program, TransferEvent
+
+
+def _history_entries(history):
+    return [transfer for transfer in history if isinstance(transfer, dict)] if isinstance(history, list) else []
+
+
+def transfer_events_for(student_id, history, program_ids):
+    """Строит записи TransferEvent по списку transfer_history студента.
+
+    program_ids - id существующих программ: ссылки на удаленные программы
+    (и не числа) сохраняются как NULL, как при переносе в миграции 0005.
+    """
+    events = []
+    for transfer in _history_entries(history):
+        try:
+            date = datetime.strptime(transfer['date'], '%Y-%m-%d').date()
+        except (KeyError, TypeError, ValueError):
+            continue
+        events.append(TransferEvent(
+            student_id=student_id,
+            date=date,
+            from_program_id=transfer.get('from') if transfer.get('from') in program_ids else None,
+            to_program_id=transfer.get('to') if transfer.get('to') in program_ids else None,
+        ))
+    return events
+
+
+def existing_program_ids(students):
+    """id программ из transfer_history студентов, которые есть в базе - одним запросом"""
+    referenced = {
+        transfer.get(field)
+        for student in students
+        for transfer in _history_entries(student.transfer_history)
+        for field in ('from', 'to')
+    }
+    referenced = {id for id in referenced if isinstance(id, int) and not isinstance(id, bool)}
+    if not referenced:
+        return set()
+    return set(Program.objects.filter(id__in=referenced).values_list('id', flat=True))
+
+
+def create_transfer_events(students, program_ids=None):
+    """Создает переводы для только что сохраненных студентов одним bulk_create.
+
+    program_ids - уже известные id существующих программ; без них они
+    загружаются одним запросом.
+    """
+    if program_ids is None:
+        program_ids = existing_program_ids(students)
+    events = []
+    for student in students:
+        events.extend(transfer_events_for(student.id, student.transfer_history, program_ids))
+    return TransferEvent.objects.bulk_create(events)
+
+
+def sync_transfer_events(student):
+    """Пересобирает переводы студента по его transfer_history"""
+    TransferEvent.objects.filter(student_id=student.id).delete()
+    return create_transfer_events([student])
+
+
+# Уровни агрегации потоков: поля источника и назначения
+FLOW_LEVELS = {
+    'program': {
+        'from_id': F('from_program'),
+        'from_name': F('from_program__name'),
+        'to_id': F('to_program'),
+        'to_name': F('to_program__name'),
+    },
+    'department': {
+        'from_id': F('from_program__department'),
+        'from_name': F('from_program__department__name'),
+        'to_id': F('to_program__department'),
+        'to_name': F('to_program__department__name'),
+    },
+}
+
+
+def transfer_flows(queryset, level='program'):
+    """Количество переводов по парам (откуда, куда) одним GROUP BY"""
+    return list(
+        queryset.order_by()
+        .values(**FLOW_LEVELS[level])
+        .annotate(count=Count('id'))
+        .order_by('-count', 'from_id', 'to_id')
+    )
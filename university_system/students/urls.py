@@ -1,9 +1,26 @@
 # urls.py
 from django.urls import path
-from .views import StudentListView, DepartmentListView, ProgramListView
+from .async_views import (AsyncStudentListView, AsyncStudentExportView, AsyncDepartmentListView,
+                          AsyncProgramListView)
+from .views import (StudentListView, StudentBulkView, StudentStatsView, StudentExportView, StudentCacheStatsView,
+                    TransferFlowView, DepartmentListView, ProgramListView, BootstrapView, CohortReportView,
+                    MetricsView)
 
 urlpatterns = [
     path('students/', StudentListView.as_view(), name='student-list'),
+    path('students/stats/', StudentStatsView.as_view(), name='student-stats'),
+    path('students/export/', StudentExportView.as_view(), name='student-export'),
+    path('students/bulk/', StudentBulkView.as_view(), name='student-bulk'),
+    path('students/cache-stats/', StudentCacheStatsView.as_view(), name='student-cache-stats'),
     path('departments/', DepartmentListView.as_view(), name='faculty-list'),
     path('programs/', ProgramListView.as_view(), name='program-list'),
+    path('bootstrap/', BootstrapView.as_view(), name='bootstrap'),
+    path('reports/cohorts/', CohortReportView.as_view(), name='cohort-report'),
+    path('transfers/', TransferFlowView.as_view(), name='transfer-flows'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    # Асинхронные варианты для запуска под ASGI (uvicorn)
+    path('async/students/', AsyncStudentListView.as_view(), name='async-student-list'),
+    path('async/students/export/', AsyncStudentExportView.as_view(), name='async-student-export'),
+    path('async/departments/', AsyncDepartmentListView.as_view(), name='async-faculty-list'),
+    path('async/programs/', AsyncProgramListView.as_view(), name='async-program-list'),
 ]
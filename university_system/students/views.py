@@ -1,108 +1,451 @@
-from rest_framework import generics
-from .models import Student, Department, Program
-from .serializers import StudentSerializer, DepartmentSerializer, ProgramSerializer
-from django.db.models import Q
-from datetime import datetime
+from functools import partial
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.core.cache import cache
+from django.db.models import F, Max
+from django.http import HttpResponse
+from rest_framework import generics, permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import Student, Department, Program, TransferEvent, CohortReport
+from .serializers import (StudentSerializer, DepartmentSerializer, ProgramSerializer,
+                          DepartmentCountsSerializer, ProgramCountsSerializer)
+from .pagination import StudentKeysetPagination, STUDENT_ORDERING
+from .streaming import STREAM_FORMATS, iter_serialized, iter_value_rows, stream_response
+from .filters import build_student_filter, parse_query_params, parse_student_filter
+from .stats import DIMENSIONS, DEFAULT_GROUP_BY, SNAPSHOT_DIMENSIONS, compute_student_stats
+from .export import EXPORT_FORMATS, csv_response, xlsx_response
+from .transfers import FLOW_LEVELS, transfer_flows
+from .counters import annotate_student_counts
+from .metrics import metrics
+from .rows import ValuesRowSerializer
+from .bulk import StudentBulkOperation
+from .bootstrap import CHOICES_VARIANT, bootstrap_payload
+from .snapshots import parse_as_of, snapshot_row, snapshot_shape, snapshot_values, student_queryset
+from .shapes import FLAT_DEFAULT_FIELDS, flat_columns, flat_payload, parse_fields, parse_shape, project_queryset
+from .cache import (REFERENCE_CACHE_TIMEOUT, STUDENT_CACHE_TIMEOUT, reference_cache_state, student_cache_key,
+                    student_rows_cacheable, record_student_cache_hit, get_student_cache_stats)
+
+
+# Все связи, которые разворачивает StudentSerializer (включая кафедру внутри
+# ProgramSerializer), подтягиваются одним JOIN вместо запроса на каждую строку
+STUDENT_RELATED_FIELDS = (
+    'current_department',
+    'initial_department',
+    'current_program__department',
+    'initial_program__department',
+)
+
+
+STUDENT_ROW_SERIALIZER = ValuesRowSerializer(StudentSerializer)
+
+
+def student_rows_queryset(queryset, shape, fields, as_of=None):
+    """Запрос строк ответа реестра для формы ответа и списка полей"""
+    if shape == 'flat':
+        columns = flat_columns(fields or FLAT_DEFAULT_FIELDS)
+        return snapshot_values(queryset, columns) if as_of is not None else queryset.values(*columns)
+    if fields:
+        return project_queryset(queryset.select_related(*STUDENT_RELATED_FIELDS), fields)
+    return STUDENT_ROW_SERIALIZER.values_list(queryset)
+
+
+def build_student_list(request, shape, fields, as_of=None, with_count=False):
+    """Ответ реестра студентов; общий для StudentListView и AsyncStudentListView.
+
+    Без cursor и page_size - весь список, иначе страница keyset-пагинации
+    и ссылка next. С with_count в ответ добавляется count - число студентов
+    под фильтром (отдельный COUNT после выборки страницы).
+    """
+    queryset = student_queryset(request.query_params, as_of).order_by(*STUDENT_ORDERING)
+    rows_queryset = student_rows_queryset(queryset, shape, fields, as_of)
+    paginator = StudentKeysetPagination()
+    page_queryset = paginator.get_page_queryset(rows_queryset, request)
+    if page_queryset is None:
+        rows = list(rows_queryset)
+    else:
+        rows = paginator.set_page(list(page_queryset))
+    if as_of is not None:
+        rows = [snapshot_row(row) for row in rows]
+
+    if shape == 'flat':
+        data = flat_payload(rows, fields or FLAT_DEFAULT_FIELDS)
+        if page_queryset is not None:
+            data['next'] = paginator.get_next_link()
+    else:
+        if fields:
+            results = StudentSerializer(rows, many=True, fields=fields).data
+        else:
+            results = STUDENT_ROW_SERIALIZER.to_representation(rows)
+        if page_queryset is not None:
+            data = {'next': paginator.get_next_link(), 'results': results}
+        elif with_count:
+            data = {'results': results}
+        else:
+            data = results
+    if with_count:
+        data['count'] = queryset.count()
+    return data
+
+
+def cached_student_list(request, shape, fields, as_of=None, with_count=False):
+    """build_student_list через кеш выборок; возвращает (ответ, значение X-Cache)"""
+    params = request.query_params
+    # Одинаковые по смыслу фильтры (в любом порядке, с повторами) дают
+    # один ключ; страница, хост и путь влияют на ссылку next в ответе
+    variant = [request.get_host(), request.path, params.get('cursor', ''), params.get('page_size', ''),
+               shape, fields, as_of and as_of.isoformat()]
+    if with_count:
+        variant.append('count')
+    cache_key = student_cache_key(parse_student_filter(params), variant)
+    data = cache.get(cache_key)
+    record_student_cache_hit(data is not None)
+    if data is not None:
+        return data, 'HIT'
+    data = build_student_list(request, shape, fields, as_of, with_count)
+    if not student_rows_cacheable(data):
+        return data, 'BYPASS'
+    cache.set(cache_key, data, STUDENT_CACHE_TIMEOUT)
+    return data, 'MISS'
 
 
 class StudentListView(generics.ListAPIView):
     serializer_class = StudentSerializer
+    pagination_class = StudentKeysetPagination
+
+    def list(self, request, *args, **kwargs):
+        # ?stream=1 (или ?stream=ndjson) - потоковая выгрузка без пагинации
+        params = request.query_params
+        shape = parse_shape(params)
+        self.requested_fields = parse_fields(params)
+        # ?as_of=ГГГГ-ММ-ДД - статус, кафедра и программа на дату (только плоский ответ)
+        self.as_of = parse_as_of(params)
+        if self.as_of is not None:
+            shape = snapshot_shape(params)
+
+        stream_format = STREAM_FORMATS.get(params.get('stream', '').lower())
+        if stream_format:
+            if shape == 'flat':
+                raise ValidationError({'shape': 'Потоковая выгрузка возвращается только с shape=nested'})
+            queryset = self.filter_queryset(self.get_queryset())
+            if self.requested_fields is None:
+                rows = iter_value_rows(queryset, STUDENT_ROW_SERIALIZER)
+            else:
+                rows = iter_serialized(queryset, partial(self.get_serializer_class(), fields=self.requested_fields))
+            return stream_response(rows, stream_format)
+
+        data, cache_status = cached_student_list(request, shape, self.requested_fields, self.as_of)
+        response = Response(data)
+        response['X-Cache'] = cache_status
+        return response
 
     def get_queryset(self):
-        queryset = Student.objects.all()
-        params = self.request.query_params
-
-        # Основной фильтр для статусов (кроме отчисленных)
-        status_filter = Q()
-        # Фильтр для отчисленных
-        expelled_filter = Q()
-
-        # 1. Обработка статусов
-        if 'statuses' in params:
-            statuses = params['statuses'].split(',')
-
-            # Разделяем статусы на обычные и отчисленных
-            regular_statuses = [s for s in statuses if s != 'expelled']
-            has_expelled = 'expelled' in statuses
-
-            # Фильтр для обычных статусов
-            if regular_statuses:
-                status_filter &= Q(status__in=regular_statuses)
-
-            # 2. Фильтр для отчисленных (без причин)
-            if has_expelled and 'expulsion_reasons' not in params:
-                expelled_filter = Q(status='expelled')
-
-        # 3. Обработка причин отчисления
-        if 'expulsion_reasons' in params:
-            reasons = params['expulsion_reasons'].split(',')
-            expelled_filter = Q(status='expelled', expulsion_reason__in=reasons)
-
-        # 4-5. Комбинируем фильтры
-        if status_filter and expelled_filter:
-            main_filter = status_filter | expelled_filter
-        elif status_filter:
-            main_filter = status_filter
-        else:
-            main_filter = expelled_filter
-
-        # Применяем дополнительные фильтры
-        # Фильтрация по датам
-        if 'enrollment_date' in params:
-            try:
-                date = datetime.strptime(params['enrollment_date'], '%Y-%m-%d').date()
-                main_filter &= Q(enrollment_date=date)
-            except ValueError:
-                pass
-
-        if 'start_date' in params and 'end_date' in params:
-            try:
-                start = datetime.strptime(params['start_date'], '%Y-%m-%d').date()
-                end = datetime.strptime(params['end_date'], '%Y-%m-%d').date()
-                main_filter &= Q(enrollment_date__range=[start, end])
-            except ValueError:
-                pass
-
-        # Фильтрация по кафедрам и программам
-        if 'current_departments' in params:
-            departments = params['current_departments'].split(',')
-            main_filter &= Q(current_department_id__in=departments)
-
-        if 'current_programs' in params:
-            programs = params['current_programs'].split(',')
-            main_filter &= Q(current_program_id__in=programs)
-
-        # Фильтрация по типу обучения и основанию
-        if 'education_types' in params:
-            types = params['education_types'].split(',')
-            main_filter &= Q(education_type__in=types)
-
-        if 'admission_bases' in params:
-            bases = params['admission_bases'].split(',')
-            main_filter &= Q(admission_basis__in=bases)
-
-        # Фильтрация по нахождению в академе
-        if 'in_academic' in params:
-            if params['in_academic'].lower() == 'true':
-                main_filter &= Q(status='academic')
-
-        return queryset.filter(main_filter).order_by('last_name', 'first_name')
-
-
-class DepartmentListView(generics.ListAPIView):
+        as_of = getattr(self, 'as_of', None)
+        if as_of is not None:
+            return student_queryset(self.request.query_params, as_of).order_by(*STUDENT_ORDERING)
+        queryset = Student.objects.select_related(*STUDENT_RELATED_FIELDS)
+        fields = getattr(self, 'requested_fields', None)
+        if fields:
+            queryset = project_queryset(queryset, fields)
+        main_filter = build_student_filter(self.request.query_params)
+        return queryset.filter(main_filter).order_by(*STUDENT_ORDERING)
+
+
+class StudentStatsView(APIView):
+    """Сгруппированные количества студентов и сводные таблицы.
+
+    Принимает те же фильтры, что и StudentListView, плюс:
+    ?group_by=status,current_department - какие группировки вернуть;
+    ?pivot=current_department,status - сводная таблица (можно повторять);
+    ?as_of=ГГГГ-ММ-ДД - срез на дату: статус, кафедра и программа на эту дату.
+    """
+
+    def get(self, request):
+        params = request.query_params
+        group_by = self.parse_dimensions(params['group_by']) if 'group_by' in params else DEFAULT_GROUP_BY
+        pivots = []
+        for value in params.getlist('pivot'):
+            dimensions = self.parse_dimensions(value)
+            if len(dimensions) != 2:
+                raise ValidationError({'pivot': 'Сводная таблица задается двумя измерениями: строки,столбцы'})
+            pivots.append(tuple(dimensions))
+        as_of = parse_as_of(params)
+
+        variant = ['stats', list(group_by), pivots, as_of and as_of.isoformat()]
+        cache_key = student_cache_key(parse_student_filter(params), variant)
+        data = cache.get(cache_key)
+        record_student_cache_hit(data is not None)
+        if data is None:
+            queryset = student_queryset(params, as_of)
+            dimensions = DIMENSIONS if as_of is None else SNAPSHOT_DIMENSIONS
+            data = compute_student_stats(queryset, group_by, pivots, dimensions)
+            cache.set(cache_key, data, STUDENT_CACHE_TIMEOUT)
+        return Response(data)
+
+    def parse_dimensions(self, value):
+        dimensions = [name for name in value.split(',') if name]
+        unknown = [name for name in dimensions if name not in DIMENSIONS]
+        if unknown:
+            raise ValidationError({'dimensions': f'Неизвестные измерения: {", ".join(unknown)}'})
+        return dimensions
+
+
+class StudentExportView(APIView):
+    """Выгрузка отфильтрованных студентов в CSV или XLSX.
+
+    Принимает те же фильтры, что и StudentListView, и ?file_format=csv|xlsx
+    (параметр format занят согласованием формата в DRF).
+    """
+
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in EXPORT_FORMATS:
+            raise ValidationError({'file_format': f'Допустимые форматы: {", ".join(EXPORT_FORMATS)}'})
+
+        queryset = Student.objects.filter(build_student_filter(request.query_params)).order_by(*STUDENT_ORDERING)
+        if file_format == 'xlsx':
+            return xlsx_response(queryset)
+        return csv_response(queryset)
+
+
+class StudentBulkView(APIView):
+    """Массовое создание, изменение и смена статуса студентов.
+
+    Тело запроса: {"operations": [...]} (формат операций - в students.bulk).
+    Все операции применяются в одной транзакции; если хотя бы одна не прошла
+    проверку, не применяется ничего, а в ответе 400 - ошибки по номерам операций.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        return Response(StudentBulkOperation(operations).run())
+
+
+class TransferFlowView(APIView):
+    """Потоки переводов между программами или кафедрами.
+
+    Параметры: from_programs, to_programs, from_departments, to_departments
+    (списки id через запятую), start_date/end_date или year,
+    level=program|department.
+    """
+    filter_schema = {
+        'from_programs': 'ids',
+        'to_programs': 'ids',
+        'from_departments': 'ids',
+        'to_departments': 'ids',
+        'year': 'year',
+        'start_date': 'date',
+        'end_date': 'date',
+    }
+    filter_lookups = {
+        'from_programs': 'from_program_id__in',
+        'to_programs': 'to_program_id__in',
+        'from_departments': 'from_program__department_id__in',
+        'to_departments': 'to_program__department_id__in',
+        'year': 'date__year',
+        'start_date': 'date__gte',
+        'end_date': 'date__lte',
+    }
+
+    def get(self, request):
+        params = request.query_params
+        level = params.get('level', 'program')
+        if level not in FLOW_LEVELS:
+            raise ValidationError({'level': f'Допустимые значения: {", ".join(FLOW_LEVELS)}'})
+
+        queryset = TransferEvent.objects.all()
+        for param, values in parse_query_params(params, self.filter_schema).items():
+            queryset = queryset.filter(**{self.filter_lookups[param]: values})
+
+        flows = transfer_flows(queryset, level)
+        return Response({
+            'total': sum(flow['count'] for flow in flows),
+            'level': level,
+            'flows': flows,
+        })
+
+
+class CohortReportView(APIView):
+    """Удержание когорт из таблицы CohortReport (команда refresh_cohort_reports).
+
+    Параметры: enrollment_years, programs (списки через запятую),
+    education_types (budget,contract).
+    """
+    filter_schema = {
+        'enrollment_years': 'ids',
+        'programs': 'ids',
+        'education_types': 'choices',
+    }
+    filter_lookups = {
+        'enrollment_years': 'enrollment_year__in',
+        'programs': 'program_id__in',
+        'education_types': 'education_type__in',
+    }
+
+    def get(self, request):
+        queryset = CohortReport.objects.all()
+        for param, values in parse_query_params(request.query_params, self.filter_schema).items():
+            queryset = queryset.filter(**{self.filter_lookups[param]: values})
+
+        cohorts = []
+        for row in queryset.values('enrollment_year', 'program_id', 'education_type', 'size', 'retention',
+                                   program_name=F('program__name')):
+            program_id = row.pop('program_id')
+            name = row.pop('program_name')
+            row['program'] = None if program_id is None else {'id': program_id, 'name': name}
+            cohorts.append(row)
+        return Response({
+            'refreshed_at': CohortReport.objects.aggregate(refreshed_at=Max('refreshed_at'))['refreshed_at'],
+            'cohorts': cohorts,
+        })
+
+
+class StudentCacheStatsView(APIView):
+    """Счетчики попаданий и промахов кеша выборок студентов (только администраторам)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_student_cache_stats())
+
+
+class MetricsView(APIView):
+    """Метрики PerformanceMetricsMiddleware в текстовом формате Prometheus.
+
+    Только администраторам: сборщик метрик ходит с учетной записью staff
+    (HTTP Basic).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(metrics.to_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class CachedReferenceListMixin:
+    """Кеширует ответ справочного списка до следующего изменения справочников.
+
+    Ключ кеша включает версию справочников, которую сдвигают сигналы
+    моделей, поэтому на горячем пути нет обращений к БД. Клиенту отдаются
+    ETag и Last-Modified, повторный запрос с ними получает 304.
+
+    С ?with_counts=1 к записям добавляется количество студентов из таблицы
+    счетчиков (тем же запросом), а ключ зависит и от поколения данных студентов.
+    """
+    cache_endpoint = None
+    counts_serializer_class = None
+    row_serializer = None
+
+    def get_cache_variant(self):
+        return 'all'
+
+    def with_counts(self):
+        return self.request.query_params.get('with_counts', '').lower() in ('1', 'true')
+
+    def get_serializer_class(self):
+        if self.with_counts():
+            return self.counts_serializer_class
+        return super().get_serializer_class()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.with_counts():
+            queryset = annotate_student_counts(queryset)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        cache_key, etag, last_modified = reference_cache_state(self.cache_endpoint, self.get_cache_variant(),
+                                                               self.with_counts())
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        data = cache.get(cache_key)
+        if data is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            if self.row_serializer is not None and not self.with_counts():
+                data = self.row_serializer.to_representation(self.row_serializer.values_list(queryset))
+            else:
+                data = self.get_serializer(queryset, many=True).data
+            cache.set(cache_key, data, REFERENCE_CACHE_TIMEOUT)
+
+        response = Response(data)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+# Фильтр списка программ: department_id=1,2,3 - программы этих кафедр
+PROGRAM_FILTER_SCHEMA = {
+    'department_id': 'ids',
+}
+
+
+def program_department_ids(params):
+    """Кафедры из department_id (None - все); некорректные значения - 400"""
+    return parse_query_params(params, PROGRAM_FILTER_SCHEMA).get('department_id')
+
+
+def program_cache_variant(params):
+    department_ids = program_department_ids(params)
+    if department_ids is None:
+        return 'all'
+    return ','.join(str(id) for id in department_ids)
+
+
+def program_queryset(params):
+    """Программы кафедр из параметра department_id (все, если он пуст)"""
+    queryset = Program.objects.select_related('department')
+    department_ids = program_department_ids(params)
+    if department_ids is None:
+        return queryset
+    return queryset.filter(department_id__in=department_ids)
+
+
+class DepartmentListView(CachedReferenceListMixin, generics.ListAPIView):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
+    row_serializer = ValuesRowSerializer(DepartmentSerializer)
+    counts_serializer_class = DepartmentCountsSerializer
+    cache_endpoint = 'departments'
 
 
-class ProgramListView(generics.ListAPIView):
+class ProgramListView(CachedReferenceListMixin, generics.ListAPIView):
     serializer_class = ProgramSerializer
+    row_serializer = ValuesRowSerializer(ProgramSerializer)
+    counts_serializer_class = ProgramCountsSerializer
+    cache_endpoint = 'programs'
+
+    def get_cache_variant(self):
+        return program_cache_variant(self.request.query_params)
 
     def get_queryset(self):
-        department_id = self.request.query_params.get('department_id', None)
-        if department_id:
-            try:
-                department_ids = [int(id) for id in department_id.split(',')]
-                return Program.objects.filter(department_id__in=department_ids)
-            except (ValueError, TypeError):
-                return Program.objects.none()
-        return Program.objects.all()
+        return program_queryset(self.request.query_params)
+
+
+class BootstrapView(APIView):
+    """Все справочники для первой загрузки фронтенда одним ответом.
+
+    Кафедры, программы, сгруппированные по id кафедры, и choices фильтров
+    студентов. Кешируется и версионируется ETag так же, как справочные списки.
+    """
+
+    def get(self, request):
+        cache_key, etag, last_modified = reference_cache_state('bootstrap', CHOICES_VARIANT)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        data = cache.get(cache_key)
+        if data is None:
+            data = bootstrap_payload()
+            cache.set(cache_key, data, REFERENCE_CACHE_TIMEOUT)
+
+        response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
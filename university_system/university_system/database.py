@@ -0,0 +1,91 @@
+"""Профили подключения к БД, выбираемые переменными окружения.
+
+DATABASE_ENGINE=sqlite (по умолчанию) - один узел, SQLite в режиме WAL:
+    SQLITE_PATH             путь к файлу базы (по умолчанию db.sqlite3 рядом с manage.py)
+    SQLITE_MMAP_SIZE        mmap_size в байтах (по умолчанию 256 МБ)
+    SQLITE_BUSY_TIMEOUT_MS  сколько ждать блокировку записи (по умолчанию 5000)
+
+DATABASE_ENGINE=postgresql - несколько воркеров gunicorn:
+    POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_PORT
+    DB_CONN_MAX_AGE         время жизни постоянного соединения в секундах (по умолчанию 60)
+    DB_POOL=1               пул psycopg 3 (psycopg[pool]) вместо постоянных соединений
+    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+DATABASE_ENGINES = ('sqlite', 'postgresql')
+
+DEFAULT_SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+DEFAULT_SQLITE_BUSY_TIMEOUT_MS = 5000
+DEFAULT_CONN_MAX_AGE = 60
+
+
+def _flag(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+
+def sqlite_pragmas(environ):
+    """PRAGMA, выполняемые при открытии каждого соединения SQLite.
+
+    WAL позволяет читать во время записи, synchronous=NORMAL в режиме WAL
+    не теряет целостность при сбое процесса, busy_timeout заставляет
+    писателей ждать блокировку вместо ошибки "database is locked".
+    """
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(environ.get('SQLITE_BUSY_TIMEOUT_MS', DEFAULT_SQLITE_BUSY_TIMEOUT_MS)),
+        'mmap_size': int(environ.get('SQLITE_MMAP_SIZE', DEFAULT_SQLITE_MMAP_SIZE)),
+        'temp_store': 'MEMORY',
+    }
+
+
+def sqlite_database(environ, base_dir):
+    pragmas = sqlite_pragmas(environ)
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': environ.get('SQLITE_PATH') or str(base_dir / 'db.sqlite3'),
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items()),
+            # Транзакция сразу берет блокировку записи: без этого два писателя
+            # в WAL могут упереться в SQLITE_BUSY при повышении блокировки,
+            # и busy_timeout не помогает
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+
+
+def postgresql_database(environ):
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('POSTGRES_DB', 'university'),
+        'USER': environ.get('POSTGRES_USER', 'university'),
+        'PASSWORD': environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': environ.get('POSTGRES_PORT', '5432'),
+        # Перед повторным использованием соединение проверяется, упавшее переоткрывается
+        'CONN_HEALTH_CHECKS': True,
+        'CONN_MAX_AGE': int(environ.get('DB_CONN_MAX_AGE', DEFAULT_CONN_MAX_AGE)),
+        'OPTIONS': {},
+    }
+    if _flag(environ.get('DB_POOL', '')):
+        # Пул соединений Django несовместим с постоянными соединениями
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': int(environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': float(environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+    return database
+
+
+def database_from_env(environ, base_dir):
+    """Настройки DATABASES['default'] по переменным окружения"""
+    engine = environ.get('DATABASE_ENGINE', 'sqlite').lower()
+    if engine == 'sqlite':
+        return sqlite_database(environ, base_dir)
+    if engine == 'postgresql':
+        return postgresql_database(environ)
+    raise ImproperlyConfigured(
+        f'DATABASE_ENGINE={engine}: допустимые значения {", ".join(DATABASE_ENGINES)}'
+    )
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .database import database_from_env
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -51,8 +54,19 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
+    # Последним, чтобы отдельно замерять рендеринг ответа DRF
+    "students.middleware.PerformanceMetricsMiddleware",
 ]
 
+# Профиль только для API (без админки, сессий и шаблонов) - settings_api.py
+
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "students.rows.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
@@ -79,15 +93,58 @@ WSGI_APPLICATION = "university_system.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Профиль (SQLite в режиме WAL или PostgreSQL с постоянными соединениями
+# или пулом) выбирается переменными окружения, см. university_system/database.py
 
 DATABASES = {
+    "default": database_from_env(os.environ, BASE_DIR),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Версии справочников хранятся в кеше, поэтому при нескольких процессах
+# нужен общий бэкенд (Redis/Memcached), а не локальная память процесса:
+# с LocMemCache другие воркеры видят изменения справочников только по
+# истечении students.cache.REFERENCE_CACHE_TIMEOUT (5 минут).
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "university-system",
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            # При переполнении вытесняются давно не использованные записи (LRU)
+            "MAX_ENTRIES": 2000,
+        },
     }
 }
 
 
+# Выборки студентов длиннее стольких строк не кешируются (весь реестр без
+# пагинации занимает в кеше десятки мегабайт), страницы пагинации - всегда
+
+STUDENT_CACHE_MAX_ROWS = 1000
+
+
+# Метрики производительности: сколько последних запросов на endpoint хранить
+# для квантилей и с какого времени (мс) запрос к БД пишется в лог как медленный
+
+PERF_METRICS_WINDOW = 1000
+SLOW_QUERY_THRESHOLD_MS = 200
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "students.perf": {"handlers": ["console"], "level": "WARNING"},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,38 @@
+"""
+Профиль для процессов, которые обслуживают только API (DJANGO_SETTINGS_MODULE=
+university_system.settings_api).
+
+Админка, сессии, сообщения, статика и шаблоны API не нужны: без них
+процесс быстрее стартует и занимает меньше памяти. Аутентификация - только
+HTTP Basic (сессий нет), ответы - только JSON (без browsable API, которому
+нужны шаблоны). Замер старта: benchmark_startup.py.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+API_EXCLUDED_APPS = (
+    "django.contrib.admin",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+)
+API_EXCLUDED_MIDDLEWARE = (
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+)
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_EXCLUDED_APPS]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in API_EXCLUDED_MIDDLEWARE]
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_AUTHENTICATION_CLASSES": ["rest_framework.authentication.BasicAuthentication"],
+    "DEFAULT_RENDERER_CLASSES": ["students.rows.FastJSONRenderer"],
+}